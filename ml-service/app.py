@@ -1,24 +1,43 @@
 from flask import Flask, request, jsonify
+from concurrent.futures import TimeoutError as FutureTimeoutError
 import numpy as np
+import atexit
 import os
 import time
-from werkzeug.utils import secure_filename
 
 # --- IMPORT ALL LOGIC FROM UTILITY FILE ---
+from utils.audio_utils import load_upload, decode_pcm_bytes, MAX_IN_MEMORY_UPLOAD_BYTES
+from utils.extraction_pool import create_feature_pool, PoolSaturatedError, ExtractionTimeoutError
+from utils.feature_cache import FeatureCache, audio_fingerprint
+from utils import lazy_audio
+from utils.metrics import REGISTRY as METRICS, PROMETHEUS_CONTENT_TYPE, instrument_flask, stage
+from utils.micro_batcher import MicroBatcher, PREDICT_BATCH_ENABLED, PREDICT_BATCH_TIMEOUT_SECONDS
+from utils.shared_state import SharedDHT22_KalmanFilterBank, SharedWellnessFusionBank, SHARED_STATE_NAME
+from utils.state_store import StateStore, STATE_DIR
+from utils.stream_sessions import StreamSessionStore, StreamSessionError
 from utils.wellness_logic import (
-    extract_features, 
+    extract_features_from_signal, 
     predict_vsd_risk, 
-    DHT22_KalmanFilter, 
-    WellnessFusionEngine # <-- NEW FUSION ENGINE
+    predict_vsd_risk_batch,
+    warm_up,
+    FEATURE_ENGINE,
+    PITCH_BACKEND,
+    VSD_MODEL_ERROR,
+    DHT22_KalmanFilterBank, 
+    WellnessFusionBank # <-- PER-DEVICE / PER-USER STATE
 )
 
 app = Flask(__name__)
 UPLOAD_FOLDER = 'temp_uploads'
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-
-# Ensure the upload directory exists
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
+# Uploads above this size spill to UPLOAD_FOLDER; smaller ones are decoded in memory
+app.config['MAX_IN_MEMORY_UPLOAD_BYTES'] = MAX_IN_MEMORY_UPLOAD_BYTES
+# Upper bound on /analyze/pcm request bodies (raw PCM is read into memory in one piece)
+app.config['MAX_PCM_BODY_BYTES'] = int(os.environ.get('MAX_PCM_BODY_BYTES', 64 * 1024 * 1024))
+# Upper bound on rows accepted by /predict_features/batch in one request
+app.config['MAX_BATCH_ROWS'] = int(os.environ.get('MAX_BATCH_ROWS', 10000))
+# Request counts / errors / latency / in-flight for /metrics (METRICS_ENABLED=0 turns it off)
+instrument_flask(app)
 
 
 # ==========================================================
@@ -30,22 +49,165 @@ INITIAL_TEMP = 25.0
 INITIAL_HUMIDITY = 50.0
 INITIAL_WELLNESS = 80.0 # Start with a neutral/good wellness score
 
-try:
-    # 1. Initialize DHT22 Kalman Filter for smoothing T/H
-    DHT_KALMAN_FILTER = DHT22_KalmanFilter(INITIAL_TEMP, INITIAL_HUMIDITY)
-    
-    # 2. Initialize Wellness Fusion Engine (Main state tracker)
-    FUSION_ENGINE = WellnessFusionEngine(initial_wellness=INITIAL_WELLNESS)
-    
-    print("\n==============================================")
-    print("🤖 Service Initialized: All components ready.")
-    print(f"🌡️ Starting T/H Estimate: {DHT_KALMAN_FILTER.temp_estimate:.2f}C / {DHT_KALMAN_FILTER.humidity_estimate:.2f}%")
-    print(f"✨ Starting Wellness Index: {FUSION_ENGINE.wellness_estimate:.2f}/100")
-    print("==============================================")
-    
-except Exception as e:
-    print(f"FATAL ERROR during initialization (Check models/ or wellness_logic.py): {e}")
-    # Consider exiting the application if initialization fails
+# Requests without a device_id / user_id share this state (single-room behaviour)
+DEFAULT_STATE_KEY = 'default'
+# Opt-in steady-state Kalman gains (skip covariance updates once P has converged)
+STEADY_STATE_KALMAN = os.environ.get('STEADY_STATE_KALMAN', '0') == '1'
+# Content-hash cache of extracted features, so retried uploads skip extraction
+FEATURE_CACHE_ENABLED = os.environ.get('FEATURE_CACHE_ENABLED', '1') == '1'
+FEATURE_CACHE_SALT = f"{FEATURE_ENGINE}/{PITCH_BACKEND}"
+DHT_KALMAN_FILTER = None
+FUSION_ENGINE = None
+FEATURE_POOL = None
+FEATURE_CACHE = None
+STATE_STORE = None
+STREAM_SESSIONS = None
+PREDICT_BATCHER = None
+# Synthetic clip through extraction + scoring at boot; /readyz stays 503 until it succeeds
+WARMUP_ENABLED = os.environ.get('WARMUP_ENABLED', '1') == '1'
+WARMUP_STATE = {'status': 'pending', 'seconds': None, 'error': None}
+SERVICE_INITIALIZED = False
+
+
+def fuse_scores_in_order(contexts, vsd_risk_scores):
+    """Micro-batcher finish step: applies the batch's fusion updates in arrival order.
+       Returns (vsd_risk_score, wellness_index, smoothed_T, smoothed_H) per row."""
+    results = []
+    with FUSION_ENGINE.lock:
+        for (device_key, user_key, timestamp), score in zip(contexts, vsd_risk_scores):
+            smoothed_T, smoothed_H = DHT_KALMAN_FILTER.estimate(device_key)
+            wellness_index = FUSION_ENGINE.update_fusion(user_key, score, smoothed_T, smoothed_H, measurement_source='VSD',
+                                                         timestamp=timestamp)
+            results.append((float(score), wellness_index, smoothed_T, smoothed_H))
+    return results
+
+
+
+def run_warmup(include_audio=True):
+    """Runs warm_up() and records the outcome in WARMUP_STATE for /readyz (never raises)."""
+    start = time.perf_counter()
+    try:
+        warm_up(include_audio=include_audio)
+    except Exception as e:
+        WARMUP_STATE.update(status='failed', error=str(e))
+        print(f"❌ Warm-up failed, /readyz will report not ready: {e}")
+        return
+    WARMUP_STATE.update(status='ok', seconds=round(time.perf_counter() - start, 3))
+    print(f"🔥 Warm-up done in {WARMUP_STATE['seconds']:.2f}s ({'extraction + scoring' if include_audio else 'scoring only'})")
+
+def init_service():
+    """
+    Builds the estimator banks, state store, extraction pool, caches and warm-up. Runs once, in
+    the process that serves requests (see the bottom of this file), never in the reloader's
+    file watcher or in 'spawn' pool workers that re-import this module as __mp_main__.
+    """
+    global DHT_KALMAN_FILTER, FUSION_ENGINE, STATE_STORE, FEATURE_POOL, FEATURE_CACHE, STREAM_SESSIONS
+    global PREDICT_BATCHER, SERVICE_INITIALIZED
+    try:
+        # 1. Initialize DHT22 Kalman Filters (one per device_id) for smoothing T/H
+        # 2. Initialize Wellness Fusion Engine (Main state tracker, one per user_id)
+        #    With SHARED_STATE_NAME set, both live in shared memory so every worker process sees one state
+        if SHARED_STATE_NAME:
+            DHT_KALMAN_FILTER = SharedDHT22_KalmanFilterBank(INITIAL_TEMP, INITIAL_HUMIDITY, f'{SHARED_STATE_NAME}-dht22',
+                                                             steady_state=STEADY_STATE_KALMAN)
+            FUSION_ENGINE = SharedWellnessFusionBank(f'{SHARED_STATE_NAME}-fusion', initial_wellness=INITIAL_WELLNESS,
+                                                     steady_state=STEADY_STATE_KALMAN)
+        else:
+            DHT_KALMAN_FILTER = DHT22_KalmanFilterBank(INITIAL_TEMP, INITIAL_HUMIDITY, steady_state=STEADY_STATE_KALMAN)
+            FUSION_ENGINE = WellnessFusionBank(initial_wellness=INITIAL_WELLNESS, steady_state=STEADY_STATE_KALMAN)
+
+        print("\n==============================================")
+        print("🤖 Service Initialized: All components ready.")
+        print(f"🌡️ Starting T/H Estimate: {INITIAL_TEMP:.2f}C / {INITIAL_HUMIDITY:.2f}%")
+        print(f"✨ Starting Wellness Index: {INITIAL_WELLNESS:.2f}/100")
+        print(f"🗂️ State banks: up to {DHT_KALMAN_FILTER.capacity} keys, idle TTL {DHT_KALMAN_FILTER.ttl_seconds:.0f}s")
+        if SHARED_STATE_NAME:
+            print(f"🧩 Shared state '{SHARED_STATE_NAME}': {'created' if FUSION_ENGINE.created else 'attached'}, "
+                  f"{len(FUSION_ENGINE)} users / {len(DHT_KALMAN_FILTER)} devices, "
+                  f"{'locked' if FUSION_ENGINE.locked_reads else 'seqlock'} reads")
+
+        # 3. Optional crash-safe persistence of both banks (STATE_DIR): restore, then journal every update.
+        #    With shared state, one worker owns the directory; only the process that created the
+        #    segments loads them from disk (the others attach to state that is already there).
+        if STATE_DIR:
+            restore = not SHARED_STATE_NAME or FUSION_ENGINE.created
+            try:
+                STATE_STORE = StateStore(STATE_DIR, {'dht22': DHT_KALMAN_FILTER, 'fusion': FUSION_ENGINE}).open(restore=restore)
+            except RuntimeError as e:
+                if not SHARED_STATE_NAME:
+                    raise
+                print(f"💾 State store: {e}; another worker journals the shared state")
+            else:
+                atexit.register(STATE_STORE.close)
+                if restore:
+                    print(f"💾 State store: {STATE_STORE.restored_keys} keys restored in {STATE_STORE.restore_seconds * 1000:.1f} ms "
+                          f"({STATE_STORE.replayed_records} delta records), snapshot every {STATE_STORE.snapshot_seconds:.0f}s")
+                else:
+                    print(f"💾 State store: journaling the attached shared state, snapshot every {STATE_STORE.snapshot_seconds:.0f}s")
+
+        # 4. Optional process pool for feature extraction (FEATURE_POOL_WORKERS > 0)
+        FEATURE_POOL = create_feature_pool()
+        if FEATURE_POOL is not None:
+            print(f"🧵 Feature pool: {FEATURE_POOL.workers} warm workers, {FEATURE_POOL.max_pending} max pending, {FEATURE_POOL.timeout:.0f}s timeout")
+
+        # 5. Feature cache for duplicate uploads (optionally persisted across restarts)
+        if FEATURE_CACHE_ENABLED:
+            FEATURE_CACHE = FeatureCache()
+            atexit.register(FEATURE_CACHE.close)
+            print(f"🗃️ Feature cache: {FEATURE_CACHE.max_bytes // 1024} KiB budget, {len(FEATURE_CACHE)} entries loaded")
+
+        # 6. Streaming sessions (chunked audio, features accumulated as frames arrive)
+        STREAM_SESSIONS = StreamSessionStore()
+        print(f"📡 Stream sessions: up to {STREAM_SESSIONS.capacity} open, idle TTL {STREAM_SESSIONS.ttl_seconds:.0f}s")
+
+        # 7. Optional micro-batcher: concurrent /predict_features rows scored as one matrix
+        if PREDICT_BATCH_ENABLED:
+            PREDICT_BATCHER = MicroBatcher(predict_vsd_risk_batch, finish=fuse_scores_in_order)
+            print(f"📦 Predict micro-batching: up to {PREDICT_BATCHER.max_rows} rows / {PREDICT_BATCHER.max_wait_ms:g} ms per batch")
+
+        # 8. Audio stack (librosa / numba / scipy): at start-up, on first use, or on a background
+        #    thread, followed by the warm-up (scoring only in 'lazy' mode, which skips audio imports)
+        if not WARMUP_ENABLED:
+            WARMUP_STATE['status'] = 'skipped'
+        elif lazy_audio.AUDIO_IMPORT_MODE == 'lazy':
+            run_warmup(include_audio=False)
+        lazy_audio.init_audio_stack(after_load=run_warmup if WARMUP_ENABLED else None)
+        if lazy_audio.audio_stack_loaded():
+            print(f"🎧 Audio stack imported in {lazy_audio.load_seconds:.2f}s")
+        else:
+            print(f"🎧 Audio stack import: {lazy_audio.AUDIO_IMPORT_MODE}")
+        SERVICE_INITIALIZED = True
+        print("==============================================")
+
+    except Exception as e:
+        print(f"FATAL ERROR during initialization (Check models/ or wellness_logic.py): {e}")
+        # Consider exiting the application if initialization fails
+
+
+def resolve_state_keys(payload):
+    """Returns (device_key, user_key): device_id selects the T/H filter, user_id (else
+       device_id) selects the wellness state. Both fall back to DEFAULT_STATE_KEY."""
+    payload = payload or {}
+    device_key = str(payload.get('device_id') or DEFAULT_STATE_KEY)
+    user_key = str(payload.get('user_id') or payload.get('device_id') or DEFAULT_STATE_KEY)
+    return device_key, user_key
+
+
+def resolve_timestamp(payload):
+    """Reading time in seconds from the payload's optional `timestamp` (milliseconds, as sent by
+       the gateway's Date.now() or a device's millis()), or None. Raises ValueError if malformed."""
+    value = (payload or {}).get('timestamp')
+    if value is None:
+        return None
+    try:
+        if isinstance(value, bool):
+            raise ValueError
+        seconds = float(value) / 1000.0
+    except (TypeError, ValueError):
+        raise ValueError(f'timestamp must be a number of milliseconds, got {value!r}')
+    if not np.isfinite(seconds):
+        raise ValueError(f'timestamp must be finite, got {value!r}')
+    return seconds
 
 
 # ==========================================================
@@ -93,31 +255,91 @@ def analyze_voice():
         return jsonify({'error': 'No audio file part in the request'}), 400
     
     file = request.files['audio']
-    filename = secure_filename(f"temp_{time.time()}.wav")
-    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-    file.save(filepath)
 
     try:
-        # 2. Predict Volatile Risk Score
-        features = extract_features(filepath)
+        # 2. Decode in memory (spills to UPLOAD_FOLDER only for very large uploads)
+        with stage('decode'):
+            signal, original_sr = load_upload(
+                file,
+                spill_dir=app.config['UPLOAD_FOLDER'],
+                max_in_memory_bytes=app.config['MAX_IN_MEMORY_UPLOAD_BYTES']
+            )
+    except Exception as e:
+        app.logger.error(f'Audio decode error in /analyze: {e}')
+        return jsonify({'error': 'Feature extraction failed or file corrupted'}), 500
+
+    return analyze_signal(signal, original_sr, request.form)
+
+
+# ==========================================================
+# 🔌 RAW PCM VOICE ANALYSIS (/analyze/pcm)
+#    Body: headerless little-endian PCM (application/octet-stream)
+#    Headers: X-Sample-Rate: 16000, X-Channels: 1, X-Sample-Format: int16 | float32
+#    Query: ?device_id=...&user_id=... (optional)
+# ==========================================================
+@app.route('/analyze/pcm', methods=['POST'])
+def analyze_pcm():
+    if request.content_length is None:
+        return jsonify({'error': 'Content-Length is required'}), 411
+    if request.content_length > app.config['MAX_PCM_BODY_BYTES']:
+        return jsonify({'error': f"PCM body larger than {app.config['MAX_PCM_BODY_BYTES']} bytes"}), 413
+
+    try:
+        original_sr = int(request.headers.get('X-Sample-Rate', 16000))
+        if original_sr <= 0:
+            raise ValueError(f"sample rate must be positive, got {original_sr}")
+        # Views the request body in place (no container parsing, no copy for mono float32)
+        with stage('decode'):
+            signal = decode_pcm_bytes(
+                request.get_data(cache=False),
+                sample_format=request.headers.get('X-Sample-Format', 'int16'),
+                channels=request.headers.get('X-Channels', 1)
+            )
+        if signal.size == 0:
+            raise ValueError("empty PCM body")
+    except ValueError as e:
+        return jsonify({'error': f'Invalid PCM body: {e}'}), 400
+
+    return analyze_signal(signal, original_sr, request.args)
+
+
+def analyze_signal(signal, original_sr, payload):
+    """Shared tail of /analyze and /analyze/pcm: features (cache / pool / inline), risk score,
+       fusion for the device / user named in `payload`, and the JSON response."""
+    try:
+        # 3. Predict Volatile Risk Score (cached features for duplicate uploads, else the pool when enabled)
+        with stage('cache_lookup'):
+            cache_key = audio_fingerprint(signal, original_sr, FEATURE_CACHE_SALT) if FEATURE_CACHE is not None else None
+            features = FEATURE_CACHE.get(cache_key) if cache_key is not None else None
         if features is None:
-            return jsonify({'error': 'Feature extraction failed or file corrupted'}), 500
-        
-        vsd_risk_score = predict_vsd_risk(features)
+            with stage('extract'):
+                if FEATURE_POOL is not None:
+                    features = FEATURE_POOL.extract(signal, original_sr)
+                else:
+                    features = extract_features_from_signal(signal, original_sr)
+            if features is None:
+                return jsonify({'error': 'Feature extraction failed or file corrupted'}), 500
+            if cache_key is not None:
+                FEATURE_CACHE.put(cache_key, features)
         
-        # 3. Fusion: Use VSD score to update the state
-        # The fusion engine reads the current *smoothed* ambient state
-        smoothed_T = DHT_KALMAN_FILTER.temp_estimate
-        smoothed_H = DHT_KALMAN_FILTER.humidity_estimate
+        with stage('predict'):
+            vsd_risk_score = predict_vsd_risk(features)
         
-        final_wellness_index = FUSION_ENGINE.update_fusion(
-            vsd_risk_score, 
-            smoothed_T, 
-            smoothed_H, 
-            measurement_source='VSD' # <-- Voice score is the measurement
-        )
-
-        # 4. Generate Recommendation
+        # 4. Fusion: Use VSD score to update the state
+        # The fusion engine reads the current *smoothed* ambient state of the caller's device
+        device_key, user_key = resolve_state_keys(payload)
+        with stage('fusion'):
+            smoothed_T, smoothed_H = DHT_KALMAN_FILTER.estimate(device_key)
+            
+            final_wellness_index = FUSION_ENGINE.update_fusion(
+                user_key,
+                vsd_risk_score, 
+                smoothed_T, 
+                smoothed_H, 
+                measurement_source='VSD' # <-- Voice score is the measurement
+            )
+
+        # 5. Generate Recommendation
         # This function must be defined globally in app.py!
         recommendation_text = generate_wellness_recommendation(final_wellness_index, vsd_risk_score) # <--- ADD THIS ARGUMENT
         
@@ -135,14 +357,16 @@ def analyze_voice():
             'features': features
         })
 
+    except PoolSaturatedError as e:
+        return jsonify({'error': f'Server busy: {e}'}), 429, {'Retry-After': '1'}
+
+    except ExtractionTimeoutError as e:
+        app.logger.error(f'Feature extraction timeout in {request.path}: {e}')
+        return jsonify({'error': f'ML Processing Timeout: {e}'}), 504
+
     except Exception as e:
-        app.logger.error(f'ML Processing Error in /analyze: {e}')
+        app.logger.error(f'ML Processing Error in {request.path}: {e}')
         return jsonify({'error': f'ML Processing Error: {e}'}), 500
-        
-    finally:
-        # 5. Cleanup
-        if os.path.exists(filepath):
-            os.remove(filepath)
 
 
 
@@ -165,15 +389,27 @@ def predict_features():
         # Convert to list of floats
         feature_vector = [float(x) for x in features]
 
-        # 1. Predict VSD risk from provided features
-        vsd_risk_score = predict_vsd_risk(feature_vector)
-
-        # 2. Fusion update using smoothed ambient
-        smoothed_T = DHT_KALMAN_FILTER.temp_estimate
-        smoothed_H = DHT_KALMAN_FILTER.humidity_estimate
-        final_wellness_index = FUSION_ENGINE.update_fusion(
-            vsd_risk_score, smoothed_T, smoothed_H, measurement_source='VSD'
-        )
+        try:
+            timestamp = resolve_timestamp(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        device_key, user_key = resolve_state_keys(data)
+        if PREDICT_BATCHER is not None:
+            # 1 + 2. Scored together with concurrent requests; fusion still runs in arrival order
+            future = PREDICT_BATCHER.submit(feature_vector, (device_key, user_key, timestamp))
+            vsd_risk_score, final_wellness_index, smoothed_T, smoothed_H = future.result(timeout=PREDICT_BATCH_TIMEOUT_SECONDS)
+        else:
+            # 1. Predict VSD risk from provided features
+            with stage('predict'):
+                vsd_risk_score = predict_vsd_risk(feature_vector)
+
+            # 2. Fusion update using smoothed ambient (Q scaled by the time since the last reading)
+            with stage('fusion'):
+                smoothed_T, smoothed_H = DHT_KALMAN_FILTER.estimate(device_key)
+                final_wellness_index = FUSION_ENGINE.update_fusion(
+                    user_key, vsd_risk_score, smoothed_T, smoothed_H, measurement_source='VSD', timestamp=timestamp
+                )
 
         recommendation_text = generate_wellness_recommendation(final_wellness_index, vsd_risk_score)
 
@@ -190,33 +426,257 @@ def predict_features():
             'features_received': feature_vector
         })
 
+    except FutureTimeoutError:
+        # The row stays queued and its fusion update is still applied when its batch runs
+        app.logger.error('predict_features micro-batch timeout')
+        return jsonify({'error': 'Prediction timed out waiting for its batch'}), 504
+
     except Exception as e:
         app.logger.error(f'predict_features error: {e}')
         return jsonify({'error': f'Prediction failed: {e}'}), 500
 
+# ==========================================================
+# 📦 BATCH ENDPOINT: Score a backlog of feature vectors at once
+#    POST /predict_features/batch
+#    Body: { features: [[16 numbers], ...], fusion: "sequential" | "skip" }
+# ==========================================================
+@app.route('/predict_features/batch', methods=['POST'])
+def predict_features_batch():
+    try:
+        data = request.get_json()
+        if not data or 'features' not in data:
+            return jsonify({'error': 'features matrix is required'}), 400
+
+        fusion_mode = data.get('fusion', 'sequential')
+        if fusion_mode not in ('sequential', 'skip'):
+            return jsonify({'error': f"fusion must be 'sequential' or 'skip', got {fusion_mode!r}"}), 400
+
+        try:
+            feature_matrix = np.asarray(data['features'], dtype=float)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'features must be a list of numeric 16-element lists'}), 400
+        if feature_matrix.ndim != 2 or feature_matrix.shape[1] != 16:
+            return jsonify({'error': f'features must be an N x 16 matrix, got shape {list(feature_matrix.shape)}'}), 400
+        if feature_matrix.shape[0] > app.config['MAX_BATCH_ROWS']:
+            return jsonify({'error': f"at most {app.config['MAX_BATCH_ROWS']} rows per batch"}), 413
+
+        # 1. Predict VSD risk for every row in one vectorized call
+        with stage('predict_batch'):
+            vsd_risk_scores = predict_vsd_risk_batch(feature_matrix)
+
+        response = {
+            'status': 'success',
+            'count': int(feature_matrix.shape[0]),
+            'fusion': fusion_mode,
+            'vsd_risk_scores': np.round(vsd_risk_scores, 2).tolist()
+        }
+
+        # 2. Optionally replay the fusion update over the rows in order
+        if fusion_mode == 'sequential' and feature_matrix.shape[0] > 0:
+            device_key, user_key = resolve_state_keys(data)
+            smoothed_T, smoothed_H = DHT_KALMAN_FILTER.estimate(device_key)
+            # Hold the bank lock so concurrent requests can't interleave with this replay
+            with FUSION_ENGINE.lock:
+                wellness_indices = [
+                    FUSION_ENGINE.update_fusion(user_key, score, smoothed_T, smoothed_H, measurement_source='VSD')
+                    for score in vsd_risk_scores
+                ]
+            final_wellness_index = wellness_indices[-1]
+
+            response.update({
+                'final_wellness_indices': np.round(wellness_indices, 2).tolist(),
+                'fatigue_score': round(max(0.0, 100.0 - final_wellness_index), 2),
+                'current_temp_estimate': round(smoothed_T, 2),
+                'current_humidity_estimate': round(smoothed_H, 2),
+                'final_wellness_index': round(final_wellness_index, 2),
+                'recommendation': generate_wellness_recommendation(final_wellness_index, vsd_risk_scores[-1])
+            })
+
+        return jsonify(response)
+
+    except Exception as e:
+        app.logger.error(f'predict_features/batch error: {e}')
+        return jsonify({'error': f'Batch prediction failed: {e}'}), 500
+
+# ==========================================================
+# 📡 STREAMING ANALYSIS: push audio while it is being recorded
+#    POST /stream/open                  Body: { sample_rate: 16000, device_id: ..., user_id: ... }
+#    POST /stream/<id>/chunk            Body: raw PCM (application/octet-stream),
+#                                       headers X-Sample-Format: int16 | float32, X-Channels: 1
+#    POST /stream/<id>/finalize         -> same response as /analyze
+# ==========================================================
+@app.route('/stream/open', methods=['POST'])
+def open_stream():
+    if STREAM_SESSIONS is None:
+        return jsonify({'error': 'Streaming sessions are unavailable (service initialization failed)'}), 503
+    try:
+        data = request.get_json(silent=True) or {}
+        sample_rate = int(data.get('sample_rate', 16000))
+        if sample_rate <= 0:
+            return jsonify({'error': f'sample_rate must be positive, got {sample_rate}'}), 400
+        device_key, user_key = resolve_state_keys(data)
+        session_id = STREAM_SESSIONS.open(
+            sr=sample_rate,
+            pitch_backend=PITCH_BACKEND,
+            metadata={'device_key': device_key, 'user_key': user_key}
+        )
+        return jsonify({'status': 'success', 'session_id': session_id, 'sample_rate': sample_rate}), 201
+
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid stream parameters: {e}'}), 400
+
+@app.route('/stream/<session_id>/chunk', methods=['POST'])
+def push_stream_chunk(session_id):
+    if STREAM_SESSIONS is None:
+        return jsonify({'error': 'Streaming sessions are unavailable (service initialization failed)'}), 503
+    if request.content_length is None:
+        return jsonify({'error': 'Content-Length is required'}), 411
+    if request.content_length > app.config['MAX_PCM_BODY_BYTES']:
+        return jsonify({'error': f"PCM chunk larger than {app.config['MAX_PCM_BODY_BYTES']} bytes"}), 413
+
+    try:
+        samples = decode_pcm_bytes(
+            request.get_data(cache=False),
+            sample_format=request.headers.get('X-Sample-Format', 'int16'),
+            channels=request.headers.get('X-Channels', 1)
+        )
+        with stage('stream_push'):
+            received, frames = STREAM_SESSIONS.push(session_id, samples)
+        return jsonify({'status': 'success', 'received_samples': received, 'frames_processed': frames})
+
+    except StreamSessionError:
+        return jsonify({'error': f'Unknown or expired stream session {session_id}'}), 404
+
+    except ValueError as e:
+        return jsonify({'error': f'Invalid PCM chunk: {e}'}), 400
+
+@app.route('/stream/<session_id>/finalize', methods=['POST'])
+def finalize_stream(session_id):
+    if STREAM_SESSIONS is None:
+        return jsonify({'error': 'Streaming sessions are unavailable (service initialization failed)'}), 503
+    try:
+        with stage('stream_finalize'):
+            features, metadata = STREAM_SESSIONS.finalize(session_id)
+    except StreamSessionError:
+        return jsonify({'error': f'Unknown or expired stream session {session_id}'}), 404
+    except ValueError as e:
+        return jsonify({'error': f'Stream has no usable audio: {e}'}), 400
+
+    try:
+        features = features.tolist()
+        vsd_risk_score = predict_vsd_risk(features)
+
+        # Fusion with the state of the device / user given when the stream was opened
+        smoothed_T, smoothed_H = DHT_KALMAN_FILTER.estimate(metadata['device_key'])
+        final_wellness_index = FUSION_ENGINE.update_fusion(
+            metadata['user_key'], vsd_risk_score, smoothed_T, smoothed_H, measurement_source='VSD'
+        )
+
+        recommendation_text = generate_wellness_recommendation(final_wellness_index, vsd_risk_score)
+        fatigue_score = round(max(0.0, 100.0 - final_wellness_index), 2)
+
+        return jsonify({
+            'status': 'success',
+            'vsd_risk_score': round(vsd_risk_score, 2),
+            'fatigue_score': fatigue_score,
+            'current_temp_estimate': round(smoothed_T, 2),
+            'current_humidity_estimate': round(smoothed_H, 2),
+            'final_wellness_index': round(final_wellness_index, 2),
+            'recommendation': recommendation_text,
+            'features': features
+        })
+
+    except Exception as e:
+        app.logger.error(f'ML Processing Error in /stream finalize: {e}')
+        return jsonify({'error': f'ML Processing Error: {e}'}), 500
+
+# ==========================================================
+# 🗃️ FEATURE CACHE STATS (/feature_cache)
+# ==========================================================
+@app.route('/feature_cache', methods=['GET'])
+def feature_cache_stats():
+    if FEATURE_CACHE is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **FEATURE_CACHE.stats()})
+
+# ==========================================================
+# 💾 STATE STORE STATS (/state_store)
+# ==========================================================
+@app.route('/state_store', methods=['GET'])
+def state_store_stats():
+    if STATE_STORE is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **STATE_STORE.stats()})
+
+# ==========================================================
+# 🩺 HEALTH / READINESS (/healthz, /readyz)
+#    /healthz: the process is up and serving HTTP
+#    /readyz:  start-up finished, models loaded and warm-up succeeded (503 otherwise)
+# ==========================================================
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    checks = {
+        'initialized': SERVICE_INITIALIZED,
+        'models_loaded': VSD_MODEL_ERROR is None,
+        'warmed_up': WARMUP_STATE['status'] in ('ok', 'skipped')
+    }
+    ready = all(checks.values())
+    body = {
+        'status': 'ready' if ready else 'not ready',
+        'checks': checks,
+        'warmup': WARMUP_STATE,
+        'audio_stack_loaded': lazy_audio.audio_stack_loaded()
+    }
+    if VSD_MODEL_ERROR is not None:
+        body['model_error'] = VSD_MODEL_ERROR
+    return jsonify(body), 200 if ready else 503
+
+# ==========================================================
+# 📈 METRICS (/metrics, Prometheus text format)
+#    Per-stage latency histograms, request / error counters, in-flight gauges.
+#    Stages inside feature extraction run in the pool workers when the pool is enabled
+#    and are only recorded here for inline extraction.
+# ==========================================================
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    if not METRICS.enabled:
+        return jsonify({'error': 'metrics are disabled (METRICS_ENABLED=0)'}), 404
+    return METRICS.render(), 200, {'Content-Type': PROMETHEUS_CONTENT_TYPE}
+
 # ==========================================================
 # 🌡️ ENDPOINT 2: AMBIENT SENSING (/ambient)
 # Used by ESP32/another service
 # ==========================================================
 @app.route('/ambient', methods=['POST'])
 def update_ambient():
-    # Expects JSON data: {"temperature": 25.1, "humidity": 51.5}
+    # Expects JSON data: {"temperature": 25.1, "humidity": 51.5, "device_id": "room-1" (optional),
+    #                     "timestamp": 1718000000000 (optional, ms)}
     try:
         data = request.get_json()
         temp = float(data['temperature'])
         humidity = float(data['humidity'])
+        timestamp = resolve_timestamp(data)
+        device_key, user_key = resolve_state_keys(data)
         
-        # 1. Smooth the new readings
-        smoothed_T, smoothed_H = DHT_KALMAN_FILTER.update_filter(temp, humidity)
+        # 1. Smooth the new readings (an out-of-order reading leaves the estimate unchanged)
+        with stage('kalman'):
+            smoothed_T, smoothed_H = DHT_KALMAN_FILTER.update_filter(device_key, temp, humidity, timestamp=timestamp)
         
         # 2. Fusion: Use the smoothed ambient data (heuristic) as the measurement for state update
         # VSD score used here is arbitrary, as the source is AMBIENT
-        final_wellness_index = FUSION_ENGINE.update_fusion(
-            FUSION_ENGINE.wellness_estimate, 
-            smoothed_T, 
-            smoothed_H, 
-            measurement_source='AMBIENT' # <-- Ambient heuristic is the measurement
-        )
+        with stage('fusion'):
+            final_wellness_index = FUSION_ENGINE.update_fusion(
+                user_key,
+                FUSION_ENGINE.estimate(user_key), 
+                smoothed_T, 
+                smoothed_H, 
+                measurement_source='AMBIENT', # <-- Ambient heuristic is the measurement
+                timestamp=timestamp
+            )
 
         return jsonify({
             'status': 'success',
@@ -234,6 +694,18 @@ def update_ambient():
 # ==========================================================
 # 🏁 RUN APPLICATION
 # ==========================================================
+# Port of `python app.py` (ensure it matches what your Node.js gateway is calling)
+PORT = int(os.environ.get('PORT', 5001))
+# debug=True restarts the server when a source file changes; APP_RELOADER=0 turns that off
+USE_RELOADER = os.environ.get('APP_RELOADER', '1') == '1'
+
 if __name__ == '__main__':
-    # Ensure this port matches what your Node.js gateway is calling
-    app.run(debug=True, host='0.0.0.0', port=5001)
\ No newline at end of file
+    # With the reloader, this process only watches the files and runs the server in a child
+    # (WERKZEUG_RUN_MAIN=true): only that child may open STATE_DIR, the pool and the caches
+    if not USE_RELOADER or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        init_service()
+    app.run(debug=True, host='0.0.0.0', port=PORT, use_reloader=USE_RELOADER)
+elif __name__ != '__mp_main__':
+    # Imported by a WSGI server, the tests or the benchmarks. 'spawn' pool workers import this
+    # file as __mp_main__ when it was started as a script, and must not build a service
+    init_service()
\ No newline at end of file
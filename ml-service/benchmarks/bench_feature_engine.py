@@ -0,0 +1,50 @@
+"""
+Single-STFT feature engine vs. the original one-librosa-call-per-feature pipeline:
+per-clip timing on 5 s, 30 s and 120 s clips, plus the max deviation of the 16 features.
+
+Run from ml-service/:  python -m benchmarks.bench_feature_engine
+"""
+import time
+
+import numpy as np
+
+from utils.feature_extraction import (
+    compute_vsd_features,
+    compute_vsd_features_librosa,
+    FEATURE_PARITY_RTOL,
+    FEATURE_PARITY_ATOL,
+)
+
+SR = 16000
+CLIP_SECONDS = [5, 30, 120]
+REPEATS = 5
+
+
+def _make_voice_like(seconds, sr=SR, seed=0):
+    """Harmonic tone with a slow pitch glide plus noise, roughly speech-shaped."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sr)) / sr
+    f0 = 140 + 40 * np.sin(2 * np.pi * 0.3 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / sr
+    signal = sum(0.3 / k * np.sin(k * phase) for k in range(1, 6))
+    signal += 0.02 * rng.standard_normal(t.size)
+    return signal.astype(np.float32)
+
+
+def _time(fn, signal):
+    fn(signal, SR)  # warm up
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        result = fn(signal, SR)
+    return (time.perf_counter() - start) / REPEATS * 1000, result
+
+
+if __name__ == '__main__':
+    print(f"{'clip':>6} {'librosa (ms)':>13} {'stft (ms)':>10} {'speedup':>8} {'max |diff|':>11} {'parity':>7}")
+    for seconds in CLIP_SECONDS:
+        signal = _make_voice_like(seconds)
+        ref_ms, ref = _time(compute_vsd_features_librosa, signal)
+        new_ms, new = _time(compute_vsd_features, signal)
+        ok = np.allclose(new, ref, rtol=FEATURE_PARITY_RTOL, atol=FEATURE_PARITY_ATOL)
+        print(f"{seconds:>5}s {ref_ms:>13.1f} {new_ms:>10.1f} {ref_ms / new_ms:>7.2f}x "
+              f"{np.max(np.abs(new - ref)):>11.2e} {'ok' if ok else 'FAIL':>7}")
@@ -0,0 +1,64 @@
+"""
+Vectorized DHT22_KalmanFilterBank.update_many vs. one scalar DHT22_KalmanFilter per sensor:
+checks the estimates are bit-for-bit equal, then times a shared-clock tick for many sensors.
+
+Run from ml-service/:  python -m benchmarks.bench_filter_bank
+"""
+import time
+
+import numpy as np
+
+from utils.wellness_logic import DHT22_KalmanFilter, DHT22_KalmanFilterBank
+
+SENSOR_COUNTS = [10, 100, 1000, 10000]
+TICKS = 50
+
+
+def _readings(n_sensors, ticks, seed=0):
+    rng = np.random.default_rng(seed)
+    temps = 25 + 0.5 * rng.standard_normal((ticks, n_sensors))
+    hums = 50 + 2.0 * rng.standard_normal((ticks, n_sensors))
+    return temps, hums
+
+
+def check_equality(n_sensors=200, ticks=100):
+    temps, hums = _readings(n_sensors, ticks, seed=1)
+    ids = [f"node-{i}" for i in range(n_sensors)]
+    scalar = {key: DHT22_KalmanFilter(25.0, 50.0) for key in ids}
+    bank = DHT22_KalmanFilterBank(25.0, 50.0)
+
+    for t in range(ticks):
+        # Include a duplicate reading from node-0 to exercise the in-order rounds
+        tick_ids = ids + ids[:1]
+        tick_t = np.r_[temps[t], temps[t, 0] + 0.1]
+        tick_h = np.r_[hums[t], hums[t, 0] - 0.1]
+        est_t, est_h = bank.update_many(tick_ids, tick_t, tick_h)
+        expected = [scalar[key].update_filter(mt, mh) for key, mt, mh in zip(tick_ids, tick_t, tick_h)]
+        if not (np.array_equal(est_t, [e[0] for e in expected]) and np.array_equal(est_h, [e[1] for e in expected])):
+            return False
+    return all(
+        bank.estimate(key) == (scalar[key].temp_estimate, scalar[key].humidity_estimate) for key in ids
+    )
+
+
+if __name__ == '__main__':
+    print(f"update_many == scalar filters: {'yes' if check_equality() else 'NO'}")
+    print(f"{'sensors':>8} {'scalar (ms/tick)':>17} {'update_many (ms/tick)':>22} {'speedup':>8}")
+    for n in SENSOR_COUNTS:
+        temps, hums = _readings(n, TICKS)
+        ids = [f"node-{i}" for i in range(n)]
+
+        filters = [DHT22_KalmanFilter(25.0, 50.0) for _ in ids]
+        start = time.perf_counter()
+        for t in range(TICKS):
+            for kf, mt, mh in zip(filters, temps[t].tolist(), hums[t].tolist()):
+                kf.update_filter(mt, mh)
+        scalar_ms = (time.perf_counter() - start) / TICKS * 1000
+
+        bank = DHT22_KalmanFilterBank(25.0, 50.0)
+        start = time.perf_counter()
+        for t in range(TICKS):
+            bank.update_many(ids, temps[t], hums[t])
+        bank_ms = (time.perf_counter() - start) / TICKS * 1000
+
+        print(f"{n:>8} {scalar_ms:>17.3f} {bank_ms:>22.3f} {scalar_ms / bank_ms:>7.1f}x")
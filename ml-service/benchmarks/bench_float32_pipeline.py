@@ -0,0 +1,52 @@
+"""
+Peak memory and latency of extract_features_from_signal on 60 s clips (16 kHz, and 44.1 kHz
+which also resamples). Each case runs in a fresh process: after one warm-up clip, it reports
+mean latency, the tracemalloc peak of one further extraction once the pooled scratch
+buffers exist (NumPy allocations included) and the growth of peak RSS over the warm process.
+
+Run from ml-service/:  python -m benchmarks.bench_float32_pipeline
+"""
+import multiprocessing
+import resource
+import time
+import tracemalloc
+
+CLIP_SECONDS = 60
+SOURCE_RATES = [16000, 44100]
+REPEATS = 5
+
+
+def _measure(orig_sr, queue):
+    import librosa
+    from benchmarks.bench_feature_engine import _make_voice_like
+    from utils.wellness_logic import extract_features_from_signal
+
+    signal = _make_voice_like(CLIP_SECONDS)
+    if orig_sr != 16000:
+        signal = librosa.resample(signal, orig_sr=16000, target_sr=orig_sr)
+    extract_features_from_signal(signal[:orig_sr], orig_sr)  # warm up JIT / FFT plans
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        extract_features_from_signal(signal, orig_sr)
+    latency_ms = (time.perf_counter() - start) / REPEATS * 1000
+    rss_growth = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+
+    tracemalloc.start()
+    extract_features_from_signal(signal, orig_sr)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    queue.put((latency_ms, peak / 2 ** 20, rss_growth / 1024))
+
+
+if __name__ == '__main__':
+    ctx = multiprocessing.get_context('spawn')
+    print(f"{'rate':>6} {'latency (ms)':>13} {'alloc peak (MiB)':>17} {'RSS growth (MiB)':>17}")
+    for orig_sr in SOURCE_RATES:
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_measure, args=(orig_sr, queue))
+        proc.start()
+        latency_ms, peak_mib, rss_mib = queue.get()
+        proc.join()
+        print(f"{orig_sr:>6} {latency_ms:>13.1f} {peak_mib:>17.1f} {rss_mib:>17.1f}")
@@ -0,0 +1,48 @@
+"""
+MFCC means from the cached mel / DCT bases (utils.feature_extraction.mfcc_means) vs.
+librosa.feature.melspectrogram + power_to_db + mfcc on the same power spectrogram:
+per-clip timing and parity (max |diff| of the 13 means within FEATURE_PARITY_*).
+
+Run from ml-service/:  python -m benchmarks.bench_mfcc_bases
+"""
+import time
+
+import librosa
+import numpy as np
+
+from benchmarks.bench_feature_engine import _make_voice_like
+from utils.feature_extraction import (
+    N_FFT, HOP_LENGTH, N_MFCC, FEATURE_PARITY_RTOL, FEATURE_PARITY_ATOL, mfcc_bases, mfcc_means
+)
+
+SR = 16000
+CLIP_SECONDS = [1, 5, 30, 120]
+REPEATS = 10
+
+
+def _librosa_mfcc_means(power):
+    mel = librosa.feature.melspectrogram(S=power, sr=SR, n_fft=N_FFT)
+    return np.mean(librosa.feature.mfcc(S=librosa.power_to_db(mel), n_mfcc=N_MFCC), axis=1)
+
+
+def _time(fn, power):
+    fn(power)  # warm up
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        result = fn(power)
+    return (time.perf_counter() - start) / REPEATS * 1000, result
+
+
+if __name__ == '__main__':
+    start = time.perf_counter()
+    mfcc_bases(SR)
+    print(f"bases built in {(time.perf_counter() - start) * 1000:.1f} ms (once per process)\n")
+    print(f"{'clip':>6} {'librosa (ms)':>13} {'cached (ms)':>12} {'speedup':>8} {'max |diff|':>11} {'parity':>7}")
+    for seconds in CLIP_SECONDS:
+        signal = _make_voice_like(seconds)
+        power = np.abs(librosa.stft(signal, n_fft=N_FFT, hop_length=HOP_LENGTH, pad_mode='constant')) ** 2
+        ref_ms, ref = _time(_librosa_mfcc_means, power)
+        new_ms, new = _time(lambda p: mfcc_means(p, SR), power)
+        ok = np.allclose(new, ref, rtol=FEATURE_PARITY_RTOL, atol=FEATURE_PARITY_ATOL)
+        print(f"{seconds:>5}s {ref_ms:>13.2f} {new_ms:>12.2f} {ref_ms / new_ms:>7.1f}x "
+              f"{np.max(np.abs(new - ref)):>11.2e} {'ok' if ok else 'FAIL':>7}")
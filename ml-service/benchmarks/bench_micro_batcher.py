@@ -0,0 +1,89 @@
+"""
+Latency / throughput curve of /predict_features scoring + fusion, inline per request vs.
+through the MicroBatcher at several max-wait settings, with closed-loop client threads.
+Pass --sklearn to score with scaler + predict_proba instead of the fused kernel (where
+per-call overhead, and so the benefit of batching, is largest).
+
+Run from ml-service/:  python -m benchmarks.bench_micro_batcher [--sklearn]
+"""
+import os
+import sys
+import threading
+import time
+
+if '--sklearn' in sys.argv:
+    os.environ['VSD_FUSED_KERNEL'] = '0'
+
+import numpy as np
+
+from utils.micro_batcher import MicroBatcher
+from utils.wellness_logic import (
+    DHT22_KalmanFilterBank, WellnessFusionBank, predict_vsd_risk, predict_vsd_risk_batch
+)
+
+CLIENT_THREADS = [1, 8, 32, 128]
+REQUESTS_PER_THREAD = 200
+MAX_WAIT_MS = [0.5, 2.0, 5.0]
+MAX_ROWS = 64
+
+
+def _make_state():
+    return DHT22_KalmanFilterBank(25.0, 50.0), WellnessFusionBank(initial_wellness=80.0)
+
+
+def _inline_call(state):
+    dht, fusion = state
+
+    def call(row, user_key):
+        score = predict_vsd_risk(row)
+        t, h = dht.estimate(user_key)
+        return fusion.update_fusion(user_key, score, t, h, measurement_source='VSD')
+    return call, None
+
+
+def _batched_call(state, max_wait_ms):
+    dht, fusion = state
+
+    def finish(contexts, scores):
+        with fusion.lock:
+            return [fusion.update_fusion(key, score, *dht.estimate(key), measurement_source='VSD')
+                    for key, score in zip(contexts, scores)]
+
+    batcher = MicroBatcher(predict_vsd_risk_batch, finish=finish, max_rows=MAX_ROWS, max_wait_ms=max_wait_ms)
+    return (lambda row, user_key: batcher.submit(row, user_key).result()), batcher
+
+
+def _run(call, n_threads, rows):
+    latencies = [[] for _ in range(n_threads)]
+
+    def client(i):
+        for j in range(REQUESTS_PER_THREAD):
+            start = time.perf_counter()
+            call(rows[(i * REQUESTS_PER_THREAD + j) % len(rows)], f"user-{i % 16}")
+            latencies[i].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(n_threads)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    all_ms = np.concatenate(latencies) * 1000
+    return n_threads * REQUESTS_PER_THREAD / elapsed, np.percentile(all_ms, 50), np.percentile(all_ms, 99)
+
+
+if __name__ == '__main__':
+    rows = np.random.default_rng(0).normal(size=(4096, 16))
+    print(f"scoring: {'sklearn predict_proba' if '--sklearn' in sys.argv else 'fused kernel'}")
+    print(f"{'clients':>8} {'mode':>22} {'req/s':>10} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    for n_threads in CLIENT_THREADS:
+        modes = [('inline', lambda: _inline_call(_make_state()))]
+        modes += [(f'batch {w:g} ms', lambda w=w: _batched_call(_make_state(), w)) for w in MAX_WAIT_MS]
+        for name, make in modes:
+            call, batcher = make()
+            throughput, p50, p99 = _run(call, n_threads, rows)
+            if batcher is not None:
+                batcher.shutdown()
+                name += f" ({batcher.rows / max(batcher.batches, 1):.0f}/b)"
+            print(f"{n_threads:>8} {name:>22} {throughput:>10.0f} {p50:>9.3f} {p99:>9.3f}")
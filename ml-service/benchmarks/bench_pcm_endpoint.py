@@ -0,0 +1,64 @@
+"""
+Raw PCM (/analyze/pcm) vs. multipart WAV (/analyze) through the Flask test client:
+decode-only cost of each body format and full request latency, on 16 kHz int16 clips
+(the ESP32 / INMP441 format). The feature cache is disabled so every request extracts.
+
+Run from ml-service/:  python -m benchmarks.bench_pcm_endpoint
+"""
+import io
+import os
+import time
+
+os.environ['FEATURE_CACHE_ENABLED'] = '0'
+
+import numpy as np
+import soundfile as sf
+from werkzeug.datastructures import FileStorage
+
+from app import app
+from benchmarks.bench_feature_engine import _make_voice_like
+from utils.audio_utils import decode_pcm_bytes, load_upload
+
+SR = 16000
+CLIP_SECONDS = [1, 5, 30]
+REPEATS = 20
+
+
+def _pcm_bytes(seconds):
+    return (_make_voice_like(seconds) * 32767).astype('<i2').tobytes()
+
+
+def _wav_bytes(pcm):
+    buf = io.BytesIO()
+    sf.write(buf, np.frombuffer(pcm, dtype='<i2'), SR, format='WAV', subtype='PCM_16')
+    return buf.getvalue()
+
+
+def _time(fn):
+    fn()  # warm up
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        result = fn()
+    return (time.perf_counter() - start) / REPEATS * 1000, result
+
+
+if __name__ == '__main__':
+    client = app.test_client()
+    print(f"{'clip':>6} {'wav decode (ms)':>16} {'pcm decode (ms)':>16} "
+          f"{'/analyze (ms)':>14} {'/analyze/pcm (ms)':>18} {'same features':>14}")
+    for seconds in CLIP_SECONDS:
+        pcm = _pcm_bytes(seconds)
+        wav = _wav_bytes(pcm)
+
+        wav_decode_ms, _ = _time(lambda: load_upload(FileStorage(stream=io.BytesIO(wav), filename='clip.wav')))
+        pcm_decode_ms, _ = _time(lambda: decode_pcm_bytes(pcm, 'int16', 1))
+
+        wav_ms, wav_resp = _time(lambda: client.post(
+            '/analyze', data={'audio': (io.BytesIO(wav), 'clip.wav')}, content_type='multipart/form-data'))
+        pcm_ms, pcm_resp = _time(lambda: client.post(
+            '/analyze/pcm', data=pcm, content_type='application/octet-stream',
+            headers={'X-Sample-Rate': str(SR), 'X-Channels': '1', 'X-Sample-Format': 'int16'}))
+
+        same = np.allclose(wav_resp.get_json()['features'], pcm_resp.get_json()['features'])
+        print(f"{seconds:>5}s {wav_decode_ms:>16.3f} {pcm_decode_ms:>16.3f} "
+              f"{wav_ms:>14.2f} {pcm_ms:>18.2f} {'yes' if same else 'NO':>14}")
@@ -0,0 +1,51 @@
+"""
+Cached per-rate resampling plans (utils.resampling.resample) vs. librosa.resample, which
+builds a new soxr resampler on every call: per-clip latency for the rates our devices send
+and the max sample deviation against librosa (must stay within RESAMPLE_PARITY_ATOL), plus
+output length and parity for clip lengths that are not a whole number of output samples.
+
+Run from ml-service/:  python -m benchmarks.bench_resampling
+"""
+import time
+
+import librosa
+import numpy as np
+
+from benchmarks.bench_feature_engine import _make_voice_like
+from utils.resampling import resample, RESAMPLE_PARITY_ATOL
+
+TARGET_SR = 16000
+SOURCE_RATES = [44100, 48000, 22050, 8000, 16000]
+CLIP_SECONDS = [1, 5, 30]
+REPEATS = 20
+# Lengths where ceil(n * ratio) is not what soxr emits on its own (n=1 used to come back empty)
+UNEVEN_LENGTHS = [1, 100, 4411, 132307]
+
+
+def _time(fn):
+    fn()  # warm up
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        result = fn()
+    return (time.perf_counter() - start) / REPEATS * 1000, result
+
+
+if __name__ == '__main__':
+    print(f"{'rate':>6} {'clip':>5} {'librosa (ms)':>13} {'cached (ms)':>12} {'speedup':>8} {'max |diff|':>11} {'parity':>7}")
+    for orig_sr in SOURCE_RATES:
+        for seconds in CLIP_SECONDS:
+            signal = librosa.resample(_make_voice_like(seconds), orig_sr=TARGET_SR, target_sr=orig_sr)
+            ref_ms, ref = _time(lambda: librosa.resample(signal, orig_sr=orig_sr, target_sr=TARGET_SR))
+            new_ms, new = _time(lambda: resample(signal, orig_sr, TARGET_SR))
+            ok = new.shape == ref.shape and np.allclose(new, ref, rtol=0, atol=RESAMPLE_PARITY_ATOL)
+            print(f"{orig_sr:>6} {seconds:>4}s {ref_ms:>13.3f} {new_ms:>12.3f} {ref_ms / new_ms:>7.1f}x "
+                  f"{np.max(np.abs(new - ref)):>11.2e} {'ok' if ok else 'FAIL':>7}")
+
+    print(f"\n{'rate':>6} {'samples':>8} {'librosa len':>12} {'cached len':>11} {'parity':>7}")
+    for orig_sr in SOURCE_RATES[:-1]:
+        for n in UNEVEN_LENGTHS:
+            signal = _make_voice_like(10)[:n]
+            ref = librosa.resample(signal, orig_sr=orig_sr, target_sr=TARGET_SR)
+            new = resample(signal, orig_sr, TARGET_SR)
+            ok = new.shape == ref.shape and np.allclose(new, ref, rtol=0, atol=RESAMPLE_PARITY_ATOL)
+            print(f"{orig_sr:>6} {n:>8} {ref.size:>12} {new.size:>11} {'ok' if ok else 'FAIL':>7}")
@@ -0,0 +1,71 @@
+"""
+Fused scaler+logistic NumPy kernel vs. sklearn's transform + predict_proba:
+parity on random inputs and per-call latency for single rows and batches.
+
+Run from ml-service/:  python -m benchmarks.bench_scoring_kernel
+"""
+import time
+
+import numpy as np
+
+from utils import wellness_logic
+from utils.wellness_logic import VSD_MODEL, VSD_SCALER, VSD_FEATURE_DIM
+
+PARITY_ROWS = 10000
+PARITY_ATOL = 1e-9
+SINGLE_CALLS = 5000
+BATCH_ROWS = 1000
+
+
+def _sklearn_risk(X):
+    return np.clip(100 - VSD_MODEL.predict_proba(VSD_SCALER.transform(X))[:, 1] * 100, 0, 100)
+
+
+def _with_kernel(enabled, fn, *args):
+    saved = wellness_logic.VSD_FUSED_KERNEL
+    wellness_logic.VSD_FUSED_KERNEL = saved if enabled else None
+    try:
+        return fn(*args)
+    finally:
+        wellness_logic.VSD_FUSED_KERNEL = saved
+
+
+def _time_single(rows):
+    start = time.perf_counter()
+    for row in rows:
+        wellness_logic.predict_vsd_risk(row)
+    return (time.perf_counter() - start) / len(rows) * 1e6
+
+
+def _time_batch(X, repeats=50):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        wellness_logic.predict_vsd_risk_batch(X)
+    return (time.perf_counter() - start) / repeats * 1e3
+
+
+if __name__ == '__main__':
+    if wellness_logic.VSD_FUSED_KERNEL is None:
+        raise SystemExit("Fused kernel is disabled or unavailable for this model.")
+
+    rng = np.random.default_rng(42)
+    X = VSD_SCALER.mean_ + VSD_SCALER.scale_ * rng.standard_normal((PARITY_ROWS, VSD_FEATURE_DIM)) * 3
+
+    fused = wellness_logic.predict_vsd_risk_batch(X)
+    reference = _sklearn_risk(X)
+    max_err = np.max(np.abs(fused - reference))
+    single_ok = all(
+        np.isclose(wellness_logic.predict_vsd_risk(list(row)), ref, rtol=0, atol=PARITY_ATOL)
+        for row, ref in zip(X[:500], reference[:500])
+    )
+    print(f"parity: max |fused - sklearn| = {max_err:.2e} over {PARITY_ROWS} rows "
+          f"({'ok' if max_err <= PARITY_ATOL and single_ok else 'FAIL'})")
+
+    rows = [list(r) for r in X[:SINGLE_CALLS]]
+    sk_single = _with_kernel(False, _time_single, rows)
+    fu_single = _with_kernel(True, _time_single, rows)
+    print(f"single row : sklearn {sk_single:7.1f} us  fused {fu_single:7.1f} us  ({sk_single / fu_single:.1f}x)")
+
+    sk_batch = _with_kernel(False, _time_batch, X[:BATCH_ROWS])
+    fu_batch = _with_kernel(True, _time_batch, X[:BATCH_ROWS])
+    print(f"{BATCH_ROWS} rows : sklearn {sk_batch:7.3f} ms  fused {fu_batch:7.3f} ms  ({sk_batch / fu_batch:.1f}x)")
@@ -0,0 +1,51 @@
+"""
+Cold-start cost of the ml-service per AUDIO_IMPORT_MODE (eager / lazy / background), each
+measured in fresh interpreters: time until `import app` returns (the server can accept
+requests), then time to the first /predict_features and the first /analyze response, and
+whether librosa / numba were imported by the time /predict_features answered.
+
+Run from ml-service/:  python -m benchmarks.bench_startup
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from utils.lazy_audio import AUDIO_IMPORT_MODES
+
+RUNS = 3
+
+_CHILD = r'''
+import io, json, sys, time
+start = time.perf_counter()
+import numpy as np, soundfile as sf
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+client.post('/predict_features', json={'features': [0.1] * 16})
+predicted = time.perf_counter()
+heavy = {'librosa': 'librosa.filters' in sys.modules, 'numba': 'numba' in sys.modules}
+buf = io.BytesIO()
+sf.write(buf, 0.3 * np.sin(np.arange(16000) * 0.06), 16000, format='WAV', subtype='PCM_16')
+buf.seek(0)
+client.post('/analyze', data={'audio': (buf, 'clip.wav')})
+analyzed = time.perf_counter()
+print(json.dumps({'import': imported - start, 'predict': predicted - start,
+                  'analyze': analyzed - start, **heavy}))
+'''
+
+
+def _run(mode):
+    env = dict(os.environ, AUDIO_IMPORT_MODE=mode, FEATURE_CACHE_ENABLED='0')
+    out = subprocess.run([sys.executable, '-c', _CHILD], env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+if __name__ == '__main__':
+    print(f"{'mode':>11} {'app ready (s)':>14} {'1st predict (s)':>16} {'1st analyze (s)':>16} {'librosa@predict':>16}")
+    for mode in AUDIO_IMPORT_MODES:
+        runs = [_run(mode) for _ in range(RUNS)]
+        median = {key: statistics.median(r[key] for r in runs) for key in ('import', 'predict', 'analyze')}
+        print(f"{mode:>11} {median['import']:>14.2f} {median['predict']:>16.2f} {median['analyze']:>16.2f} "
+              f"{'yes' if runs[-1]['librosa'] else 'no':>16}")
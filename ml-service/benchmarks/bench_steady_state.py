@@ -0,0 +1,57 @@
+"""
+Steady-state Kalman gain mode vs. the full covariance/gain recomputation, per update,
+for DHT22_KalmanFilter and WellnessFusionEngine (both in their converged regime),
+plus the largest estimate deviation the switch-over introduces.
+
+Run from ml-service/:  python -m benchmarks.bench_steady_state
+"""
+import time
+
+import numpy as np
+
+from utils.wellness_logic import DHT22_KalmanFilter, WellnessFusionEngine
+
+WARMUP_UPDATES = 500
+UPDATES = 100000
+
+
+def _dht22_run(steady_state, temps, hums):
+    kf = DHT22_KalmanFilter(25.0, 50.0, steady_state=steady_state)
+    for t, h in zip(temps[:WARMUP_UPDATES], hums[:WARMUP_UPDATES]):
+        kf.update_filter(t, h)
+    estimates = []
+    start = time.perf_counter()
+    for t, h in zip(temps[WARMUP_UPDATES:], hums[WARMUP_UPDATES:]):
+        estimates.append(kf.update_filter(t, h))
+    return (time.perf_counter() - start) / (len(temps) - WARMUP_UPDATES) * 1e9, np.array(estimates)
+
+
+def _fusion_run(steady_state, scores, source):
+    engine = WellnessFusionEngine(80.0, steady_state=steady_state)
+    for v in scores[:WARMUP_UPDATES]:
+        engine.update_fusion(v, 25.0, 50.0, measurement_source=source)
+    estimates = []
+    start = time.perf_counter()
+    for v in scores[WARMUP_UPDATES:]:
+        estimates.append(engine.update_fusion(v, 25.0, 50.0, measurement_source=source))
+    return (time.perf_counter() - start) / (len(scores) - WARMUP_UPDATES) * 1e9, np.array(estimates)
+
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+    n = WARMUP_UPDATES + UPDATES
+    temps = (25 + 0.5 * rng.standard_normal(n)).tolist()
+    hums = (50 + 2.0 * rng.standard_normal(n)).tolist()
+    scores = rng.uniform(0, 100, n).tolist()
+
+    print(f"{'filter':>22} {'full (ns)':>10} {'steady (ns)':>12} {'speedup':>8} {'max |diff|':>11}")
+    full_ns, full_est = _dht22_run(False, temps, hums)
+    ss_ns, ss_est = _dht22_run(True, temps, hums)
+    print(f"{'DHT22 update_filter':>22} {full_ns:>10.0f} {ss_ns:>12.0f} {full_ns / ss_ns:>7.2f}x "
+          f"{np.max(np.abs(full_est - ss_est)):>11.2e}")
+
+    for source in ('VSD', 'AMBIENT'):
+        full_ns, full_est = _fusion_run(False, scores, source)
+        ss_ns, ss_est = _fusion_run(True, scores, source)
+        print(f"{'fusion (' + source + ')':>22} {full_ns:>10.0f} {ss_ns:>12.0f} {full_ns / ss_ns:>7.2f}x "
+              f"{np.max(np.abs(full_est - ss_est)):>11.2e}")
@@ -0,0 +1,53 @@
+"""
+Streaming sessions vs. whole-clip extraction: time from the last audio byte to the 16 features
+(finalize vs. compute_vsd_features on the full clip), plus parity of the streamed features
+for several chunk sizes, including a 44.1 kHz stream resampled on the fly.
+
+Run from ml-service/:  python -m benchmarks.bench_streaming
+"""
+import time
+
+import librosa
+import numpy as np
+
+from benchmarks.bench_feature_engine import _make_voice_like
+from utils.feature_extraction import compute_vsd_features
+from utils.streaming import StreamingFeatureExtractor, STREAM_PARITY_RTOL, STREAM_PARITY_ATOL
+
+SR = 16000
+CLIP_SECONDS = [5, 30, 120]
+CHUNK_SAMPLES = [160, 1600, 16000]  # 10 ms, 100 ms, 1 s
+
+
+def _stream(signal, sr, chunk):
+    extractor = StreamingFeatureExtractor(sr=sr)
+    start = time.perf_counter()
+    for i in range(0, signal.size, chunk):
+        extractor.push(signal[i:i + chunk])
+    pushed = time.perf_counter()
+    features = extractor.finalize()
+    return (pushed - start) * 1000, (time.perf_counter() - pushed) * 1000, features
+
+
+if __name__ == '__main__':
+    compute_vsd_features(_make_voice_like(1), SR)  # warm up numba / FFT plans
+    print(f"{'clip':>6} {'chunk':>6} {'whole clip (ms)':>16} {'push total (ms)':>16} "
+          f"{'finalize (ms)':>14} {'max |diff|':>11} {'parity':>7}")
+    for seconds in CLIP_SECONDS:
+        signal = _make_voice_like(seconds)
+        start = time.perf_counter()
+        ref = compute_vsd_features(signal, SR)
+        whole_ms = (time.perf_counter() - start) * 1000
+        for chunk in CHUNK_SAMPLES:
+            push_ms, finalize_ms, features = _stream(signal, SR, chunk)
+            ok = np.allclose(features, ref, rtol=STREAM_PARITY_RTOL, atol=STREAM_PARITY_ATOL)
+            print(f"{seconds:>5}s {chunk:>6} {whole_ms:>16.1f} {push_ms:>16.1f} {finalize_ms:>14.2f} "
+                  f"{np.max(np.abs(features - ref)):>11.2e} {'ok' if ok else 'FAIL':>7}")
+
+    # 44.1 kHz stream: resampled chunk by chunk vs. librosa.resample of the whole clip
+    signal = librosa.resample(_make_voice_like(10), orig_sr=SR, target_sr=44100)
+    ref = compute_vsd_features(librosa.resample(signal, orig_sr=44100, target_sr=SR), SR)
+    _, finalize_ms, features = _stream(signal, 44100, 4410)
+    ok = np.allclose(features, ref, rtol=STREAM_PARITY_RTOL, atol=STREAM_PARITY_ATOL)
+    print(f"\n44.1 kHz stream (10 s, 100 ms chunks): finalize {finalize_ms:.2f} ms, "
+          f"max |diff| {np.max(np.abs(features - ref)):.2e} {'ok' if ok else 'FAIL'}")
@@ -0,0 +1,123 @@
+"""
+Timestamp-aware Kalman updates: readings spaced exactly one Q interval apart must match the
+untimestamped filter bit for bit; then what elapsed-time scaling changes (gain after a long
+gap, covariance after a burst), how out-of-order readings and a sender clock reset are
+handled, that a sender jumping from millis() to epoch seconds scales Q for at most
+KALMAN_MAX_GAP_SECONDS, and the per-update cost with and without timestamps after short and long histories
+(it must not grow with the history).
+
+Run from ml-service/:  python -m benchmarks.bench_timestamped_kalman
+"""
+import math
+import time
+
+from benchmarks.synthetic import synthetic_sensor_stream
+from utils.wellness_logic import (
+    DHT22_KalmanFilter, DHT22_KalmanFilterBank, WellnessFusionBank, KALMAN_Q_INTERVAL_SECONDS,
+    KALMAN_REORDER_WINDOW_SECONDS, KALMAN_MAX_GAP_SECONDS
+)
+
+PARITY_UPDATES = 5000
+BURST_READINGS = 100
+BURST_SPACING_SECONDS = 0.01
+GAP_SECONDS = 6 * 3600
+HISTORY_LENGTHS = [1000, 100000]
+TIMED_UPDATES = 20000
+
+
+def _parity():
+    temps, hums = synthetic_sensor_stream(PARITY_UPDATES)
+    plain = DHT22_KalmanFilter(25.0, 50.0)
+    timed = DHT22_KalmanFilter(25.0, 50.0)
+    fusion_plain, fusion_timed = WellnessFusionBank(), WellnessFusionBank()
+    same = True
+    for i, (t, h) in enumerate(zip(temps.tolist(), hums.tolist())):
+        stamp = 1.7e9 + i * KALMAN_Q_INTERVAL_SECONDS
+        same &= plain.update_filter(t, h) == timed.update_filter(t, h, timestamp=stamp)
+        same &= fusion_plain.update_fusion('u', t, t, h) == fusion_timed.update_fusion('u', t, t, h, timestamp=stamp)
+    print(f"{PARITY_UPDATES} readings one Q interval apart vs untimestamped: {'identical' if same else 'MISMATCH'}")
+    return same
+
+
+def _gain_after(kf, gap, reading):
+    """Fraction of the residual the next reading moves the estimate by, `gap` seconds later."""
+    before = kf.temp_estimate
+    after, _ = kf.update_filter(reading, 50.0, timestamp=kf.last_time + gap)
+    return (after - before) / (reading - before)
+
+
+def _behaviour():
+    print(f"\n{'scenario':>38} {'constant Q':>11} {'elapsed-time Q':>15}")
+    settled = []
+    for timed in (False, True):
+        kf = DHT22_KalmanFilter(25.0, 50.0)
+        for i in range(200):
+            kf.update_filter(25.0, 50.0, timestamp=i * KALMAN_Q_INTERVAL_SECONDS if timed else None)
+        settled.append(kf)
+    constant_gain = settled[0].P_temp + settled[0].Q
+    constant_gain /= constant_gain + settled[0].R_temp
+    print(f"{f'gain on a reading {GAP_SECONDS // 3600} h after the last':>38} {constant_gain:>11.3f} "
+          f"{_gain_after(settled[1], GAP_SECONDS, 30.0):>15.3f}")
+
+    burst = []
+    for timed in (False, True):
+        kf = DHT22_KalmanFilter(25.0, 50.0)
+        for i in range(BURST_READINGS):
+            kf.update_filter(25.0, 50.0, timestamp=i * BURST_SPACING_SECONDS if timed else None)
+        burst.append(kf.P_temp)
+    label = f'P_temp after {BURST_READINGS} readings {BURST_SPACING_SECONDS * 1000:.0f} ms apart'
+    print(f"{label:>38} {burst[0]:>11.4f} {burst[1]:>15.4f}")
+
+    # Out of order: every 10th reading arrives 2 s late (inside the reorder window), then the
+    # sender reboots and its clock restarts from zero
+    kf = DHT22_KalmanFilter(25.0, 50.0)
+    late = applied = 0
+    for i in range(1000):
+        stamp = 1000.0 + i - (2.0 if i % 10 == 9 else 0.0)
+        before = kf.last_time
+        kf.update_filter(25.0, 50.0, timestamp=stamp)
+        late += stamp < before
+        applied += kf.last_time == stamp
+    kf.update_filter(25.0, 50.0, timestamp=0.0)
+    print(f"\nout of order: {late} late readings (reorder window {KALMAN_REORDER_WINDOW_SECONDS:.0f}s) dropped, "
+          f"{applied} applied; clock reset to 0 accepted: {kf.last_time == 0.0}")
+    ok = applied == 1000 - late and kf.last_time == 0.0
+
+    # Units mix-up: millis()-style seconds since boot, then epoch seconds (a ~1.7e9 s jump). Q
+    # grows as for KALMAN_MAX_GAP_SECONDS, exactly like a genuine gap of that length
+    jumped, gap = DHT22_KalmanFilter(25.0, 50.0), DHT22_KalmanFilter(25.0, 50.0)
+    for i in range(200):
+        jumped.update_filter(25.0, 50.0, timestamp=float(i))
+        gap.update_filter(25.0, 50.0, timestamp=float(i))
+    jumped.update_filter(30.0, 50.0, timestamp=1.7e9)
+    gap.update_filter(30.0, 50.0, timestamp=199.0 + KALMAN_MAX_GAP_SECONDS)
+    bounded = math.isfinite(jumped.P_temp) and (jumped.temp_estimate, jumped.P_temp) == (gap.temp_estimate, gap.P_temp)
+    jumped.update_filter(30.0, 50.0, timestamp=1.7e9 + 1)
+    print(f"clock jump of {1.7e9 - 199:.2e}s: P_temp {gap.P_temp:.4f} (as a {KALMAN_MAX_GAP_SECONDS / 3600:.0f} h gap: "
+          f"{bounded}), next reading applied: {jumped.last_time == 1.7e9 + 1}")
+    return ok and bounded and jumped.last_time == 1.7e9 + 1
+
+
+def _cost():
+    print(f"\n{'history (updates/key)':>22} {'untimestamped (us)':>19} {'timestamped (us)':>17}")
+    temps, hums = synthetic_sensor_stream(TIMED_UPDATES)
+    temps, hums = temps.tolist(), hums.tolist()
+    for history in HISTORY_LENGTHS:
+        row = []
+        for timed in (False, True):
+            bank = DHT22_KalmanFilterBank(25.0, 50.0)
+            for i in range(history):
+                bank.update_filter('device', 25.0, 50.0, timestamp=float(i) if timed else None)
+            stamps = [float(history + i) if timed else None for i in range(TIMED_UPDATES)]
+            start = time.perf_counter()
+            for t, h, stamp in zip(temps, hums, stamps):
+                bank.update_filter('device', t, h, timestamp=stamp)
+            row.append((time.perf_counter() - start) / TIMED_UPDATES * 1e6)
+        print(f"{history:>22} {row[0]:>19.2f} {row[1]:>17.2f}")
+
+
+if __name__ == '__main__':
+    ok = _parity()
+    ok = _behaviour() and ok
+    _cost()
+    raise SystemExit(0 if ok else 1)
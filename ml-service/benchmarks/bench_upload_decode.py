@@ -0,0 +1,62 @@
+"""
+Per-request latency of the /analyze upload path: the old save -> librosa.load -> unlink
+round trip through temp_uploads/ versus decoding the FileStorage stream in memory.
+
+Run from ml-service/:  python -m benchmarks.bench_upload_decode
+"""
+import io
+import os
+import time
+
+import numpy as np
+import soundfile as sf
+import librosa
+from werkzeug.datastructures import FileStorage
+
+from utils.audio_utils import load_upload
+
+SPILL_DIR = 'temp_uploads'
+CLIP_SECONDS = [5, 30, 120]
+REPEATS = 20
+
+
+def _make_wav_bytes(seconds, sr=44100):
+    t = np.arange(int(seconds * sr)) / sr
+    signal = 0.3 * np.sin(2 * np.pi * 180.0 * t)
+    buf = io.BytesIO()
+    sf.write(buf, signal, sr, format='WAV', subtype='PCM_16')
+    return buf.getvalue()
+
+
+def _disk_round_trip(data):
+    file = FileStorage(stream=io.BytesIO(data), filename='clip.wav')
+    filepath = os.path.join(SPILL_DIR, f"temp_{time.time()}.wav")
+    file.save(filepath)
+    try:
+        return librosa.load(filepath, sr=None)
+    finally:
+        if os.path.exists(filepath):
+            os.remove(filepath)
+
+
+def _in_memory(data):
+    file = FileStorage(stream=io.BytesIO(data), filename='clip.wav')
+    return load_upload(file, spill_dir=SPILL_DIR, max_in_memory_bytes=64 * 1024 * 1024)
+
+
+def _time(fn, data):
+    fn(data)  # warm up
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        fn(data)
+    return (time.perf_counter() - start) / REPEATS * 1000
+
+
+if __name__ == '__main__':
+    os.makedirs(SPILL_DIR, exist_ok=True)
+    print(f"{'clip':>6} {'disk (ms)':>10} {'memory (ms)':>12} {'speedup':>8}")
+    for seconds in CLIP_SECONDS:
+        data = _make_wav_bytes(seconds)
+        disk_ms = _time(_disk_round_trip, data)
+        mem_ms = _time(_in_memory, data)
+        print(f"{seconds:>5}s {disk_ms:>10.2f} {mem_ms:>12.2f} {disk_ms / mem_ms:>7.1f}x")
@@ -0,0 +1,418 @@
+"""
+Closed-loop HTTP load generator for the ml-service. `--concurrency` client threads each send
+a request, wait for the full response and immediately send the next, picking endpoints by
+the weights in `--mix` and payloads from pre-built synthetic WAVs / PCM clips / feature
+vectors / sensor readings. Latencies after the warm-up go into HDR-style log-linear
+histograms (3 significant digits, per endpoint and overall); the report gives throughput,
+p50 / p95 / p99 / p99.9 / max and status counts, and --hgrm writes the full percentile
+distributions in the HdrHistogram .hgrm text layout.
+
+By default the app is started in a separate local process (threaded werkzeug server with
+HTTP/1.1 keep-alive, so clients and server do not share a GIL) and stopped afterwards; it
+inherits this environment, so e.g. FEATURE_CACHE_ENABLED=0 or FEATURE_POOL_WORKERS=4 apply
+to it. --url drives a server that is already running instead. Only the standard library,
+numpy and soundfile are used.
+
+Run from ml-service/:
+    python -m benchmarks.loadgen --mix analyze=1,predict_features=8,ambient=4 --concurrency 16 --duration 30
+    python -m benchmarks.loadgen --mix analyze=1 --clip-seconds 1,5,30 --hgrm /tmp/hgrm
+    python -m benchmarks.loadgen --url http://127.0.0.1:5001 --json /tmp/load.json
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+from benchmarks.synthetic import (
+    AUDIO_KINDS, SEED, pcm16_bytes, synthetic_audio, synthetic_feature_rows, synthetic_sensor_stream, wav_bytes
+)
+
+ENDPOINTS = ('analyze', 'analyze_pcm', 'predict_features', 'predict_batch', 'ambient')
+DEFAULT_MIX = 'analyze=1,predict_features=8,ambient=4'
+REPORT_PERCENTILES = (50.0, 95.0, 99.0, 99.9)
+# Latencies above this are recorded as this value
+HISTOGRAM_HIGHEST_US = 60 * 1000 * 1000
+READY_TIMEOUT_SECONDS = 120
+
+
+# ==========================================================
+# 1. HDR-Style Latency Histogram
+# ==========================================================
+
+class LatencyHistogram:
+    """
+    Log-linear histogram of integer microsecond values in the HdrHistogram layout: values below
+    2 * 10**significant_figures (rounded up to a power of two) get exact buckets, every further
+    power of two is split into the same number of equal sub-buckets, so any recorded value is
+    reported to within 10**-significant_figures relative error in constant memory. Not
+    thread-safe; give each thread its own and merge().
+    """
+    def __init__(self, significant_figures=3, highest_us=HISTOGRAM_HIGHEST_US):
+        sub_bucket_count = 1 << math.ceil(math.log2(2 * 10 ** significant_figures))
+        self._sub_bits = sub_bucket_count.bit_length() - 1
+        self._half = sub_bucket_count // 2
+        self.highest_us = int(highest_us)
+        self.counts = [0] * (self._index(self.highest_us) + 1)
+        self.total = 0
+        self.sum_us = 0
+        self.sum_sq_us = 0
+        self.max_us = 0
+
+    def _index(self, value):
+        shift = value.bit_length() - self._sub_bits
+        if shift <= 0:
+            return value
+        return (shift + 1) * self._half + (value >> shift) - self._half
+
+    def _highest_equivalent(self, index):
+        if index < 2 * self._half:
+            return index
+        shift = index // self._half - 1
+        low = (index % self._half + self._half) << shift
+        return low + (1 << shift) - 1
+
+    def record(self, value_us):
+        value = min(max(int(value_us), 0), self.highest_us)
+        self.counts[self._index(value)] += 1
+        self.total += 1
+        self.sum_us += value
+        self.sum_sq_us += value * value
+        if value > self.max_us:
+            self.max_us = value
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.total += other.total
+        self.sum_us += other.sum_us
+        self.sum_sq_us += other.sum_sq_us
+        self.max_us = max(self.max_us, other.max_us)
+        return self
+
+    def mean_us(self):
+        return self.sum_us / self.total if self.total else 0.0
+
+    def stdev_us(self):
+        if not self.total:
+            return 0.0
+        return math.sqrt(max(self.sum_sq_us / self.total - self.mean_us() ** 2, 0.0))
+
+    def percentile_us(self, percentile):
+        """Highest value equivalent to the `percentile`-th recorded value (HdrHistogram convention)."""
+        if not self.total:
+            return 0
+        if percentile >= 100.0:
+            return self.max_us
+        target = max(1, math.ceil(percentile / 100.0 * self.total))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self._highest_equivalent(index), self.max_us)
+        return self.max_us
+
+    def percentile_distribution(self, ticks_per_half_distance=5, unit_scale=1000.0):
+        """The .hgrm text: value (ms), percentile, total count, 1/(1-percentile)."""
+        lines = [f"{'Value':>12} {'Percentile':>14} {'TotalCount':>10} {'1/(1-Percentile)':>14}", '']
+        tick = 0
+        while True:
+            fraction = 1.0 - 0.5 ** (tick / ticks_per_half_distance)
+            if self.total and fraction >= 1.0 - 1.0 / self.total:
+                break
+            value = self.percentile_us(fraction * 100.0)
+            count = sum(c for i, c in enumerate(self.counts) if self._highest_equivalent(i) <= value)
+            lines.append(f"{value / unit_scale:>12.3f} {fraction:>14.12f} {count:>10d} {1.0 / (1.0 - fraction):>14.2f}")
+            tick += 1
+        lines.append(f"{self.max_us / unit_scale:>12.3f} {1.0:>14.12f} {self.total:>10d}")
+        lines.append(f"#[Mean    = {self.mean_us() / unit_scale:>12.3f}, StdDeviation   = {self.stdev_us() / unit_scale:>12.3f}]")
+        lines.append(f"#[Max     = {self.max_us / unit_scale:>12.3f}, Total count    = {self.total:>12d}]")
+        lines.append(f"#[Buckets = {len(self.counts):>12d}, SubBuckets     = {2 * self._half:>12d}]")
+        return '\n'.join(lines) + '\n'
+
+
+# ==========================================================
+# 2. Payloads (method, path, body, headers), built once up front
+# ==========================================================
+
+def parse_mix(text):
+    """'analyze=1,ambient=4' -> {'analyze': 1.0, 'ambient': 4.0}"""
+    mix = {}
+    for part in filter(None, (p.strip() for p in text.split(','))):
+        name, _, weight = part.partition('=')
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint '{name}' in --mix, expected one of {ENDPOINTS}")
+        mix[name] = float(weight or 1)
+        if mix[name] < 0:
+            raise ValueError(f"Weight of '{name}' must be >= 0")
+    if not any(mix.values()):
+        raise ValueError("--mix needs at least one endpoint with a positive weight")
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def _multipart(fields, file_field, filename, content, boundary):
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; filename="{filename}"\r\n'
+                 f'Content-Type: audio/wav\r\n\r\n'.encode() + content + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts)
+
+
+def build_payloads(mix, clip_seconds, sample_rate, audio_kind, batch_rows, variants, seed=SEED):
+    """`variants` distinct requests per endpoint (and per clip length), differing in seed and user/device id."""
+    payloads = {name: [] for name in mix}
+    json_headers = {'Content-Type': 'application/json'}
+    rows = synthetic_feature_rows(max(variants, batch_rows), seed=seed).tolist()
+    temps, hums = synthetic_sensor_stream(variants, seed=seed)
+    for v in range(variants):
+        user = f'load-{v}'
+        if 'analyze' in mix or 'analyze_pcm' in mix:
+            for seconds in clip_seconds:
+                signal = synthetic_audio(audio_kind, seconds, sample_rate, seed=seed + v)
+                if 'analyze' in mix:
+                    boundary = f'loadgen{seed + v:x}'
+                    body = _multipart({'user_id': user}, 'audio', 'clip.wav', wav_bytes(signal, sample_rate), boundary)
+                    payloads['analyze'].append(
+                        ('POST', '/analyze', body, {'Content-Type': f'multipart/form-data; boundary={boundary}'}))
+                if 'analyze_pcm' in mix:
+                    payloads['analyze_pcm'].append(
+                        ('POST', f'/analyze/pcm?user_id={user}', pcm16_bytes(signal), {'X-Sample-Rate': str(sample_rate)}))
+        if 'predict_features' in mix:
+            body = json.dumps({'features': rows[v], 'user_id': user}).encode()
+            payloads['predict_features'].append(('POST', '/predict_features', body, json_headers))
+        if 'predict_batch' in mix:
+            batch = rows[v:] + rows[:v]
+            body = json.dumps({'features': batch[:batch_rows], 'user_id': user}).encode()
+            payloads['predict_batch'].append(('POST', '/predict_features/batch', body, json_headers))
+        if 'ambient' in mix:
+            body = json.dumps({'temperature': float(temps[v]), 'humidity': float(hums[v]), 'device_id': user}).encode()
+            payloads['ambient'].append(('POST', '/ambient', body, json_headers))
+    return payloads
+
+
+# ==========================================================
+# 3. Local Server
+# ==========================================================
+
+_SERVER = r'''
+import sys
+from werkzeug.serving import WSGIRequestHandler, make_server
+from app import app
+
+class KeepAliveHandler(WSGIRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+server = make_server('127.0.0.1', int(sys.argv[1]), app, threaded=True, request_handler=KeepAliveHandler)
+server.serve_forever()
+'''
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_ready(host, port, proc=None, timeout=READY_TIMEOUT_SECONDS):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"server exited with status {proc.returncode}")
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=2)
+            conn.request('GET', '/readyz')
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        finally:
+            conn.close()
+        time.sleep(0.2)
+    raise RuntimeError(f"server at {host}:{port} not ready after {timeout}s")
+
+
+def start_local_server(log_file):
+    """Starts the app in a child process on a free port; returns (proc, host, port) once /readyz is 200."""
+    port = _free_port()
+    service_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.Popen([sys.executable, '-c', _SERVER, str(port)], cwd=service_dir,
+                            stdout=log_file, stderr=subprocess.STDOUT)
+    try:
+        _wait_ready('127.0.0.1', port, proc)
+    except RuntimeError:
+        proc.kill()
+        log_file.seek(0)
+        sys.stderr.write(log_file.read().decode(errors='replace')[-4000:])
+        raise
+    return proc, '127.0.0.1', port
+
+
+# ==========================================================
+# 4. Closed-Loop Clients + Report
+# ==========================================================
+
+class _Client(threading.Thread):
+    def __init__(self, index, host, port, payloads, mix, warmup_end, stop_at):
+        super().__init__(name=f'load-client-{index}', daemon=True)
+        self.host, self.port = host, port
+        self.payloads = payloads
+        self.names = list(mix)
+        self.weights = [mix[name] for name in self.names]
+        self.warmup_end, self.stop_at = warmup_end, stop_at
+        self.rng = random.Random(SEED + index)
+        self.histograms = {name: LatencyHistogram() for name in self.names}
+        self.statuses = {name: {} for name in self.names}
+
+    def run(self):
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        while True:
+            now = time.perf_counter()
+            if now >= self.stop_at:
+                break
+            name = self.rng.choices(self.names, self.weights)[0]
+            method, path, body, headers = self.rng.choice(self.payloads[name])
+            start = time.perf_counter_ns()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                status = str(response.status)
+            except (OSError, http.client.HTTPException) as e:
+                status = type(e).__name__
+                conn.close()
+            elapsed_us = (time.perf_counter_ns() - start) // 1000
+            if now >= self.warmup_end:
+                self.histograms[name].record(elapsed_us)
+                self.statuses[name][status] = self.statuses[name].get(status, 0) + 1
+        conn.close()
+
+
+def run_load(host, port, payloads, mix, concurrency, duration, warmup):
+    start = time.perf_counter()
+    warmup_end = start + warmup
+    stop_at = warmup_end + duration
+    clients = [_Client(i, host, port, payloads, mix, warmup_end, stop_at) for i in range(concurrency)]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    measured = time.perf_counter() - warmup_end
+
+    histograms = {name: LatencyHistogram() for name in mix}
+    statuses = {name: {} for name in mix}
+    for client in clients:
+        for name in mix:
+            histograms[name].merge(client.histograms[name])
+            for status, count in client.statuses[name].items():
+                statuses[name][status] = statuses[name].get(status, 0) + count
+    return histograms, statuses, measured
+
+
+def summarize(histograms, statuses, measured):
+    overall = LatencyHistogram()
+    summary = {}
+    for name, histogram in histograms.items():
+        overall.merge(histogram)
+        summary[name] = _summary_row(histogram, statuses[name], measured)
+    all_statuses = {}
+    for counts in statuses.values():
+        for status, count in counts.items():
+            all_statuses[status] = all_statuses.get(status, 0) + count
+    summary['all'] = _summary_row(overall, all_statuses, measured)
+    return summary, overall
+
+
+def _summary_row(histogram, statuses, measured):
+    errors = sum(count for status, count in statuses.items() if not status.isdigit() or int(status) >= 400)
+    row = {
+        'requests': histogram.total,
+        'errors': errors,
+        'throughput_rps': histogram.total / measured if measured > 0 else 0.0,
+        'mean_ms': histogram.mean_us() / 1000,
+        'max_ms': histogram.max_us / 1000,
+        'statuses': dict(sorted(statuses.items())),
+    }
+    for p in REPORT_PERCENTILES:
+        row[f'p{p:g}_ms'] = histogram.percentile_us(p) / 1000
+    return row
+
+
+def _print_report(summary, measured, concurrency):
+    print(f"\n⏱️  {measured:.1f}s measured, {concurrency} closed-loop clients")
+    header = ''.join(f"{f'p{p:g} (ms)':>11}" for p in REPORT_PERCENTILES)
+    print(f"{'endpoint':>17} {'requests':>9} {'errors':>7} {'req/s':>9}{header}{'max (ms)':>11}")
+    for name, row in summary.items():
+        cells = ''.join(f"{row[f'p{p:g}_ms']:>11.2f}" for p in REPORT_PERCENTILES)
+        print(f"{name:>17} {row['requests']:>9} {row['errors']:>7} {row['throughput_rps']:>9.1f}{cells}{row['max_ms']:>11.2f}")
+    print(f"statuses: {summary['all']['statuses']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Closed-loop HTTP load generator for the ml-service')
+    parser.add_argument('--url', help='drive this running server instead of starting one locally')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'endpoint weights, from {ENDPOINTS} (default %(default)s)')
+    parser.add_argument('--concurrency', type=int, default=8, help='closed-loop client threads (default %(default)s)')
+    parser.add_argument('--duration', type=float, default=20.0, help='measured seconds (default %(default)s)')
+    parser.add_argument('--warmup', type=float, default=3.0, help='unrecorded seconds first (default %(default)s)')
+    parser.add_argument('--clip-seconds', default='5', help='comma-separated clip lengths for analyze* (default %(default)s)')
+    parser.add_argument('--sample-rate', type=int, default=16000, help='clip sample rate (default %(default)s)')
+    parser.add_argument('--audio-kind', default='chirp', choices=AUDIO_KINDS)
+    parser.add_argument('--batch-rows', type=int, default=64, help='rows per predict_batch request (default %(default)s)')
+    parser.add_argument('--variants', type=int, default=8, help='distinct payloads per endpoint and clip length (default %(default)s)')
+    parser.add_argument('--json', help='write the summary (and run settings) to this JSON file')
+    parser.add_argument('--hgrm', help='write <endpoint>.hgrm percentile distributions into this directory')
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix)
+    clip_seconds = [float(s) for s in args.clip_seconds.split(',') if s.strip()]
+    payloads = build_payloads(mix, clip_seconds, args.sample_rate, args.audio_kind, args.batch_rows, max(args.variants, 1))
+    sizes = {name: sum(len(p[2]) for p in items) // len(items) for name, items in payloads.items()}
+    print(f"🧪 Mix {mix}, mean body bytes {sizes}")
+
+    proc = None
+    log_file = tempfile.TemporaryFile()
+    try:
+        if args.url:
+            target = urlsplit(args.url)
+            host, port = target.hostname, target.port or 80
+            _wait_ready(host, port)
+        else:
+            print("🚀 Starting local server ...")
+            proc, host, port = start_local_server(log_file)
+        print(f"🎯 Target http://{host}:{port}, warm-up {args.warmup:g}s, measuring {args.duration:g}s")
+        histograms, statuses, measured = run_load(host, port, payloads, mix, args.concurrency, args.duration, args.warmup)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+        log_file.close()
+
+    summary, overall = summarize(histograms, statuses, measured)
+    _print_report(summary, measured, args.concurrency)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'settings': vars(args), 'measured_seconds': measured, 'endpoints': summary}, f, indent=2)
+        print(f"📝 Summary written to {args.json}")
+    if args.hgrm:
+        os.makedirs(args.hgrm, exist_ok=True)
+        for name, histogram in list(histograms.items()) + [('all', overall)]:
+            with open(os.path.join(args.hgrm, f'{name}.hgrm'), 'w') as f:
+                f.write(histogram.percentile_distribution())
+        print(f"📈 Percentile distributions written to {args.hgrm}/")
+    return 1 if summary['all']['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
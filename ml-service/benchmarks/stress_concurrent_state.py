@@ -0,0 +1,96 @@
+"""
+Concurrency stress check for the estimator banks: many threads hammer /ambient and
+/predict_features through the Flask test client, then the resulting per-device / per-user
+state is compared with a serial replay of each thread's requests.
+
+Each thread owns its own device/user ids, so its per-key update order is deterministic and
+the replay must match exactly. All threads also post VSD updates to one shared user; the
+order there is nondeterministic, but its covariance only depends on how many updates were
+applied, so a lost or torn update shows up as a P_wellness mismatch.
+
+Run from ml-service/:  python -m benchmarks.stress_concurrent_state [threads] [requests_per_thread]
+"""
+import sys
+import threading
+
+import numpy as np
+
+import app as ml_app
+from utils.wellness_logic import DHT22_KalmanFilterBank, WellnessFusionBank
+
+SHARED_USER = 'shared-user'
+
+
+def _thread_plan(thread_id, n_requests):
+    rng = np.random.default_rng(thread_id)
+    plan = []
+    for i in range(n_requests):
+        kind = ('ambient', 'features', 'shared')[i % 3]
+        plan.append((kind, {
+            'device_id': f"dev-{thread_id}",
+            'temperature': float(25 + rng.standard_normal()),
+            'humidity': float(50 + 3 * rng.standard_normal()),
+            'features': rng.standard_normal(16).tolist(),
+        }))
+    return plan
+
+
+def _worker(plan, errors):
+    client = ml_app.app.test_client()
+    for kind, payload in plan:
+        if kind == 'ambient':
+            resp = client.post('/ambient', json={k: payload[k] for k in ('device_id', 'temperature', 'humidity')})
+        elif kind == 'features':
+            resp = client.post('/predict_features', json={'device_id': payload['device_id'], 'features': payload['features']})
+        else:
+            resp = client.post('/predict_features', json={'user_id': SHARED_USER, 'features': payload['features']})
+        if resp.status_code != 200:
+            errors.append(resp.get_json())
+
+
+def _serial_replay(plans):
+    dht = DHT22_KalmanFilterBank(ml_app.INITIAL_TEMP, ml_app.INITIAL_HUMIDITY, steady_state=ml_app.STEADY_STATE_KALMAN)
+    fusion = WellnessFusionBank(initial_wellness=ml_app.INITIAL_WELLNESS, steady_state=ml_app.STEADY_STATE_KALMAN)
+    for plan in plans:
+        for kind, payload in plan:
+            device = payload['device_id']
+            if kind == 'ambient':
+                T, H = dht.update_filter(device, payload['temperature'], payload['humidity'])
+                fusion.update_fusion(device, fusion.estimate(device), T, H, measurement_source='AMBIENT')
+            elif kind == 'features':
+                score = ml_app.predict_vsd_risk(payload['features'])
+                fusion.update_fusion(device, score, *dht.estimate(device), measurement_source='VSD')
+            else:
+                fusion.update_fusion(SHARED_USER, 0.0, 25.0, 50.0, measurement_source='VSD')
+    return dht, fusion
+
+
+def main(n_threads=16, n_requests=300):
+    plans = [_thread_plan(t, n_requests) for t in range(n_threads)]
+    errors = []
+    threads = [threading.Thread(target=_worker, args=(plan, errors)) for plan in plans]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    dht, fusion = _serial_replay(plans)
+    mismatches = 0
+    for t in range(n_threads):
+        key = f"dev-{t}"
+        if ml_app.DHT_KALMAN_FILTER.estimate(key) != dht.estimate(key):
+            mismatches += 1
+        for field in ('wellness_estimate', 'P_wellness'):
+            if ml_app.FUSION_ENGINE.get(key, field) != fusion.get(key, field):
+                mismatches += 1
+    shared_ok = np.isclose(ml_app.FUSION_ENGINE.get(SHARED_USER, 'P_wellness'),
+                           fusion.get(SHARED_USER, 'P_wellness'), rtol=1e-12, atol=0)
+
+    print(f"{n_threads} threads x {n_requests} requests: {len(errors)} errors, "
+          f"{mismatches} per-key mismatches, shared-user covariance {'ok' if shared_ok else 'MISMATCH'}")
+    return not errors and mismatches == 0 and shared_ok
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:3]]
+    sys.exit(0 if main(*args) else 1)
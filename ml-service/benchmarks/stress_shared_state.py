@@ -0,0 +1,249 @@
+"""
+Multi-process consistency check for the shared-memory estimator banks (utils.shared_state).
+
+1. Direct: writer processes update overlapping keys of one shared DHT22 and fusion bank while
+   reader processes poll them. Temperature and humidity get identical readings and noise, so
+   their estimates stay equal and a torn read shows up as temp != humidity (the readers also
+   peek at the raw columns without the seqlock, as a control that tearing is observable).
+   Covariances depend only on how many updates a key received, so a lost update shows up as
+   a P mismatch against a reference run with the same per-key counts. Every key is inserted
+   by several processes at once, so the key count also checks insert races.
+2. Through the app: worker processes import app with SHARED_STATE_NAME set (as separate
+   server workers would) and run the stress_concurrent_state plans through the test client;
+   the shared state must equal a serial replay.
+3. Update throughput for 1 / 2 / 4 processes against a per-process bank.
+
+Run from ml-service/:  python -m benchmarks.stress_shared_state [writers] [updates_per_writer]
+"""
+import multiprocessing as mp
+import os
+import sys
+import time
+
+import numpy as np
+
+from utils.shared_state import SharedDHT22_KalmanFilterBank, SharedWellnessFusionBank, unlink_shared_state
+from utils.wellness_logic import DHT22_KalmanFilterBank, WellnessFusionBank
+
+READERS = 2
+UPDATES_PER_KEY = 40  # well before P converges, so one lost update changes it
+APP_THREADS = 4
+APP_REQUESTS = 150
+THROUGHPUT_UPDATES = 20000
+
+
+def _banks(name):
+    # Equal initial values and noise for both channels: the two estimates must stay identical
+    return (SharedDHT22_KalmanFilterBank(25.0, 25.0, f'{name}-dht22', R_temp=0.5, R_humidity=0.5),
+            SharedWellnessFusionBank(f'{name}-fusion'))
+
+
+def _unlink(name):
+    for suffix in ('dht22', 'fusion'):
+        unlink_shared_state(f'{name}-{suffix}')
+
+
+def _writer_keys(writer, n_updates, n_keys):
+    return [f'device-{(i * 7919 + writer * 104729) % n_keys}' for i in range(n_updates)]
+
+
+# ==========================================================
+# 1. Direct Bank Access
+# ==========================================================
+
+def _writer(name, writer, n_updates, n_keys, start):
+    dht, fusion = _banks(name)
+    rng = np.random.default_rng(writer)
+    readings = 25.0 + rng.standard_normal(n_updates)
+    start.wait()
+    for key, value in zip(_writer_keys(writer, n_updates, n_keys), readings.tolist()):
+        T, _ = dht.update_filter(key, value, value)
+        fusion.update_fusion(key, T, T, T, measurement_source='VSD')
+    dht.close()
+    fusion.close()
+
+
+def _reader(name, n_keys, start, stop, results):
+    dht, _ = _banks(name)
+    temp, hum = dht.columns['temp_estimate'], dht.columns['humidity_estimate']
+    reads = torn = raw_reads = raw_torn = 0
+    start.wait()
+    while not stop.is_set():
+        for i in range(0, n_keys, 7):
+            T, H = dht.estimate(f'device-{i}')
+            reads += 1
+            torn += T != H
+        # Control: the same comparison on the raw columns, without the seqlock protocol
+        for slot in range(n_keys):
+            raw_reads += 1
+            raw_torn += float(temp[slot]) != float(hum[slot])
+    results.put((reads, torn, raw_reads, raw_torn))
+    dht.close()
+
+
+def _reference_P(counts):
+    """P after `count` updates, for each distinct count (independent of the readings)."""
+    dht = DHT22_KalmanFilterBank(25.0, 25.0, R_temp=0.5, R_humidity=0.5)
+    fusion = WellnessFusionBank()
+    out = {}
+    for n in range(1, max(counts) + 1):
+        dht.update_filter('k', 25.0, 25.0)
+        fusion.update_fusion('k', 50.0, 25.0, 25.0, measurement_source='VSD')
+        out[n] = (dht.get('k', 'P_temp'), fusion.get('k', 'P_wellness'))
+    return out
+
+
+def check_direct(n_writers=4, n_updates=4000):
+    ctx = mp.get_context('spawn')
+    name = f'vsd-stress-{os.getpid()}'
+    _unlink(name)
+    n_keys = max(1, n_writers * n_updates // UPDATES_PER_KEY)
+    dht, fusion = _banks(name)
+    start, stop, results = ctx.Barrier(n_writers + READERS + 1), ctx.Event(), ctx.Queue()
+    writers = [ctx.Process(target=_writer, args=(name, w, n_updates, n_keys, start)) for w in range(n_writers)]
+    readers = [ctx.Process(target=_reader, args=(name, n_keys, start, stop, results)) for _ in range(READERS)]
+    for p in writers + readers:
+        p.start()
+    start.wait()
+    began = time.perf_counter()
+    for p in writers:
+        p.join()
+    elapsed = time.perf_counter() - began
+    stop.set()
+    reader_stats = np.sum([results.get() for _ in readers], axis=0)
+    for p in readers:
+        p.join()
+
+    counts = {}
+    for w in range(n_writers):
+        for key in _writer_keys(w, n_updates, n_keys):
+            counts[key] = counts.get(key, 0) + 1
+    reference = _reference_P(counts.values())
+    lost = sum(dht.get(key, 'P_temp') != reference[n][0] or fusion.get(key, 'P_wellness') != reference[n][1]
+               for key, n in counts.items())
+    diverged = sum(dht.get(key, 'temp_estimate') != dht.get(key, 'humidity_estimate') for key in counts)
+    keys_ok = len(dht) == len(counts) == len(fusion) and set(dht.keys()) == set(counts)
+    reads, torn, raw_reads, raw_torn = reader_stats.tolist()
+
+    print(f"direct: {n_writers} writer + {READERS} reader processes, {n_writers * n_updates} update pairs over "
+          f"{n_keys} keys in {elapsed:.2f}s")
+    print(f"  lost updates {lost}, diverged keys {diverged}, key set {'ok' if keys_ok else 'MISMATCH'} "
+          f"({len(dht)} / {len(fusion)} of {len(counts)})")
+    print(f"  seqlock reads {reads}: {torn} torn | unsynchronized control reads {raw_reads}: {raw_torn} torn")
+    dht.close()
+    fusion.close()
+    _unlink(name)
+    return lost == 0 and diverged == 0 and keys_ok and torn == 0
+
+
+# ==========================================================
+# 2. Through the App (one Flask app per process)
+# ==========================================================
+
+def _app_worker(plans, done):
+    import threading
+    from benchmarks import stress_concurrent_state
+    errors = []
+    threads = [threading.Thread(target=stress_concurrent_state._worker, args=(plan, errors)) for plan in plans]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    done.put(len(errors))
+
+
+def check_app(n_processes=3):
+    name = f'vsd-app-{os.getpid()}'
+    _unlink(name)
+    from benchmarks import stress_concurrent_state  # this process's app keeps per-process banks
+    ml_app = stress_concurrent_state.ml_app
+    # Same layout as the workers' banks; they attach to these segments
+    shared_dht = SharedDHT22_KalmanFilterBank(ml_app.INITIAL_TEMP, ml_app.INITIAL_HUMIDITY, f'{name}-dht22',
+                                              steady_state=ml_app.STEADY_STATE_KALMAN)
+    shared_fusion = SharedWellnessFusionBank(f'{name}-fusion', initial_wellness=ml_app.INITIAL_WELLNESS,
+                                             steady_state=ml_app.STEADY_STATE_KALMAN)
+
+    # Spawned workers import app afresh and read this environment
+    os.environ['SHARED_STATE_NAME'] = name
+    os.environ.setdefault('WARMUP_ENABLED', '0')
+    os.environ.setdefault('FEATURE_POOL_WORKERS', '0')
+    os.environ.pop('STATE_DIR', None)
+    ctx = mp.get_context('spawn')
+    plans = [stress_concurrent_state._thread_plan(t, APP_REQUESTS) for t in range(n_processes * APP_THREADS)]
+    done = ctx.Queue()
+    procs = [ctx.Process(target=_app_worker, args=(plans[p * APP_THREADS:(p + 1) * APP_THREADS], done))
+             for p in range(n_processes)]
+    began = time.perf_counter()
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    elapsed = time.perf_counter() - began
+    crashed = sum(p.exitcode != 0 for p in procs)
+    errors = sum(done.get() for p in procs if p.exitcode == 0)
+
+    dht, fusion = stress_concurrent_state._serial_replay(plans)
+    mismatches = 0
+    for t in range(len(plans)):
+        key = f"dev-{t}"
+        if shared_dht.estimate(key) != dht.estimate(key):
+            mismatches += 1
+        for field in ('wellness_estimate', 'P_wellness'):
+            if shared_fusion.get(key, field) != fusion.get(key, field):
+                mismatches += 1
+    shared = stress_concurrent_state.SHARED_USER
+    shared_ok = np.isclose(shared_fusion.get(shared, 'P_wellness'), fusion.get(shared, 'P_wellness'),
+                           rtol=1e-12, atol=0)
+    print(f"app: {n_processes} processes x {APP_THREADS} threads x {APP_REQUESTS} requests in {elapsed:.2f}s: "
+          f"{crashed} crashed workers, {errors} errors, {mismatches} per-key mismatches, "
+          f"shared-user covariance {'ok' if shared_ok else 'MISMATCH'}")
+    shared_dht.close()
+    shared_fusion.close()
+    _unlink(name)
+    return crashed == 0 and errors == 0 and mismatches == 0 and shared_ok
+
+
+# ==========================================================
+# 3. Throughput
+# ==========================================================
+
+def _throughput_worker(name, worker, n_updates, start, results):
+    dht = SharedDHT22_KalmanFilterBank(25.0, 25.0, f'{name}-dht22') if name else DHT22_KalmanFilterBank(25.0, 25.0)
+    keys = [f'w{worker}-{i % 1000}' for i in range(n_updates)]
+    for key in keys[:1000]:
+        dht.update_filter(key, 25.0, 25.0)  # inserts happen before the timed loop
+    start.wait()
+    began = time.perf_counter()
+    for key in keys:
+        dht.update_filter(key, 24.0, 26.0)
+        dht.estimate(key)
+    results.put(time.perf_counter() - began)
+
+
+def bench_throughput():
+    ctx = mp.get_context('spawn')
+    print(f"\n{'processes':>9} {'bank':>12} {'update+read pairs/s':>20}")
+    for n in (1, 2, 4):
+        for shared in (False, True):
+            name = f'vsd-tput-{os.getpid()}' if shared else ''
+            if shared:
+                _unlink(name)
+            start, results = ctx.Barrier(n), ctx.Queue()
+            procs = [ctx.Process(target=_throughput_worker, args=(name, w, THROUGHPUT_UPDATES, start, results))
+                     for w in range(n)]
+            for p in procs:
+                p.start()
+            slowest = max(results.get() for _ in procs)
+            for p in procs:
+                p.join()
+            if shared:
+                _unlink(name)
+            print(f"{n:>9} {'shared' if shared else 'per-process':>12} {n * THROUGHPUT_UPDATES / slowest:>20.0f}")
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:3]]
+    ok = check_direct(*args)
+    ok = check_app() and ok
+    bench_throughput()
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,298 @@
+"""
+Reproducible benchmark suite for the ml-service hot paths: feature extraction on deterministic
+synthetic audio (tones, noise, speech-like chirps at several lengths and sample rates), VSD
+scoring, the Kalman / fusion updates on synthetic sensor streams, and every Flask endpoint
+through the test client. Results (per-call median / min / p90 plus the environment) are
+written to JSON and, given a baseline, compared case by case; a case whose median is more
+than --threshold slower than the baseline is a regression and the exit status is 1.
+
+The stored baseline (benchmarks/baseline.json) was recorded on one machine; refresh it with
+--save-baseline before comparing on another.
+
+Run from ml-service/:
+    python -m benchmarks.suite                           # full run, writes benchmarks/results.json
+    python -m benchmarks.suite --quick --filter endpoint  # subset, fewer/shorter clips
+    python -m benchmarks.suite --baseline benchmarks/baseline.json --threshold 0.25
+    python -m benchmarks.suite --save-baseline
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+# Deterministic service configuration: no feature cache hits, no worker pool, audio stack
+# imported before timing starts. Explicit environment settings still win.
+os.environ.setdefault('FEATURE_CACHE_ENABLED', '0')
+os.environ.setdefault('FEATURE_POOL_WORKERS', '0')
+os.environ.setdefault('AUDIO_IMPORT_MODE', 'eager')
+
+import numpy as np
+import soundfile as sf
+
+from benchmarks.synthetic import (
+    AUDIO_KINDS, SEED, pcm16_bytes, synthetic_audio, synthetic_feature_rows, synthetic_sensor_stream, wav_bytes
+)
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_RESULTS_PATH = os.path.join(BENCH_DIR, 'results.json')
+DEFAULT_BASELINE_PATH = os.path.join(BENCH_DIR, 'baseline.json')
+# A case regresses when its median is more than this fraction slower than the baseline
+REGRESSION_THRESHOLD = 0.25
+
+CLIP_SECONDS = (1, 5, 30)
+SAMPLE_RATES = (8000, 16000, 44100)
+SENSOR_READINGS = 2000
+BANK_KEYS = 1000
+BATCH_ROWS = 256
+
+# Each timing sample runs the case enough times to last at least this long
+MIN_SAMPLE_SECONDS = 0.05
+REPEATS = 7
+QUICK = {'clip_seconds': (1, 5), 'sample_rates': (16000, 44100), 'min_sample_seconds': 0.02, 'repeats': 5}
+
+
+# ==========================================================
+# 1. Timing
+# ==========================================================
+
+def _measure(fn, min_sample_seconds, repeats):
+    """Per-call seconds for `repeats` samples, each looping fn until it lasts min_sample_seconds."""
+    fn()  # warm
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        if time.perf_counter() - start >= min_sample_seconds or number >= 1 << 20:
+            break
+        number *= 2
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+    return number, samples
+
+
+def _summarize(number, samples):
+    us = sorted(s * 1e6 for s in samples)
+    return {
+        'median_us': statistics.median(us),
+        'min_us': us[0],
+        'p90_us': us[min(len(us) - 1, int(round(0.9 * (len(us) - 1))))],
+        'number': number,
+        'repeats': len(us),
+    }
+
+
+# ==========================================================
+# 2. Cases (name -> zero-argument callable)
+# ==========================================================
+
+def _function_cases(clip_seconds, sample_rates, tmp_dir):
+    from utils.wellness_logic import (
+        DHT22_KalmanFilter, DHT22_KalmanFilterBank, WellnessFusionBank, WellnessFusionEngine,
+        extract_features, extract_features_from_signal, predict_vsd_risk, predict_vsd_risk_batch
+    )
+    cases = {}
+
+    # Feature extraction: every kind/length at 16 kHz, the chirp at every other rate
+    clips = [(kind, s, 16000) for kind in AUDIO_KINDS for s in clip_seconds]
+    clips += [('chirp', s, sr) for sr in sample_rates if sr != 16000 for s in clip_seconds]
+    for kind, seconds, sr in clips:
+        signal = synthetic_audio(kind, seconds, sr)
+        cases[f'extract_features_from_signal/{kind}/{seconds}s/{sr}'] = (
+            lambda signal=signal, sr=sr: extract_features_from_signal(signal, sr))
+    wav_path = os.path.join(tmp_dir, 'chirp.wav')
+    sf.write(wav_path, synthetic_audio('chirp', 5, 44100), 44100, subtype='PCM_16')
+    cases['extract_features/wav/chirp/5s/44100'] = lambda: extract_features(wav_path)
+
+    # Scoring
+    rows = synthetic_feature_rows(BATCH_ROWS)
+    cases['predict_vsd_risk'] = lambda: predict_vsd_risk(rows[0])
+    cases[f'predict_vsd_risk_batch/{BATCH_ROWS}'] = lambda: predict_vsd_risk_batch(rows)
+
+    # Ambient filtering + fusion over a sensor stream (per call = one whole stream)
+    temps, hums = synthetic_sensor_stream(SENSOR_READINGS)
+    readings = list(zip(temps.tolist(), hums.tolist()))
+    scores = predict_vsd_risk_batch(synthetic_feature_rows(SENSOR_READINGS)).tolist()
+
+    def kalman_stream():
+        kf = DHT22_KalmanFilter(24.0, 50.0)
+        for t, h in readings:
+            kf.update_filter(t, h)
+
+    def fusion_stream():
+        engine = WellnessFusionEngine()
+        for score, (t, h) in zip(scores, readings):
+            engine.update_fusion(score, t, h, measurement_source='VSD')
+
+    keys = [f'device-{i % BANK_KEYS}' for i in range(SENSOR_READINGS)]
+
+    def kalman_bank_stream():
+        bank = DHT22_KalmanFilterBank(24.0, 50.0)
+        for key, (t, h) in zip(keys, readings):
+            bank.update_filter(key, t, h)
+
+    def kalman_bank_many():
+        DHT22_KalmanFilterBank(24.0, 50.0).update_many(keys, temps, hums)
+
+    def fusion_bank_stream():
+        bank = WellnessFusionBank()
+        for key, score, (t, h) in zip(keys, scores, readings):
+            bank.update_fusion(key, score, t, h, measurement_source='VSD')
+
+    cases[f'DHT22_KalmanFilter.update_filter/x{SENSOR_READINGS}'] = kalman_stream
+    cases[f'WellnessFusionEngine.update_fusion/x{SENSOR_READINGS}'] = fusion_stream
+    cases[f'DHT22_KalmanFilterBank.update_filter/x{SENSOR_READINGS}'] = kalman_bank_stream
+    cases[f'DHT22_KalmanFilterBank.update_many/x{SENSOR_READINGS}'] = kalman_bank_many
+    cases[f'WellnessFusionBank.update_fusion/x{SENSOR_READINGS}'] = fusion_bank_stream
+    return cases
+
+
+def _endpoint_cases():
+    from app import app
+
+    client = app.test_client()
+    cases = {}
+
+    def check(response):
+        if response.status_code >= 400:
+            raise RuntimeError(f"{response.request.path} -> {response.status_code}: {response.get_data(as_text=True)}")
+        return response
+
+    for sr in (16000, 44100):
+        wav = wav_bytes(synthetic_audio('chirp', 5, sr), sr)
+        cases[f'POST /analyze/chirp/5s/{sr}'] = lambda wav=wav: check(client.post(
+            '/analyze', data={'audio': (io.BytesIO(wav), 'clip.wav'), 'user_id': 'bench'}))
+
+    pcm = pcm16_bytes(synthetic_audio('chirp', 5, 16000))
+    cases['POST /analyze/pcm/chirp/5s/16000'] = lambda: check(client.post(
+        '/analyze/pcm?user_id=bench', data=pcm, headers={'X-Sample-Rate': '16000'}))
+
+    rows = synthetic_feature_rows(BATCH_ROWS).tolist()
+    cases['POST /predict_features'] = lambda: check(client.post(
+        '/predict_features', json={'features': rows[0], 'user_id': 'bench'}))
+    cases[f'POST /predict_features/batch/{BATCH_ROWS}'] = lambda: check(client.post(
+        '/predict_features/batch', json={'features': rows, 'user_id': 'bench'}))
+
+    temps, hums = synthetic_sensor_stream(1)
+    cases['POST /ambient'] = lambda: check(client.post(
+        '/ambient', json={'temperature': float(temps[0]), 'humidity': float(hums[0]), 'device_id': 'bench'}))
+
+    chunks = [pcm[i:i + 6400] for i in range(0, len(pcm), 6400)]  # 200 ms of int16 each
+
+    def stream_session():
+        session_id = check(client.post('/stream/open', json={'sample_rate': 16000})).get_json()['session_id']
+        for chunk in chunks:
+            check(client.post(f'/stream/{session_id}/chunk', data=chunk))
+        check(client.post(f'/stream/{session_id}/finalize'))
+
+    cases['POST /stream session/chirp/5s/16000'] = stream_session
+    cases['GET /healthz'] = lambda: check(client.get('/healthz'))
+    return cases
+
+
+# ==========================================================
+# 3. Results, Baseline Comparison, CLI
+# ==========================================================
+
+def _environment(quick):
+    import librosa
+    import sklearn
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'librosa': librosa.__version__,
+        'sklearn': sklearn.__version__,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'quick': quick,
+        'seed': SEED,
+    }
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """Rows of (name, baseline_us, current_us, ratio, status) for every case in either run."""
+    rows = []
+    for name in sorted(set(results) | set(baseline)):
+        current = results.get(name, {}).get('median_us')
+        base = baseline.get(name, {}).get('median_us')
+        if current is None or base is None:
+            rows.append((name, base, current, None, 'new' if base is None else 'missing'))
+            continue
+        ratio = current / base
+        status = 'REGRESSED' if ratio > 1 + threshold else ('faster' if ratio < 1 - threshold else 'ok')
+        rows.append((name, base, current, ratio, status))
+    return rows
+
+
+def run(name_filter=None, quick=False):
+    clip_seconds = QUICK['clip_seconds'] if quick else CLIP_SECONDS
+    sample_rates = QUICK['sample_rates'] if quick else SAMPLE_RATES
+    min_sample_seconds = QUICK['min_sample_seconds'] if quick else MIN_SAMPLE_SECONDS
+    repeats = QUICK['repeats'] if quick else REPEATS
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cases = _function_cases(clip_seconds, sample_rates, tmp_dir)
+        cases.update(_endpoint_cases())
+        for name, fn in cases.items():
+            if name_filter and name_filter not in name:
+                continue
+            results[name] = _summarize(*_measure(fn, min_sample_seconds, repeats))
+            print(f"{name:<52} {results[name]['median_us']:>12.1f} us", flush=True)
+    return {'environment': _environment(quick), 'results': results}
+
+
+def _fmt(us):
+    return f"{us:>12.1f}" if us is not None else f"{'-':>12}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='ml-service benchmark suite')
+    parser.add_argument('--out', default=DEFAULT_RESULTS_PATH, help='where to write the results JSON')
+    parser.add_argument('--baseline', help='baseline JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help='allowed slowdown of the median as a fraction (default %(default)s)')
+    parser.add_argument('--filter', help='only run cases whose name contains this substring')
+    parser.add_argument('--quick', action='store_true', help='fewer clip lengths / rates, shorter samples')
+    parser.add_argument('--save-baseline', action='store_true', help=f'also write {DEFAULT_BASELINE_PATH}')
+    args = parser.parse_args(argv)
+
+    report = run(args.filter, args.quick)
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"\n📝 Results written to {args.out}")
+    if args.save_baseline:
+        with open(DEFAULT_BASELINE_PATH, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"📌 Baseline saved to {DEFAULT_BASELINE_PATH}")
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)['results']
+    if args.filter:
+        baseline = {name: entry for name, entry in baseline.items() if args.filter in name}
+    rows = compare(report['results'], baseline, args.threshold)
+    print(f"\n{'case':<52} {'baseline us':>12} {'current us':>12} {'ratio':>7} {'status':>10}")
+    for name, base, current, ratio, status in rows:
+        print(f"{name:<52} {_fmt(base)} {_fmt(current)} {f'{ratio:.2f}' if ratio else '-':>7} {status:>10}")
+    regressed = [row[0] for row in rows if row[4] == 'REGRESSED']
+    if regressed:
+        print(f"\n❌ {len(regressed)} case(s) slower than baseline by more than {args.threshold:.0%}")
+        return 1
+    print(f"\n✅ No case slower than baseline by more than {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
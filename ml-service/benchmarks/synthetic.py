@@ -0,0 +1,73 @@
+"""
+Deterministic synthetic inputs shared by the benchmark suite and the load generator: audio
+clips, DHT22-like sensor streams and feature rows. The same arguments (and seed) always
+produce the same data.
+"""
+import io
+
+import numpy as np
+import soundfile as sf
+
+SEED = 1234
+AUDIO_KINDS = ('tone', 'noise', 'chirp')
+
+
+# ==========================================================
+# 1. Audio
+# ==========================================================
+
+def synthetic_audio(kind, seconds, sr, seed=SEED):
+    """Float32 mono clip; the same (kind, seconds, sr, seed) always gives the same samples."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sr)) / sr
+    if kind == 'tone':
+        signal = 0.4 * np.sin(2 * np.pi * 220.0 * t)
+    elif kind == 'noise':
+        signal = 0.1 * rng.standard_normal(t.size)
+    elif kind == 'chirp':
+        # Speech-like: gliding harmonic f0 gated into ~4 syllables per second, plus breath noise
+        f0 = 140 + 40 * np.sin(2 * np.pi * 0.3 * t) + 30 * np.sin(2 * np.pi * 4.0 * t)
+        phase = 2 * np.pi * np.cumsum(f0) / sr
+        envelope = np.clip(np.sin(2 * np.pi * 2.0 * t), 0, None) ** 0.5
+        signal = envelope * sum(0.3 / k * np.sin(k * phase) for k in range(1, 6))
+        signal += 0.02 * rng.standard_normal(t.size)
+    else:
+        raise ValueError(f"Unknown audio kind '{kind}', expected one of {AUDIO_KINDS}")
+    return signal.astype(np.float32)
+
+
+def wav_bytes(signal, sr):
+    """16-bit PCM WAV file contents for `signal`."""
+    buf = io.BytesIO()
+    sf.write(buf, signal, sr, format='WAV', subtype='PCM_16')
+    return buf.getvalue()
+
+
+def pcm16_bytes(signal):
+    """Raw little-endian int16 samples, the default body format of /analyze/pcm."""
+    return (np.clip(signal, -1.0, 1.0) * 32767).astype('<i2').tobytes()
+
+
+# ==========================================================
+# 2. Sensor Streams + Feature Rows
+# ==========================================================
+
+def synthetic_sensor_stream(n, seed=SEED):
+    """DHT22-like readings: slow random walk around 24 C / 50 %RH with sensor noise and rare spikes."""
+    rng = np.random.default_rng(seed)
+    temps = 24.0 + np.cumsum(rng.normal(0, 0.02, n)) + rng.normal(0, 0.5, n)
+    hums = 50.0 + np.cumsum(rng.normal(0, 0.05, n)) + rng.normal(0, 1.0, n)
+    spikes = rng.random(n) < 0.01
+    temps[spikes] += rng.choice([-8.0, 8.0], spikes.sum())
+    return temps, np.clip(hums, 0, 100)
+
+
+def synthetic_feature_rows(n, seed=SEED):
+    """Feature vectors on the scale of real extraction output (MFCC means, RMS, ZCR, pitch)."""
+    rng = np.random.default_rng(seed)
+    mfcc = rng.normal(0, 20, (n, 13))
+    mfcc[:, 0] -= 300
+    rms = rng.uniform(0.01, 0.2, (n, 1))
+    zcr = rng.uniform(0.02, 0.2, (n, 1))
+    pitch = rng.uniform(90, 260, (n, 1))
+    return np.hstack([mfcc, rms, zcr, pitch])
@@ -0,0 +1,15 @@
+import os
+import sys
+
+# The service modules are imported the way app.py imports them (`from utils...`) and load the
+# models from the relative MODELS_DIR, so the tests run from ml-service/ wherever pytest starts
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVICE_DIR not in sys.path:
+    sys.path.insert(0, SERVICE_DIR)
+os.chdir(SERVICE_DIR)
+
+# Tests that import app get a plain in-process service: no warm-up thread, no persisted or
+# shared estimator state from the environment
+os.environ['WARMUP_ENABLED'] = '0'
+for _name in ('STATE_DIR', 'SHARED_STATE_NAME', 'FEATURE_CACHE_PATH'):
+    os.environ.pop(_name, None)
@@ -0,0 +1,98 @@
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from conftest import SERVICE_DIR
+
+READY_TIMEOUT_SECONDS = 90
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _get(port, path):
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}{path}', timeout=5) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def _post(port, path, body):
+    request = urllib.request.Request(f'http://127.0.0.1:{port}{path}', data=json.dumps(body).encode(),
+                                     headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=10) as resp:
+        return resp.status, json.loads(resp.read())
+
+
+@pytest.fixture
+def served(tmp_path):
+    """`python app.py` (debug server with the reloader, as documented) on a free port; yields (port, log path)."""
+    def start(**env):
+        port = _free_port()
+        log_path = tmp_path / f'app-{port}.log'
+        environment = dict(os.environ, PORT=str(port), WARMUP_ENABLED='0', PYTHONUNBUFFERED='1', **env)
+        with open(log_path, 'wb') as log:
+            proc = subprocess.Popen([sys.executable, 'app.py'], cwd=SERVICE_DIR, env=environment,
+                                    stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+        procs.append(proc)
+        deadline = time.monotonic() + READY_TIMEOUT_SECONDS
+        while time.monotonic() < deadline:
+            assert proc.poll() is None, log_path.read_text()
+            try:
+                status, body = _get(port, '/readyz')
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.2)
+                continue
+            assert status == 200, (body, log_path.read_text())
+            return port, log_path
+        pytest.fail(f"app did not become ready:\n{log_path.read_text()}")
+
+    procs = []
+    yield start
+    for proc in procs:
+        # The reloader parent and its serving child share the session
+        os.killpg(proc.pid, signal.SIGINT)
+        try:
+            proc.wait(30)
+        except subprocess.TimeoutExpired:
+            os.killpg(proc.pid, signal.SIGKILL)
+            proc.wait()
+
+
+def test_python_app_py_initializes_only_the_serving_process(served, tmp_path):
+    state_dir = tmp_path / 'state'
+    port, log_path = served(STATE_DIR=str(state_dir), FEATURE_CACHE_PATH=str(tmp_path / 'cache.npz'))
+
+    status, body = _get(port, '/state_store')
+    assert status == 200 and body['enabled'] is True
+    assert _post(port, '/ambient', {'device_id': 'dev-1', 'temperature': 24.0, 'humidity': 45.0})[0] == 200
+    assert _post(port, '/stream/open', {'sample_rate': 16000})[0] == 201
+
+    log = log_path.read_text()
+    assert 'FATAL ERROR' not in log
+    assert log.count('Service Initialized') == 1
+
+
+def test_spawned_pool_workers_do_not_initialize_the_service(served, tmp_path):
+    # Under 'spawn' each worker re-imports app.py (as __mp_main__) before running its task
+    port, log_path = served(FEATURE_POOL_WORKERS='2', FEATURE_POOL_START_METHOD='spawn', APP_RELOADER='0',
+                            STATE_DIR=str(tmp_path / 'state'))
+    status, body = _get(port, '/state_store')
+    assert status == 200 and body['enabled'] is True
+
+    log = log_path.read_text()
+    assert 'Feature pool: 2 warm workers' in log
+    assert 'FATAL ERROR' not in log
+    assert log.count('Service Initialized') == 1
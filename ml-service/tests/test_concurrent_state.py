@@ -0,0 +1,58 @@
+import threading
+
+import numpy as np
+
+from utils.wellness_logic import DHT22_KalmanFilterBank, WellnessFusionBank
+
+N_THREADS = 8
+UPDATES_PER_THREAD = 300
+SHARED_KEY = 'shared'
+
+
+def _readings(thread_id):
+    rng = np.random.default_rng(thread_id)
+    return (25 + rng.standard_normal(UPDATES_PER_THREAD)).tolist(), (50 + 3 * rng.standard_normal(UPDATES_PER_THREAD)).tolist()
+
+
+def _run(dht, fusion, thread_id):
+    key = f'dev-{thread_id}'
+    for t, h in zip(*_readings(thread_id)):
+        T, H = dht.update_filter(key, t, h)
+        fusion.update_fusion(key, fusion.estimate(key), T, H, measurement_source='AMBIENT')
+        fusion.update_fusion(SHARED_KEY, 0.5, T, H, measurement_source='VSD')
+
+
+def test_concurrent_bank_updates_match_serial_replay():
+    dht, fusion = DHT22_KalmanFilterBank(25.0, 50.0), WellnessFusionBank()
+    start = threading.Barrier(N_THREADS)
+
+    def worker(thread_id):
+        start.wait()
+        _run(dht, fusion, thread_id)
+
+    threads = [threading.Thread(target=worker, args=(t,)) for t in range(N_THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    serial_dht, serial_fusion = DHT22_KalmanFilterBank(25.0, 50.0), WellnessFusionBank()
+    for thread_id in range(N_THREADS):
+        _run(serial_dht, serial_fusion, thread_id)
+
+    # Each thread owns its key, so per-key order is deterministic and the replay matches exactly
+    for thread_id in range(N_THREADS):
+        key = f'dev-{thread_id}'
+        assert dht.estimate(key) == serial_dht.estimate(key)
+        assert dht.get(key, 'P_temp') == serial_dht.get(key, 'P_temp')
+        for field in ('wellness_estimate', 'P_wellness'):
+            assert fusion.get(key, field) == serial_fusion.get(key, field)
+    # The shared key's update order varies, but its covariance only depends on the update count
+    assert np.isclose(fusion.get(SHARED_KEY, 'P_wellness'), serial_fusion.get(SHARED_KEY, 'P_wellness'),
+                      rtol=1e-12, atol=0)
+    assert len(dht) == N_THREADS and len(fusion) == N_THREADS + 1
+
+
+def test_concurrent_requests_match_serial_replay():
+    from benchmarks import stress_concurrent_state
+    assert stress_concurrent_state.main(n_threads=8, n_requests=60)
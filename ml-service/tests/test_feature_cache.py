@@ -0,0 +1,37 @@
+import time
+
+import numpy as np
+
+from utils.feature_cache import FeatureCache
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_periodic_save_runs_off_the_request_thread(tmp_path):
+    path = tmp_path / 'cache.npz'
+    cache = FeatureCache(path=str(path), persist_every=10)
+    for i in range(10):
+        cache.put(i.to_bytes(16, 'little'), np.full(16, float(i)))
+    assert _wait_for(path.exists)
+    cache.close()
+
+    reloaded = FeatureCache(path=str(path))
+    assert len(reloaded) == 10
+    assert reloaded.get((3).to_bytes(16, 'little')) == [3.0] * 16
+
+
+def test_save_failure_does_not_reach_put(tmp_path):
+    blocker = tmp_path / 'not-a-dir'
+    blocker.write_text('')
+    cache = FeatureCache(path=str(blocker / 'cache.npz'), persist_every=1)
+    for i in range(5):
+        cache.put(i.to_bytes(16, 'little'), np.zeros(16))  # must not raise
+    assert _wait_for(lambda: cache.save_errors > 0)
+    cache.close()
+    assert len(cache) == 5
+    assert cache.stats()['save_errors'] >= 2
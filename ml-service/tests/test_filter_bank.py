@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from utils.wellness_logic import DHT22_KalmanFilter, DHT22_KalmanFilterBank
+
+
+def _readings(n_sensors, ticks, seed=1):
+    rng = np.random.default_rng(seed)
+    return 25 + 0.5 * rng.standard_normal((ticks, n_sensors)), 50 + 2.0 * rng.standard_normal((ticks, n_sensors))
+
+
+@pytest.mark.parametrize('steady_state', [False, True])
+def test_update_many_equals_scalar_loop(steady_state):
+    n_sensors, ticks = 50, 200
+    temps, hums = _readings(n_sensors, ticks)
+    ids = [f'node-{i}' for i in range(n_sensors)]
+    scalar = {key: DHT22_KalmanFilter(25.0, 50.0, steady_state=steady_state) for key in ids}
+    bank = DHT22_KalmanFilterBank(25.0, 50.0, steady_state=steady_state)
+
+    for t in range(ticks):
+        # node-0 reports twice per tick: duplicates must be applied in order
+        tick_ids = ids + ids[:1]
+        tick_t = np.r_[temps[t], temps[t, 0] + 0.1]
+        tick_h = np.r_[hums[t], hums[t, 0] - 0.1]
+        est_t, est_h = bank.update_many(tick_ids, tick_t, tick_h)
+        expected = [scalar[key].update_filter(mt, mh) for key, mt, mh in zip(tick_ids, tick_t, tick_h)]
+        np.testing.assert_array_equal(est_t, [e[0] for e in expected])
+        np.testing.assert_array_equal(est_h, [e[1] for e in expected])
+
+    for key in ids:
+        kf = scalar[key]
+        assert bank.estimate(key) == (kf.temp_estimate, kf.humidity_estimate)
+        assert bank.get(key, 'P_temp') == kf.P_temp
+        assert bank.get(key, 'P_humidity') == kf.P_humidity
+
+
+def test_update_many_matches_scalar_bank_updates():
+    temps, hums = _readings(20, 30, seed=2)
+    ids = [f'node-{i % 7}' for i in range(20)]  # several readings per sensor in one call
+    vectorized = DHT22_KalmanFilterBank(25.0, 50.0)
+    scalar = DHT22_KalmanFilterBank(25.0, 50.0)
+    for t in range(30):
+        vectorized.update_many(ids, temps[t], hums[t])
+        for key, mt, mh in zip(ids, temps[t], hums[t]):
+            scalar.update_filter(key, mt, mh)
+    assert vectorized.snapshot()[0] == scalar.snapshot()[0]
+    for name, column in vectorized.snapshot()[1].items():
+        np.testing.assert_array_equal(column, scalar.snapshot()[1][name])
+
+
+def test_update_many_validates_shapes_and_capacity():
+    bank = DHT22_KalmanFilterBank(25.0, 50.0, capacity=4)
+    with pytest.raises(ValueError):
+        bank.update_many(['a', 'b'], [25.0], [50.0, 51.0])
+    with pytest.raises(ValueError):
+        bank.update_many([f'k{i}' for i in range(5)], [25.0] * 5, [50.0] * 5)
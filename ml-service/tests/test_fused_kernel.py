@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from utils import wellness_logic
+from utils.wellness_logic import VSD_FEATURE_DIM, VSD_MODEL, VSD_SCALER, build_fused_kernel
+
+pytestmark = pytest.mark.skipif(VSD_MODEL is None, reason=f"VSD model not loaded: {wellness_logic.VSD_MODEL_ERROR}")
+
+ATOL = 1e-9
+
+
+def _rows(n, seed=42):
+    """Feature rows spread over +-3 standard deviations of the training distribution."""
+    rng = np.random.default_rng(seed)
+    return VSD_SCALER.mean_ + VSD_SCALER.scale_ * rng.standard_normal((n, VSD_FEATURE_DIM)) * 3
+
+
+def _sklearn_risk(X):
+    return np.clip(100 - VSD_MODEL.predict_proba(VSD_SCALER.transform(X))[:, 1] * 100, 0, 100)
+
+
+def test_fused_kernel_matches_scaler_and_model():
+    w, b = build_fused_kernel(VSD_SCALER, VSD_MODEL)
+    X = _rows(5000)
+    expected = VSD_MODEL.predict_proba(VSD_SCALER.transform(X))[:, 1]
+    np.testing.assert_allclose(wellness_logic._sigmoid(X @ w + b), expected, rtol=0, atol=ATOL)
+
+
+def test_predict_vsd_risk_fused_vs_sklearn(monkeypatch):
+    monkeypatch.setattr(wellness_logic, 'VSD_FUSED_KERNEL', build_fused_kernel(VSD_SCALER, VSD_MODEL))
+    X = _rows(2000, seed=7)
+    reference = _sklearn_risk(X)
+    np.testing.assert_allclose(wellness_logic.predict_vsd_risk_batch(X), reference, rtol=0, atol=ATOL)
+    singles = [wellness_logic.predict_vsd_risk(list(row)) for row in X[:200]]
+    np.testing.assert_allclose(singles, reference[:200], rtol=0, atol=ATOL)
+
+
+def test_sklearn_fallback_is_the_reference(monkeypatch):
+    monkeypatch.setattr(wellness_logic, 'VSD_FUSED_KERNEL', None)
+    X = _rows(100, seed=3)
+    np.testing.assert_array_equal(wellness_logic.predict_vsd_risk_batch(X), _sklearn_risk(X))
+
+
+def test_fused_kernel_rejects_non_linear_model():
+    class NotLinear:
+        pass
+    assert build_fused_kernel(VSD_SCALER, NotLinear()) is None
+
+
+def test_fused_kernel_rejects_non_finite_input(monkeypatch):
+    monkeypatch.setattr(wellness_logic, 'VSD_FUSED_KERNEL', build_fused_kernel(VSD_SCALER, VSD_MODEL))
+    row = list(_rows(1)[0])
+    row[3] = float('nan')
+    with pytest.raises(ValueError):
+        wellness_logic.predict_vsd_risk(row)
@@ -0,0 +1,63 @@
+import librosa
+import numpy as np
+import pytest
+
+from utils.feature_extraction import (
+    N_FFT, HOP_LENGTH, N_MFCC, FEATURE_PARITY_RTOL, FEATURE_PARITY_ATOL, ScratchBuffers, mfcc_bases, mfcc_means
+)
+
+SR = 16000
+
+
+def _signal(seconds, kind, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SR)) / SR
+    if kind == 'noise':
+        return (0.1 * rng.standard_normal(t.size)).astype(np.float32)
+    if kind == 'silence':
+        return np.zeros(t.size, dtype=np.float32)
+    # Voice-like: a wandering fundamental with harmonics and a little noise
+    f0 = 140 + 30 * np.sin(2 * np.pi * 0.5 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / SR
+    voice = sum(np.sin(k * phase) / k for k in range(1, 6))
+    return (0.2 * voice + 0.01 * rng.standard_normal(t.size)).astype(np.float32)
+
+
+def _power(signal, sr=SR):
+    return np.abs(librosa.stft(signal, n_fft=N_FFT, hop_length=HOP_LENGTH, pad_mode='constant')) ** 2
+
+
+def _librosa_mfcc_means(power, sr=SR):
+    mel = librosa.feature.melspectrogram(S=power, sr=sr, n_fft=N_FFT)
+    return np.mean(librosa.feature.mfcc(S=librosa.power_to_db(mel), n_mfcc=N_MFCC), axis=1)
+
+
+@pytest.mark.parametrize('kind', ['voice', 'noise', 'silence'])
+@pytest.mark.parametrize('seconds', [0.25, 1, 5])
+def test_mfcc_means_matches_librosa(kind, seconds):
+    power = _power(_signal(seconds, kind))
+    np.testing.assert_allclose(mfcc_means(power, SR), _librosa_mfcc_means(power),
+                               rtol=FEATURE_PARITY_RTOL, atol=FEATURE_PARITY_ATOL)
+
+
+@pytest.mark.parametrize('sr', [8000, 22050])
+def test_mfcc_means_matches_librosa_at_other_rates(sr):
+    power = _power(_signal(2, 'voice'), sr)
+    np.testing.assert_allclose(mfcc_means(power, sr), _librosa_mfcc_means(power, sr),
+                               rtol=FEATURE_PARITY_RTOL, atol=FEATURE_PARITY_ATOL)
+
+
+def test_mfcc_means_with_scratch_buffers_is_unchanged():
+    scratch = ScratchBuffers()
+    long_power, short_power = _power(_signal(3, 'voice')), _power(_signal(1, 'noise'))
+    expected = mfcc_means(short_power, SR)
+    mfcc_means(long_power, SR, scratch=scratch)
+    np.testing.assert_array_equal(mfcc_means(short_power, SR, scratch=scratch), expected)
+
+
+def test_mfcc_bases_are_cached_and_read_only():
+    mel_basis, dct_basis = mfcc_bases(SR)
+    assert mfcc_bases(SR)[0] is mel_basis
+    assert mel_basis.shape == (128, 1 + N_FFT // 2) and dct_basis.shape == (N_MFCC, 128)
+    assert not mel_basis.flags.writeable and not dct_basis.flags.writeable
+    np.testing.assert_allclose(mel_basis, librosa.filters.mel(sr=SR, n_fft=N_FFT), rtol=0, atol=0)
@@ -0,0 +1,73 @@
+import threading
+
+import librosa
+import numpy as np
+import pytest
+
+from utils import resampling
+from utils.resampling import resample, resample_plan_stats, clear_resample_plans, RESAMPLE_PARITY_ATOL
+
+TARGET_SR = 16000
+
+
+def _signal(n, seed=0, dtype=np.float32):
+    return (0.1 * np.random.default_rng(seed).standard_normal(n)).astype(dtype)
+
+
+@pytest.mark.parametrize('orig_sr', [44100, 48000, 22050, 8000, 11025])
+@pytest.mark.parametrize('n', [1, 2, 7, 100, 4410, 132307])
+def test_resample_matches_librosa_for_any_length(orig_sr, n):
+    signal = _signal(n)
+    ref = librosa.resample(signal, orig_sr=orig_sr, target_sr=TARGET_SR)
+    out = resample(signal, orig_sr, TARGET_SR)
+    assert out.shape == ref.shape and out.dtype == ref.dtype
+    np.testing.assert_allclose(out, ref, rtol=0, atol=RESAMPLE_PARITY_ATOL)
+
+
+def test_resample_float64_and_passthrough():
+    signal = _signal(12345, dtype=np.float64)
+    np.testing.assert_allclose(resample(signal, 44100, TARGET_SR),
+                               librosa.resample(signal, orig_sr=44100, target_sr=TARGET_SR), rtol=0, atol=RESAMPLE_PARITY_ATOL)
+    assert resample(signal, TARGET_SR, TARGET_SR) is signal
+
+
+def test_single_sample_clip_extracts():
+    from utils.wellness_logic import extract_features_from_signal
+    assert len(extract_features_from_signal(_signal(1), 44100)) == 16
+
+
+def test_plans_are_shared_across_threads():
+    clear_resample_plans()
+    before = resample_plan_stats()
+    signal = _signal(44100)
+    # One call per short-lived thread, like the threaded server's thread per request
+    for _ in range(10):
+        t = threading.Thread(target=resample, args=(signal, 44100, TARGET_SR))
+        t.start()
+        t.join()
+    stats = resample_plan_stats()
+    assert stats['created'] - before['created'] == 1
+    assert stats['reused'] - before['reused'] == 9
+
+
+def test_concurrent_resamples_never_share_a_plan():
+    clear_resample_plans()
+    n_threads = 8
+    start = threading.Barrier(n_threads)
+    signals = [_signal(30000 + 17 * i, seed=i) for i in range(n_threads)]
+    results = [None] * n_threads
+
+    def worker(i):
+        start.wait()
+        for _ in range(5):
+            results[i] = resample(signals[i], 48000, TARGET_SR)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n_threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for signal, out in zip(signals, results):
+        np.testing.assert_allclose(out, librosa.resample(signal, orig_sr=48000, target_sr=TARGET_SR),
+                                   rtol=0, atol=RESAMPLE_PARITY_ATOL)
+    assert resample_plan_stats()['idle'] <= resampling.RESAMPLE_PLANS_PER_KEY
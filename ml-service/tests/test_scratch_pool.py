@@ -0,0 +1,77 @@
+import http.client
+import threading
+
+import numpy as np
+import pytest
+from werkzeug.serving import make_server
+
+from utils import feature_extraction
+from utils.feature_extraction import ScratchPool, compute_vsd_features, magnitude_spectrogram
+
+SR = 16000
+
+
+def _clip(seconds, seed):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SR)) / SR
+    return (0.3 * np.sin(2 * np.pi * (120 + 40 * rng.random()) * t) + 0.05 * rng.standard_normal(t.size)).astype(np.float32)
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = ScratchPool(size=2)
+    monkeypatch.setattr(feature_extraction, 'SCRATCH_POOL', pool)
+    return pool
+
+
+def test_pooled_buffers_do_not_change_features(pool):
+    clips = [_clip(3, 0), _clip(1, 1), _clip(3, 0)]  # shrink then regrow reuses stale buffers
+    features = [compute_vsd_features(clip, SR) for clip in clips]
+    np.testing.assert_array_equal(features[0], features[2])
+    assert pool.created == 1 and pool.reused == 2
+    # Unpooled magnitudes match the pooled STFT the extraction used
+    with pool.borrow() as scratch:
+        np.testing.assert_array_equal(magnitude_spectrogram(clips[1], scratch), magnitude_spectrogram(clips[1]))
+
+
+def test_thread_per_request_server_reuses_buffers(pool, monkeypatch):
+    import app as ml_app
+    monkeypatch.setattr(ml_app, 'FEATURE_CACHE', None)  # every request must extract
+    server = make_server('127.0.0.1', 0, ml_app.app, threaded=True)
+    serving = threading.Thread(target=server.serve_forever, daemon=True)
+    serving.start()
+    try:
+        n_requests = 6
+        for seed in range(n_requests):
+            # A new connection per request: the threaded server handles each on a fresh thread
+            conn = http.client.HTTPConnection('127.0.0.1', server.server_port, timeout=60)
+            body = (_clip(2, seed) * 32767).astype('<i2').tobytes()
+            conn.request('POST', '/analyze/pcm', body=body, headers={'X-Sample-Rate': str(SR)})
+            assert conn.getresponse().status == 200
+            conn.close()
+    finally:
+        server.shutdown()
+    assert pool.created == 1
+    assert pool.reused == n_requests - 1
+
+
+def test_concurrent_extractions_keep_a_bounded_pool(pool):
+    n_threads = 6
+    start = threading.Barrier(n_threads)
+    clip = _clip(1, 0)
+    results = [None] * n_threads
+
+    def worker(i):
+        start.wait()
+        results[i] = compute_vsd_features(clip, SR)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n_threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for features in results[1:]:
+        np.testing.assert_array_equal(features, results[0])
+    stats = pool.stats()
+    assert stats['idle'] <= pool.size
+    assert stats['created'] + stats['reused'] == n_threads
@@ -0,0 +1,286 @@
+import fcntl
+import multiprocessing as mp
+import os
+import uuid
+
+import numpy as np
+import pytest
+
+from benchmarks.stress_shared_state import _reader, _reference_P, _writer, _writer_keys
+from utils.shared_state import (
+    SharedDHT22_KalmanFilterBank, SharedWellnessFusionBank, SharedSlotTable, unlink_shared_state, _TABLE_SEQ,
+    _lock_path
+)
+from utils.state_store import StateStore
+
+CTX = mp.get_context('spawn')
+
+
+def _unique_name():
+    return f'vsd-test-{os.getpid()}-{uuid.uuid4().hex[:8]}'
+
+
+def _unlink(name):
+    for suffix in ('dht22', 'fusion'):
+        unlink_shared_state(f'{name}-{suffix}')
+
+
+@pytest.fixture
+def name():
+    name = _unique_name()
+    yield name
+    _unlink(name)
+
+
+def _banks(name):
+    # Equal initial values and noise for both channels: the two estimates must stay identical
+    return (SharedDHT22_KalmanFilterBank(25.0, 25.0, f'{name}-dht22', R_temp=0.5, R_humidity=0.5),
+            SharedWellnessFusionBank(f'{name}-fusion'))
+
+
+def _start(procs):
+    for p in procs:
+        p.start()
+
+
+def _join(procs):
+    for p in procs:
+        p.join(120)
+    assert all(p.exitcode == 0 for p in procs)
+
+
+# ==========================================================
+# Writers and Readers in Separate Processes
+# ==========================================================
+
+N_WRITERS = 3
+N_UPDATES = 1500
+N_KEYS = 60  # ~75 updates per key, each key written by every writer
+
+
+@pytest.fixture(scope='module')
+def stressed():
+    """Runs the stress_shared_state writers and readers once; yields (dht, fusion, per-key counts, reader stats)."""
+    name = _unique_name()
+    dht, fusion = _banks(name)
+    start, stop, results = CTX.Barrier(N_WRITERS + 2 + 1), CTX.Event(), CTX.Queue()
+    writers = [CTX.Process(target=_writer, args=(name, w, N_UPDATES, N_KEYS, start)) for w in range(N_WRITERS)]
+    readers = [CTX.Process(target=_reader, args=(name, N_KEYS, start, stop, results)) for _ in range(2)]
+    _start(writers + readers)
+    start.wait()
+    _join(writers)
+    stop.set()
+    reader_stats = np.sum([results.get(timeout=60) for _ in readers], axis=0).tolist()
+    _join(readers)
+    counts = {}
+    for w in range(N_WRITERS):
+        for key in _writer_keys(w, N_UPDATES, N_KEYS):
+            counts[key] = counts.get(key, 0) + 1
+    yield dht, fusion, counts, reader_stats
+    dht.close()
+    fusion.close()
+    _unlink(name)
+
+
+def test_no_lost_updates_across_processes(stressed):
+    dht, fusion, counts, _ = stressed
+    # Covariances depend only on how many updates a key received
+    reference = _reference_P(counts.values())
+    for key, n in counts.items():
+        assert dht.get(key, 'P_temp') == reference[n][0], key
+        assert fusion.get(key, 'P_wellness') == reference[n][1], key
+    assert sum(counts.values()) == N_WRITERS * N_UPDATES
+
+
+def test_no_torn_reads_across_processes(stressed):
+    dht, _, counts, (reads, torn, _, _) = stressed
+    # Both channels get identical readings, so any seqlock read with temp != humidity was torn
+    assert reads > 0
+    assert torn == 0
+    for key in counts:
+        assert dht.get(key, 'temp_estimate') == dht.get(key, 'humidity_estimate'), key
+
+
+def _insert_all(name, keys, start):
+    dht, fusion = _banks(name)
+    start.wait()
+    for key in keys:
+        T, _ = dht.update_filter(key, 25.0, 25.0)
+        fusion.update_fusion(key, T, T, T, measurement_source='VSD')
+    dht.close()
+    fusion.close()
+
+
+def test_concurrent_inserts_of_the_same_keys(name):
+    dht, fusion = _banks(name)
+    n_procs, keys = 4, [f'new-{i}' for i in range(200)]
+    start = CTX.Barrier(n_procs)
+    # Every process inserts every key, in a different order
+    orders = [keys[p * 50:] + keys[:p * 50] for p in range(n_procs)]
+    procs = [CTX.Process(target=_insert_all, args=(name, order[::-1] if p % 2 else order, start))
+             for p, order in enumerate(orders)]
+    _start(procs)
+    _join(procs)
+    assert len(dht) == len(keys) == len(fusion)
+    assert set(dht.keys()) == set(keys) == set(fusion.keys())
+    reference = _reference_P([n_procs])[n_procs]
+    for key in keys:
+        assert (dht.get(key, 'P_temp'), fusion.get(key, 'P_wellness')) == reference, key
+
+
+# ==========================================================
+# Crash While Holding a Lock
+# ==========================================================
+
+def _die_holding_exclusive(name, ready):
+    dht, _ = _banks(name)
+    dht.lock.acquire()
+    ready.set()
+    os.kill(os.getpid(), 9)
+
+
+def _die_mid_update(name, key, ready):
+    dht, _ = _banks(name)
+    table = dht.table
+
+    def half_update(slot, *args):
+        table.columns['temp_estimate'][slot] = 99.0  # torn: humidity not written
+        ready.set()
+        os.kill(os.getpid(), 9)
+
+    dht._shared_update(key, half_update)
+
+
+def _run_and_kill(target, *args):
+    ready = CTX.Event()
+    proc = CTX.Process(target=target, args=args + (ready,))
+    proc.start()
+    proc.join(60)
+    assert proc.exitcode == -9 and ready.is_set()
+
+
+def test_crash_holding_exclusive_lock_keeps_seqlock_parity(name):
+    dht, _ = _banks(name)
+    before = dht.update_filter('a', 25.0, 25.0)
+    _run_and_kill(_die_holding_exclusive, name)
+    table = dht.table
+    assert int(table.header[_TABLE_SEQ]) & 1  # left odd by the dead holder
+
+    # Lock-free reads cannot succeed while the word is odd; locked reads still answer
+    assert table.read('a', table.encode('a'), ('temp_estimate',)) is False
+    assert dht.estimate('a') == before
+
+    # The next exclusive holder repairs the parity (and the index); lock-free reads work again
+    dht.update_filter('b', 26.0, 26.0)
+    assert int(table.header[_TABLE_SEQ]) & 1 == 0
+    for key in ('a', 'b'):
+        values = table.read(key, table.encode(key), ('temp_estimate', 'humidity_estimate'))
+        assert values is not False and values[0] == values[1]
+    with dht.lock:
+        assert int(table.header[_TABLE_SEQ]) & 1
+    assert int(table.header[_TABLE_SEQ]) & 1 == 0
+    assert len(dht) == 2 and set(dht.keys()) == {'a', 'b'}
+
+
+def test_crash_mid_slot_update_keeps_seqlock_parity(name):
+    dht, _ = _banks(name)
+    dht.update_filter('a', 25.0, 25.0)
+    _run_and_kill(_die_mid_update, name, 'a')
+    table = dht.table
+    slot = table.probe(table.encode('a'))
+    assert int(table.seq[slot]) & 1
+
+    # The next writer of the slot moves on to the next odd / even values
+    dht.update_filter('a', 25.0, 25.0)
+    assert int(table.seq[slot]) & 1 == 0
+    assert table.read('a', table.encode('a'), ('temp_estimate',)) is not False
+    dht.update_filter('a', 25.0, 25.0)
+    assert int(table.seq[slot]) & 1 == 0
+
+
+# ==========================================================
+# Layout Changes Across Releases
+# ==========================================================
+
+class _PreviousReleaseBank(SharedDHT22_KalmanFilterBank):
+    """The DHT22 bank as released before `last_time` was added."""
+    FIELDS = tuple(f for f in SharedDHT22_KalmanFilterBank.FIELDS if f != 'last_time')
+
+
+def _shm_names():
+    return set(os.listdir('/dev/shm'))
+
+
+def test_layout_change_creates_fresh_segments(name):
+    base = f'{name}-dht22'
+    old = SharedSlotTable(base, ('a', 'b'), capacity=16)
+    old_segment = old.name
+    assert old.created and old_segment in _shm_names()
+
+    new = SharedSlotTable(base, ('a', 'b', 'c'), capacity=16)
+    assert new.created and new.name != old_segment
+    # The new layout's creator drops the old name; the attached process keeps working on its mapping
+    assert old_segment not in _shm_names() and new.name in _shm_names()
+    old.columns['a'][0] = 1.0
+    assert SharedSlotTable(base, ('a', 'b', 'c'), capacity=16).created is False
+    old.close()
+    new.close()
+
+
+def test_untagged_segment_of_older_releases_is_removed(name):
+    from multiprocessing import shared_memory
+    base = f'{name}-dht22'
+    legacy = shared_memory.SharedMemory(name=base, create=True, size=4096)
+    legacy.close()
+    dht = SharedDHT22_KalmanFilterBank(25.0, 50.0, base)
+    assert dht.created and base not in _shm_names()
+    dht.close()
+
+
+def test_layout_change_restores_from_state_dir(name, tmp_path):
+    base = f'{name}-dht22'
+    old = _PreviousReleaseBank(25.0, 50.0, base)
+    keys = [f'device-{i}' for i in range(20)]
+    old.restore(keys, {'temp_estimate': np.arange(20.0), 'humidity_estimate': np.arange(20.0) + 40,
+                       'P_temp': np.full(20, 0.5), 'P_humidity': np.full(20, 0.25)})
+    StateStore(str(tmp_path), {'dht22': old}).open(restore=False).close()
+    old.close()
+
+    # The next release adds a field: its first worker creates the new layout and restores it
+    new = SharedDHT22_KalmanFilterBank(25.0, 50.0, base)
+    assert new.created and len(new) == 0
+    store = StateStore(str(tmp_path), {'dht22': new}).open(restore=new.created)
+    try:
+        assert store.restored_keys == 20
+        for i, key in enumerate(keys):
+            assert new.estimate(key) == (float(i), float(i) + 40)
+        new.update_filter('device-3', 3.0, 43.0, timestamp=1000.0)
+        assert new.get('device-3', 'last_time') == 1000.0
+    finally:
+        store.close()
+        new.close()
+
+
+def _stripe_is_locked(path, index):
+    fd = os.open(path, os.O_RDWR)
+    try:
+        fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, index)
+    except OSError:
+        os._exit(0)
+    os._exit(1)
+
+
+def test_opening_and_closing_a_table_keeps_the_stripe_locks_held(name):
+    table = SharedSlotTable(name, ('x',), 16)
+    try:
+        with table.lock.stripe(3):
+            # Record locks are per process: any descriptor of the lock file closed here would drop them
+            other = SharedSlotTable(name, ('x',), 16)
+            other.close()
+            probe = CTX.Process(target=_stripe_is_locked, args=(_lock_path(table.name), 3))
+            probe.start()
+            probe.join(60)
+            assert probe.exitcode == 0
+    finally:
+        table.close()
+        unlink_shared_state(name)
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from utils.stream_sessions import StreamSessionStore, StreamSessionError
+
+
+def _chunk(n=4000, seed=0):
+    return (0.1 * np.random.default_rng(seed).standard_normal(n)).astype(np.float32)
+
+
+def test_push_after_finalize_is_a_session_error():
+    store = StreamSessionStore()
+    session_id = store.open()
+    store.push(session_id, _chunk())
+    store.finalize(session_id)
+    with pytest.raises(StreamSessionError):
+        store.push(session_id, _chunk())
+
+
+def test_push_racing_finalize_is_a_session_error(monkeypatch):
+    store = StreamSessionStore()
+    session_id = store.open()
+    store.push(session_id, _chunk())
+    touch = store._touch
+
+    def touch_then_finalize(sid):
+        # The push has its extractor but not the session lock yet when another request finalizes
+        entry = touch(sid)
+        store.finalize(sid)
+        return entry
+
+    monkeypatch.setattr(store, '_touch', touch_then_finalize)
+    with pytest.raises(StreamSessionError):
+        store.push(session_id, _chunk(seed=1))
+
+
+@pytest.fixture
+def client():
+    import app as ml_app
+    return ml_app.app.test_client()
+
+
+def test_oversized_chunk_is_rejected_before_reading(client, monkeypatch):
+    monkeypatch.setitem(client.application.config, 'MAX_PCM_BODY_BYTES', 1024)
+    session_id = client.post('/stream/open', json={'sample_rate': 16000}).get_json()['session_id']
+    body = _chunk(256).tobytes()  # 1024 bytes of float32
+    headers = {'X-Sample-Format': 'float32'}
+    assert client.post(f'/stream/{session_id}/chunk', data=body, headers=headers).status_code == 200
+    response = client.post(f'/stream/{session_id}/chunk', data=body + body, headers=headers)
+    assert response.status_code == 413
+
+
+def test_stream_endpoints_answer_503_without_sessions(client, monkeypatch):
+    import app as ml_app
+    monkeypatch.setattr(ml_app, 'STREAM_SESSIONS', None)
+    assert client.post('/stream/open', json={'sample_rate': 16000}).status_code == 503
+    assert client.post('/stream/abc/chunk', data=b'\0\0').status_code == 503
+    assert client.post('/stream/abc/finalize').status_code == 503
+
+
+def test_db_histogram_fits_in_300_kb_per_session():
+    from utils.streaming import StreamingFeatureExtractor
+    extractor = StreamingFeatureExtractor()
+    assert extractor._db_counts.nbytes + extractor._db_offsets.nbytes <= 300 * 1024
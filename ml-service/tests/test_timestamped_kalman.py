@@ -0,0 +1,68 @@
+import math
+
+import pytest
+
+from utils.wellness_logic import DHT22_KalmanFilter, DHT22_KalmanFilterBank, WellnessFusionBank, _elapsed_q_scale
+
+INTERVAL, WINDOW, MAX_GAP = 1.0, 300.0, 3600.0
+
+
+@pytest.mark.parametrize('last_time, timestamp, expected', [
+    (float('nan'), 5.0, (1.0, 5.0)),       # first reading
+    (10.0, 12.5, (2.5, 12.5)),             # scaled by elapsed time
+    (10.0, 10.0 + MAX_GAP, (MAX_GAP, 10.0 + MAX_GAP)),
+    (10.0, 1.7e9, (MAX_GAP, 1.7e9)),       # millis() then epoch seconds: clamped, accepted
+    (100.0, 90.0, (None, 100.0)),          # out of order inside the window: dropped
+    (1.7e9, 12.0, (1.0, 12.0)),            # clock reset: accepted, Q added once
+])
+def test_elapsed_q_scale(last_time, timestamp, expected):
+    assert _elapsed_q_scale(last_time, timestamp, INTERVAL, WINDOW, MAX_GAP) == expected
+
+
+def test_forward_clock_jump_keeps_the_filter_bounded():
+    jumped = DHT22_KalmanFilter(25.0, 50.0, max_gap=MAX_GAP)
+    gap = DHT22_KalmanFilter(25.0, 50.0, max_gap=MAX_GAP)
+    for i in range(100):
+        jumped.update_filter(25.0, 50.0, timestamp=float(i))
+        gap.update_filter(25.0, 50.0, timestamp=float(i))
+    jumped.update_filter(30.0, 55.0, timestamp=1.7e9)
+    gap.update_filter(30.0, 55.0, timestamp=99.0 + MAX_GAP)
+    assert math.isfinite(jumped.P_temp) and jumped.P_temp < 1.0
+    assert (jumped.temp_estimate, jumped.P_temp, jumped.P_humidity) == (gap.temp_estimate, gap.P_temp, gap.P_humidity)
+
+
+def test_one_interval_apart_matches_untimestamped_banks():
+    timed_dht, plain_dht = DHT22_KalmanFilterBank(25.0, 50.0), DHT22_KalmanFilterBank(25.0, 50.0)
+    timed_fusion, plain_fusion = WellnessFusionBank(), WellnessFusionBank()
+    for i in range(500):
+        t, h = 25.0 + (i % 7) * 0.1, 50.0 - (i % 5) * 0.3
+        stamp = 1.7e9 + i * INTERVAL
+        assert timed_dht.update_filter('d', t, h, timestamp=stamp) == plain_dht.update_filter('d', t, h)
+        assert (timed_fusion.update_fusion('u', 60.0, t, h, timestamp=stamp)
+                == plain_fusion.update_fusion('u', 60.0, t, h))
+
+
+def test_fusion_clocks_are_kept_per_source():
+    # /ambient sends the device's millis(), /predict_features the gateway's Date.now()
+    timed, plain = WellnessFusionBank(), WellnessFusionBank()
+    for i in range(200):
+        uptime, epoch = 60.0 + i * INTERVAL, 1.7e9 + i * INTERVAL
+        assert (timed.update_fusion('u', 60.0, 25.0, 50.0, measurement_source='AMBIENT', timestamp=uptime)
+                == plain.update_fusion('u', 60.0, 25.0, 50.0, measurement_source='AMBIENT'))
+        assert (timed.update_fusion('u', 60.0, 25.0, 50.0, measurement_source='VSD', timestamp=epoch)
+                == plain.update_fusion('u', 60.0, 25.0, 50.0, measurement_source='VSD'))
+    assert timed.get('u', 'P_wellness') == plain.get('u', 'P_wellness') < 1.0
+    assert timed.get('u', 'last_time_ambient') == 60.0 + 199 * INTERVAL
+    assert timed.get('u', 'last_time') == 1.7e9 + 199 * INTERVAL
+
+
+def test_fusion_scales_q_between_same_source_updates():
+    bank = WellnessFusionBank()
+    bank.update_fusion('u', 60.0, 25.0, 50.0, measurement_source='AMBIENT', timestamp=100.0)
+    bank.update_fusion('u', 60.0, 25.0, 50.0, measurement_source='AMBIENT', timestamp=101.0)
+    p = bank.get('u', 'P_wellness')
+    bank.update_fusion('u', 60.0, 25.0, 50.0, measurement_source='AMBIENT', timestamp=101.0 + 50 * INTERVAL)
+    assert bank.get('u', 'P_wellness') > p
+    # a late reading on one clock is still dropped while the other clock moves on
+    before = bank.estimate('u')
+    assert bank.update_fusion('u', 10.0, 25.0, 50.0, measurement_source='AMBIENT', timestamp=120.0) == before
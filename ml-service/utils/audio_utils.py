@@ -0,0 +1,111 @@
+import io
+import os
+import tempfile
+
+import numpy as np
+import soundfile as sf
+
+# --- Configuration ---
+# Uploads up to this size are decoded straight from memory; larger ones are
+# spilled to a temporary file so a long recording can't balloon the worker.
+MAX_IN_MEMORY_UPLOAD_BYTES = int(os.environ.get('MAX_IN_MEMORY_UPLOAD_BYTES', 8 * 1024 * 1024))
+UPLOAD_READ_CHUNK_BYTES = 64 * 1024
+# Raw little-endian PCM sample formats accepted by decode_pcm_bytes
+PCM_SAMPLE_FORMATS = {'int16': np.dtype('<i2'), 'float32': np.dtype('<f4')}
+
+
+# ==========================================================
+# 1. Upload Decoding (werkzeug FileStorage -> NumPy)
+# ==========================================================
+
+def _to_mono(signal):
+    """Downmixes a (frames, channels) array to mono the same way librosa.load does."""
+    if signal.ndim > 1:
+        signal = np.mean(signal, axis=1)
+    return np.ascontiguousarray(signal, dtype=np.float32)
+
+
+def decode_audio_bytes(data):
+    """Decodes an in-memory audio container (WAV/FLAC/OGG) into (mono float32 signal, sr)."""
+    signal, sr = sf.read(io.BytesIO(data), dtype='float32', always_2d=False)
+    return _to_mono(signal), sr
+
+
+def decode_audio_file(file_path):
+    """Decodes an audio file on disk, falling back to librosa for formats soundfile can't read."""
+    try:
+        signal, sr = sf.read(file_path, dtype='float32', always_2d=False)
+        return _to_mono(signal), sr
+    except Exception:
+        import librosa
+        return librosa.load(file_path, sr=None)
+
+
+def load_upload(file_storage, spill_dir=None, max_in_memory_bytes=None):
+    """
+    Decodes an uploaded audio file into (signal, sr) without touching disk when it fits
+    in memory. Uploads larger than `max_in_memory_bytes` are spilled to `spill_dir`
+    and removed again once decoded.
+    """
+    if max_in_memory_bytes is None:
+        max_in_memory_bytes = MAX_IN_MEMORY_UPLOAD_BYTES
+
+    stream = file_storage.stream
+    head = stream.read(max_in_memory_bytes + 1)
+
+    if len(head) <= max_in_memory_bytes:
+        try:
+            return decode_audio_bytes(head)
+        except Exception:
+            # Container soundfile doesn't understand (e.g. MP3 on old libsndfile):
+            # let the disk path hand it to librosa/audioread instead.
+            return _spill_and_decode(head, stream, spill_dir)
+
+    return _spill_and_decode(head, stream, spill_dir)
+
+
+def _spill_and_decode(head, stream, spill_dir):
+    """Writes the already-read head plus the rest of the stream to a temp file and decodes it."""
+    if spill_dir and not os.path.exists(spill_dir):
+        os.makedirs(spill_dir)
+
+    fd, spill_path = tempfile.mkstemp(suffix='.wav', dir=spill_dir)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(head)
+            while True:
+                chunk = stream.read(UPLOAD_READ_CHUNK_BYTES)
+                if not chunk:
+                    break
+                f.write(chunk)
+        return decode_audio_file(spill_path)
+    finally:
+        if os.path.exists(spill_path):
+            os.remove(spill_path)
+
+
+# ==========================================================
+# 2. Raw PCM (no container)
+# ==========================================================
+
+def decode_pcm_bytes(data, sample_format='int16', channels=1):
+    """
+    Interprets headerless interleaved little-endian PCM as a mono float32 signal in [-1, 1).
+    Mono float32 is a read-only np.frombuffer view of `data` (no copy); int16 is scaled by
+    1 / 32768 (as soundfile/librosa do) and multi-channel input is downmixed, which allocate once.
+    """
+    dtype = PCM_SAMPLE_FORMATS.get(sample_format)
+    if dtype is None:
+        raise ValueError(f"Unknown sample format '{sample_format}', expected one of {tuple(PCM_SAMPLE_FORMATS)}")
+    channels = int(channels)
+    if channels < 1:
+        raise ValueError(f"channels must be >= 1, got {channels}")
+    if len(data) % (dtype.itemsize * channels):
+        raise ValueError(f"PCM body of {len(data)} bytes is not a whole number of {channels}-channel {sample_format} frames")
+
+    samples = np.frombuffer(data, dtype=dtype)
+    if dtype.kind == 'i':
+        samples = samples * np.float32(1 / 32768)
+    if channels > 1:
+        samples = samples.reshape(-1, channels)
+    return _to_mono(samples)
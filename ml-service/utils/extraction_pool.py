@@ -0,0 +1,114 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+# --- Configuration ---
+# 0 workers = extract inline in the request thread (the default, no extra processes)
+FEATURE_POOL_WORKERS = int(os.environ.get('FEATURE_POOL_WORKERS', 0))
+# Requests queued or running in the pool before new ones are rejected with 429
+FEATURE_POOL_MAX_PENDING = int(os.environ.get('FEATURE_POOL_MAX_PENDING', 4 * max(FEATURE_POOL_WORKERS, 1)))
+FEATURE_POOL_TIMEOUT_SECONDS = float(os.environ.get('FEATURE_POOL_TIMEOUT_SECONDS', 30))
+# 'spawn' is safe to use from a threaded server; 'fork' starts faster but must be created
+# before any request threads exist
+FEATURE_POOL_START_METHOD = os.environ.get('FEATURE_POOL_START_METHOD', 'spawn')
+
+
+class PoolSaturatedError(Exception):
+    """Raised when the extraction queue is full; the caller should answer 429."""
+
+
+class ExtractionTimeoutError(Exception):
+    """Raised when a task does not finish within the per-task timeout."""
+
+
+# ==========================================================
+# 1. Worker Side
+# ==========================================================
+
+def _warm_worker():
+    """
+    Pool initializer: imports librosa/numba and runs one short synthetic clip through the
+    pipeline so the JIT, FFT plans and mel filterbank are ready before real traffic.
+    """
+    from utils.wellness_logic import extract_features_from_signal, synthetic_voice_clip
+
+    extract_features_from_signal(synthetic_voice_clip(), 16000)
+
+
+def _extract_in_worker(signal, original_sr):
+    from utils.wellness_logic import extract_features_from_signal
+
+    return extract_features_from_signal(signal, original_sr)
+
+
+# ==========================================================
+# 2. Parent Side
+# ==========================================================
+
+class FeatureExtractionPool:
+    """
+    Runs extract_features_from_signal in warm worker processes so long clips don't hold the
+    GIL of the request-serving process. At most `max_pending` tasks may be queued or running;
+    beyond that extract() raises PoolSaturatedError instead of growing the queue.
+
+    A timed-out task cannot be interrupted inside its worker: the caller gets
+    ExtractionTimeoutError right away, and the task keeps its queue slot until it ends.
+    """
+    def __init__(self, workers=FEATURE_POOL_WORKERS, max_pending=FEATURE_POOL_MAX_PENDING,
+                 timeout=FEATURE_POOL_TIMEOUT_SECONDS, start_method=FEATURE_POOL_START_METHOD):
+        if workers < 1:
+            raise ValueError(f"FeatureExtractionPool needs at least one worker, got {workers}")
+        self.workers = workers
+        self.max_pending = max(max_pending, workers)
+        self.timeout = timeout
+        self._pending = threading.BoundedSemaphore(self.max_pending)
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context(start_method),
+            initializer=_warm_worker
+        )
+
+    def warm_up(self):
+        """Starts every worker now (running the warm-up initializer) instead of on first use."""
+        futures = [self._executor.submit(int, 0) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    def submit(self, signal, original_sr):
+        """Queues one extraction. Returns a Future, or raises PoolSaturatedError when full."""
+        if not self._pending.acquire(blocking=False):
+            raise PoolSaturatedError(f"feature extraction queue is full ({self.max_pending} pending)")
+        try:
+            future = self._executor.submit(_extract_in_worker, signal, original_sr)
+        except Exception:
+            self._pending.release()
+            raise
+        future.add_done_callback(lambda _: self._pending.release())
+        return future
+
+    def extract(self, signal, original_sr, timeout=None):
+        """Blocking helper: submit() and wait up to the per-task timeout for the 16 features."""
+        future = self.submit(signal, original_sr)
+        try:
+            return future.result(timeout=self.timeout if timeout is None else timeout)
+        except TimeoutError:
+            future.cancel()  # only succeeds if it never started
+            raise ExtractionTimeoutError(f"feature extraction exceeded {self.timeout if timeout is None else timeout:g}s")
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+def create_feature_pool(workers=FEATURE_POOL_WORKERS, **kwargs):
+    """
+    Returns a warmed FeatureExtractionPool, or None when pooling is disabled or when called
+    inside a pool worker. app.py does not run its init in workers (they re-import it as
+    __mp_main__ under 'spawn'); this guard covers other entry points that create a pool at import.
+    """
+    # During 'spawn' bootstrap parent_process() is still None, but the process name is set
+    if workers < 1 or multiprocessing.current_process().name != 'MainProcess':
+        return None
+    pool = FeatureExtractionPool(workers=workers, **kwargs)
+    pool.warm_up()
+    return pool
@@ -0,0 +1,172 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# --- Configuration ---
+FEATURE_CACHE_MAX_BYTES = int(os.environ.get('FEATURE_CACHE_MAX_BYTES', 4 * 1024 * 1024))
+# Empty = memory only; otherwise the cache is loaded from / saved to this .npz file
+FEATURE_CACHE_PATH = os.environ.get('FEATURE_CACHE_PATH', '')
+# Save to disk after this many new entries (and on shutdown)
+FEATURE_CACHE_PERSIST_EVERY = int(os.environ.get('FEATURE_CACHE_PERSIST_EVERY', 100))
+
+DIGEST_BYTES = 16
+# Approximate per-entry footprint: digest + 16 float64 features + dict/list bookkeeping
+ENTRY_OVERHEAD_BYTES = 120
+
+
+def audio_fingerprint(signal, sr, salt=''):
+    """
+    Fast content hash of decoded PCM plus its sample rate. `salt` should identify the
+    feature configuration (engine / pitch backend) so a config change never serves stale rows.
+    """
+    h = hashlib.blake2b(digest_size=DIGEST_BYTES)
+    h.update(f"{salt}|{int(sr)}|{signal.dtype.str}|".encode())
+    h.update(np.ascontiguousarray(signal).view(np.uint8))
+    return h.digest()
+
+
+class FeatureCache:
+    """
+    Bounded LRU map from audio fingerprint to its 16-feature vector, so a retried upload of
+    the same clip skips extract_features. Thread-safe; optionally persisted to an .npz file
+    by a background thread, so a slow or failing disk never reaches the request path.
+    """
+    def __init__(self, max_bytes=FEATURE_CACHE_MAX_BYTES, path=FEATURE_CACHE_PATH,
+                 persist_every=FEATURE_CACHE_PERSIST_EVERY):
+        self.max_bytes = max_bytes
+        self.path = path or None
+        self.persist_every = persist_every
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # digest -> float64 feature array, least recent first
+        self._bytes = 0
+        self._unsaved = 0
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # one writer of the .tmp file at a time
+        self._persist_due = threading.Event()
+        self._closed = False
+        self._saver = None
+        self.save_errors = 0
+        if self.path and os.path.exists(self.path):
+            self.load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _entry_bytes(features):
+        return DIGEST_BYTES + features.nbytes + ENTRY_OVERHEAD_BYTES
+
+    def get(self, key):
+        """Cached feature list for `key`, or None (counts a hit or a miss)."""
+        with self._lock:
+            features = self._entries.get(key)
+            if features is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return features.tolist()
+
+    def put(self, key, features):
+        """Stores a feature vector, evicting least recently used entries over the byte budget."""
+        features = np.asarray(features, dtype=np.float64)
+        size = self._entry_bytes(features)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._insert(key, features, size)
+            self._unsaved += 1
+            persist = self.path and self.persist_every and self._unsaved >= self.persist_every
+            if persist and self._saver is None and not self._closed:
+                self._saver = threading.Thread(target=self._run_saver, name='feature-cache-save', daemon=True)
+                self._saver.start()
+        if persist:
+            self._persist_due.set()
+
+    def _insert(self, key, features, size):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= self._entry_bytes(old)
+        self._entries[key] = features
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= self._entry_bytes(evicted)
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'persist_path': self.path,
+                'save_errors': self.save_errors
+            }
+
+    # ==========================================================
+    # Persistence (atomic .npz snapshot, LRU order preserved)
+    # ==========================================================
+
+    def _run_saver(self):
+        while True:
+            self._persist_due.wait()
+            self._persist_due.clear()
+            if self._closed:
+                return
+            self.save()
+
+    def close(self):
+        """Stops the background saver and writes a final snapshot."""
+        with self._lock:
+            self._closed = True
+            saver = self._saver
+        self._persist_due.set()
+        if saver is not None:
+            saver.join()
+        self.save()
+
+    def save(self):
+        """Writes the snapshot; returns False (and logs) if the disk write failed."""
+        if not self.path:
+            return True
+        with self._lock:
+            keys = np.frombuffer(b''.join(self._entries), dtype=np.uint8).reshape(-1, DIGEST_BYTES)
+            values = np.array(list(self._entries.values())) if self._entries else np.empty((0, 0))
+            self._unsaved = 0
+        tmp_path = f"{self.path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with self._save_lock:
+                with open(tmp_path, 'wb') as f:
+                    np.savez(f, keys=keys, values=values)
+                os.replace(tmp_path, self.path)
+        except OSError as e:
+            # The cache keeps working in memory; the next save retries after persist_every more entries
+            self.save_errors += 1
+            if self.save_errors == 1:
+                print(f"⚠️ Feature cache save to {self.path} failed, cache is not being persisted: {e}")
+            return False
+        return True
+
+    def load(self):
+        try:
+            with np.load(self.path) as data:
+                keys, values = data['keys'], data['values']
+        except Exception as e:
+            print(f"⚠️ Ignoring unreadable feature cache {self.path}: {e}")
+            return
+        with self._lock:
+            for key, features in zip(keys, values):
+                features = np.asarray(features, dtype=np.float64)
+                self._insert(key.tobytes(), features, self._entry_bytes(features))
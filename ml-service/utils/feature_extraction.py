@@ -0,0 +1,392 @@
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+import librosa
+import scipy.fft
+
+from utils.metrics import stage
+
+# --- Configuration (matches librosa's defaults used by the original pipeline) ---
+N_FFT = 2048
+HOP_LENGTH = 512
+N_MFCC = 13
+N_MELS = 128
+TOP_DB = 80.0  # power_to_db floor: max - TOP_DB
+AMIN = 1e-10
+PITCH_FMIN = 75
+PITCH_FMAX = 300
+PIPTRACK_THRESHOLD = 0.1
+ZCR_THRESHOLD = 1e-10
+
+# Pitch backends: 'piptrack' reproduces librosa.piptrack's pitch_mean exactly (the model
+# was trained on it); 'yin' is a vectorized YIN F0 estimator restricted to the same band.
+PITCH_BACKENDS = ('piptrack', 'yin')
+YIN_FRAME_LENGTH = 512
+YIN_THRESHOLD = 0.1
+YIN_BLOCK_FRAMES = 512  # frames per FFT block, bounds the temporary correlation matrix
+
+# Documented tolerance of compute_vsd_features against compute_vsd_features_librosa.
+# MFCC/pitch come from the very same spectrogram, so differences are float32 FFT
+# round-off; RMS/ZCR are summed in float64 instead of float32.
+FEATURE_PARITY_RTOL = 1e-3
+FEATURE_PARITY_ATOL = 1e-3
+
+# Pooled work buffers keep the size of the largest of the last SCRATCH_HISTORY clips
+SCRATCH_HISTORY = 8
+# Idle buffer sets kept for reuse; concurrent extractions beyond this get a temporary set
+SCRATCH_POOL_SIZE = int(os.environ.get('FEATURE_SCRATCH_POOL_SIZE', 4))
+
+
+# ==========================================================
+# 1. Reference Pipeline (one librosa call per feature)
+# ==========================================================
+
+def compute_vsd_features_librosa(signal, sr):
+    """
+    The original extraction: mfcc, rms, zero_crossing_rate and piptrack each frame
+    and transform the signal on their own. Kept as the parity/benchmark reference.
+    """
+    mfccs = librosa.feature.mfcc(y=signal, sr=sr, n_mfcc=N_MFCC)
+    mfccs_mean = np.mean(mfccs.T, axis=0)
+
+    rms_mean = np.mean(librosa.feature.rms(y=signal)[0])
+    zcr_mean = np.mean(librosa.feature.zero_crossing_rate(y=signal)[0])
+    pitches, _ = librosa.core.piptrack(y=signal, sr=sr, fmin=PITCH_FMIN, fmax=PITCH_FMAX)
+    pitch = pitches[pitches > 0]
+    pitch_mean = np.mean(pitch) if pitch.size > 0 else 0
+
+    return np.hstack([mfccs_mean, rms_mean, zcr_mean, pitch_mean])
+
+
+# ==========================================================
+# 2. Pitch Backends (pitch_mean = mean of detected in-band pitches, 0 if none)
+# ==========================================================
+
+def _parabolic_shift(prev, center, nxt):
+    """Vertex offset of the parabola through three points; 0 where it falls outside [-1, 1] (as librosa)."""
+    a = nxt + prev - 2 * center
+    b = (nxt - prev) / 2
+    inside = np.abs(b) < np.abs(a)
+    return np.divide(-b, a, out=np.zeros_like(center), where=inside)
+
+
+def piptrack_pitches(S, sr, n_fft=N_FFT, fmin=PITCH_FMIN, fmax=PITCH_FMAX):
+    """
+    The positive pitches of librosa.piptrack(S=S, fmin, fmax), but only the in-band FFT rows
+    (plus one neighbour each side) are interpolated and searched for peaks.
+    """
+    freqs = librosa.fft_frequencies(sr=sr, n_fft=n_fft)
+    band = np.flatnonzero((fmin <= freqs) & (freqs < fmax))
+    if band.size == 0 or S.shape[-1] == 0:
+        return np.empty(0)
+    lo, hi = band[0], band[-1] + 1
+    if lo == 0 or hi == S.shape[0]:
+        # Band touches the spectrum edge, where librosa special-cases peaks; defer to it
+        pitches, _ = librosa.core.piptrack(S=S, sr=sr, n_fft=n_fft, fmin=fmin, fmax=fmax)
+        return pitches[pitches > 0]
+
+    ref_value = PIPTRACK_THRESHOLD * np.max(S, axis=0)
+    X = S[lo - 1:hi + 1]
+    thresholded = X * (X > ref_value)
+    center = thresholded[1:-1]
+    is_peak = (center > thresholded[:-2]) & (center >= thresholded[2:])
+
+    shift = _parabolic_shift(X[:-2], X[1:-1], X[2:])
+    rows = np.arange(lo, hi)[:, np.newaxis]
+    pitches = (rows + shift)[is_peak] * float(sr) / n_fft
+    return pitches[pitches > 0]
+
+
+def piptrack_pitch_mean(S, sr, n_fft=N_FFT, fmin=PITCH_FMIN, fmax=PITCH_FMAX):
+    """Same result as librosa.piptrack(S=S, fmin, fmax) followed by the pitches > 0 mean."""
+    pitch = piptrack_pitches(S, sr, n_fft=n_fft, fmin=fmin, fmax=fmax)
+    return np.mean(pitch) if pitch.size > 0 else 0
+
+
+def _yin_f0(frames, sr, fmin, fmax, threshold):
+    """Per-frame YIN F0 (0 where unvoiced) for a (n_frames, frame_length) block of frames."""
+    frame_length = frames.shape[1]
+    min_lag = int(np.floor(sr / fmax))
+    max_lag = int(np.ceil(sr / fmin))
+    n_lags = max_lag + 2  # one extra lag for the local-minimum / interpolation neighbour
+    n_fft = 1 << int(np.ceil(np.log2(2 * frame_length)))
+
+    # Difference function over the overlapping part of the frame:
+    # d(tau) = E[0, L - tau) + E[tau, L) - 2 r(tau), with r from a single power-spectrum FFT
+    spec = np.fft.rfft(frames, n_fft, axis=1)
+    r = np.fft.irfft(spec.real ** 2 + spec.imag ** 2, n_fft, axis=1)[:, :n_lags]
+
+    energy = np.zeros((frames.shape[0], frame_length + 1))
+    np.cumsum(frames.astype(np.float64) ** 2, axis=1, out=energy[:, 1:])
+    lags = np.arange(n_lags)
+    head = energy[:, frame_length - lags]
+    tail = energy[:, -1:] - energy[:, lags]
+    diff = np.maximum(head + tail - 2 * r, 0.0)
+    diff[:, 0] = 0.0
+
+    # Cumulative mean normalized difference; silent frames (all zero) become 1 = unvoiced
+    running = np.cumsum(diff[:, 1:], axis=1)
+    cmnd = np.ones_like(diff)
+    np.divide(diff[:, 1:] * lags[1:], running, out=cmnd[:, 1:], where=running > 0)
+
+    # First local minimum below threshold inside [min_lag, max_lag]
+    prev, center, nxt = cmnd[:, min_lag - 1:max_lag], cmnd[:, min_lag:max_lag + 1], cmnd[:, min_lag + 1:max_lag + 2]
+    candidates = (center < prev) & (center <= nxt) & (center < threshold)
+    voiced = candidates.any(axis=1)
+    first = np.argmax(candidates, axis=1)
+
+    rows = np.arange(frames.shape[0])
+    shift = _parabolic_shift(prev[rows, first], center[rows, first], nxt[rows, first])
+    period = min_lag + first + shift
+    return np.where(voiced, sr / period, 0.0)
+
+
+def yin_pitch_mean(signal, sr, fmin=PITCH_FMIN, fmax=PITCH_FMAX,
+                   frame_length=YIN_FRAME_LENGTH, hop_length=HOP_LENGTH, threshold=YIN_THRESHOLD):
+    """
+    Vectorized YIN over centred frames on the STFT hop grid. Returns the mean F0 of voiced
+    frames, or 0 when no frame is voiced (same contract as the piptrack pitch_mean).
+    """
+    if sr / fmin + 2 >= frame_length / 2:
+        raise ValueError(f"YIN frame_length {frame_length} too short for fmin={fmin} Hz at {sr} Hz")
+
+    padded = np.pad(signal, frame_length // 2, mode='constant')
+    frames = np.lib.stride_tricks.sliding_window_view(padded, frame_length)[::hop_length]
+
+    f0 = np.concatenate([
+        _yin_f0(frames[start:start + YIN_BLOCK_FRAMES], sr, fmin, fmax, threshold)
+        for start in range(0, frames.shape[0], YIN_BLOCK_FRAMES)
+    ])
+    pitch = f0[f0 > 0]
+    return np.mean(pitch) if pitch.size > 0 else 0
+
+
+# ==========================================================
+# 3. Pooled Scratch Buffers (float32 work arrays reused across clips)
+# ==========================================================
+
+class ScratchBuffers:
+    """Named work buffers for one extraction at a time, sized to the recent clips."""
+    def __init__(self):
+        self._buffers = {}  # name -> [array, recent lengths]
+
+    def array(self, name, shape, dtype, order='C'):
+        """
+        A view of the reusable `name` buffer with the requested shape (contents are stale).
+        The buffer grows to the largest clip and is reallocated smaller once none of the last
+        SCRATCH_HISTORY extractions needed more than half of it.
+        """
+        # Leading dimensions are fixed per name; the last one scales with the clip
+        lead, length = tuple(shape[:-1]), int(shape[-1])
+        entry = self._buffers.get(name)
+        if entry is None or entry[0].shape[:-1] != lead or entry[0].dtype != dtype:
+            entry = self._buffers[name] = [None, deque(maxlen=SCRATCH_HISTORY)]
+        history = entry[1]
+        history.append(length)
+        buffer = entry[0]
+        if buffer is None or buffer.shape[-1] < length or (
+                len(history) == SCRATCH_HISTORY and 2 * max(history) < buffer.shape[-1]):
+            buffer = entry[0] = np.empty(lead + (max(history),), dtype=dtype, order=order)
+        return buffer[..., :length]
+
+    def nbytes(self):
+        return sum(entry[0].nbytes for entry in self._buffers.values())
+
+
+class ScratchPool:
+    """
+    Bounded pool of ScratchBuffers shared by all threads. The threaded server runs each
+    connection on a new thread, so buffers owned by a thread would be rebuilt per request;
+    borrowing from the pool reuses them, and at most `size` idle sets are kept.
+    """
+    def __init__(self, size=SCRATCH_POOL_SIZE):
+        self.size = size
+        self.created = 0
+        self.reused = 0
+        self._idle = []  # most recently returned last, so the warmest set is reused first
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def borrow(self):
+        with self._lock:
+            scratch = self._idle.pop() if self._idle else None
+            if scratch is None:
+                self.created += 1
+            else:
+                self.reused += 1
+        if scratch is None:
+            scratch = ScratchBuffers()
+        try:
+            yield scratch
+        finally:
+            with self._lock:
+                if len(self._idle) < self.size:
+                    self._idle.append(scratch)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': self.size,
+                'idle': len(self._idle),
+                'idle_bytes': sum(scratch.nbytes() for scratch in self._idle),
+                'created': self.created,
+                'reused': self.reused
+            }
+
+
+SCRATCH_POOL = ScratchPool()
+
+
+def _scratch_array(scratch, name, shape, dtype, order='C'):
+    """`scratch`'s `name` buffer, or a fresh array when no buffers were borrowed."""
+    if scratch is None:
+        return np.empty(shape, dtype=dtype, order=order)
+    return scratch.array(name, shape, dtype, order)
+
+
+# ==========================================================
+# 4. Cached Mel Filterbank / DCT Bases
+# ==========================================================
+
+_mfcc_bases = {}
+_mfcc_bases_lock = threading.Lock()
+
+
+def mfcc_bases(sr, n_fft=N_FFT, n_mels=N_MELS, n_mfcc=N_MFCC):
+    """
+    (mel_basis, dct_basis) for the configuration, built once per process: the float32
+    (n_mels, 1 + n_fft // 2) Slaney filterbank librosa.feature.melspectrogram uses, and the
+    (n_mfcc, n_mels) orthonormal DCT-II rows librosa.feature.mfcc applies.
+    """
+    key = (int(sr), int(n_fft), int(n_mels), int(n_mfcc))
+    bases = _mfcc_bases.get(key)
+    if bases is None:
+        with _mfcc_bases_lock:
+            bases = _mfcc_bases.get(key)
+            if bases is None:
+                mel_basis = librosa.filters.mel(sr=sr, n_fft=n_fft, n_mels=n_mels)
+                dct_basis = scipy.fft.dct(np.eye(n_mels), type=2, norm='ortho', axis=0)[:n_mfcc]
+                mel_basis.setflags(write=False)
+                dct_basis.setflags(write=False)
+                bases = _mfcc_bases[key] = (mel_basis, dct_basis)
+    return bases
+
+
+def mfcc_means(power, sr, n_mfcc=N_MFCC, scratch=None):
+    """
+    Mean of librosa.feature.mfcc(S=librosa.power_to_db(melspectrogram(S=power))) as two dense
+    matmuls: mel projection, then dB with the top_db floor (in place), then the DCT. The DCT is
+    linear, so it is applied to the frame-mean dB vector instead of every frame.
+    """
+    mel_basis, dct_basis = mfcc_bases(sr, n_fft=2 * (power.shape[0] - 1), n_mfcc=n_mfcc)
+    mel_db = np.matmul(mel_basis, power, out=_scratch_array(scratch, 'mel', (mel_basis.shape[0], power.shape[1]), np.float32))
+    np.maximum(mel_db, AMIN, out=mel_db)
+    np.log10(mel_db, out=mel_db)
+    mel_db *= 10.0
+    np.maximum(mel_db, mel_db.max() - TOP_DB, out=mel_db)
+    return dct_basis @ mel_db.mean(axis=1, dtype=np.float64)
+
+
+# ==========================================================
+# 5. Single-STFT Feature Engine
+# ==========================================================
+
+def _frame_sums(values, n_frames, frame_length=N_FFT, hop_length=HOP_LENGTH):
+    """Per-frame sums of `values` via one prefix sum (O(n) instead of O(n * frame_length / hop))."""
+    csum = np.concatenate(([0.0], np.cumsum(values, dtype=np.float64)))
+    starts = np.arange(n_frames) * hop_length
+    return csum[starts + frame_length] - csum[starts]
+
+
+def _padded_hop_blocks(scratch, name, n_frames, dtype):
+    """
+    Scratch array covering the centred, padded signal as (n_frames + 3) hop-sized blocks, so
+    frame k is exactly blocks k .. k + N_FFT // HOP_LENGTH - 1.
+    """
+    blocks_per_frame = N_FFT // HOP_LENGTH
+    return _scratch_array(scratch, name, ((n_frames + blocks_per_frame - 1) * HOP_LENGTH,), dtype)
+
+
+def _rms_mean(signal, n_frames, scratch=None):
+    """Mean of librosa.feature.rms(y=signal): zero-padded, centred frames."""
+    pad = N_FFT // 2
+    padded_sq = _padded_hop_blocks(scratch, 'rms', n_frames, np.float32)
+    padded_sq[:pad] = 0
+    np.square(signal, out=padded_sq[pad:pad + signal.size])
+    padded_sq[pad + signal.size:] = 0
+    # float32 sums over each hop (pairwise, accurate), then float64 over the frame's blocks
+    block_sums = padded_sq.reshape(-1, HOP_LENGTH).sum(axis=1, dtype=np.float64)
+    power = _frame_sums(block_sums, n_frames, frame_length=N_FFT // HOP_LENGTH, hop_length=1) / N_FFT
+    return np.mean(np.sqrt(power))
+
+
+def _zcr_mean(signal, n_frames, scratch=None):
+    """Mean of librosa.feature.zero_crossing_rate(y=signal): edge-padded, centred frames."""
+    pad = N_FFT // 2
+    n = signal.size
+    # Edge padding repeats the end samples, so only pairs of real samples can cross
+    negative = _scratch_array(scratch, 'zcr_sign', (n,), np.bool_)
+    np.less(signal, -ZCR_THRESHOLD, out=negative)  # |y| <= threshold counts as zero, zero counts as positive
+    crossings = _padded_hop_blocks(scratch, 'zcr', n_frames, np.bool_)
+    crossings[:pad] = False
+    np.not_equal(negative[1:], negative[:-1], out=crossings[pad:pad + n - 1])
+    crossings[pad + max(n - 1, 0):] = False
+    # Frame k covers the (frame_length - 1) sample pairs starting at k * hop
+    block_counts = crossings.reshape(-1, HOP_LENGTH).sum(axis=1)
+    counts = _frame_sums(block_counts, n_frames, frame_length=N_FFT // HOP_LENGTH, hop_length=1)
+    counts -= crossings[N_FFT - 1::HOP_LENGTH][:n_frames]
+    return np.mean(counts / N_FFT)
+
+
+def magnitude_spectrogram(signal, scratch=None):
+    """
+    Centred, zero-padded Hann STFT magnitude (same framing as librosa.stft defaults) in
+    float32. With `scratch` it is a view of that buffer set, valid while the set is borrowed.
+    """
+    n_frames = 1 + signal.size // HOP_LENGTH
+    n_bins = 1 + N_FFT // 2
+    stft = _scratch_array(scratch, 'stft', (n_bins, n_frames), np.complex64, order='F')
+    librosa.stft(y=signal, n_fft=N_FFT, hop_length=HOP_LENGTH, pad_mode='constant', out=stft)
+    return np.abs(stft, out=_scratch_array(scratch, 'magnitude', (n_bins, n_frames), np.float32, order='F'))
+
+
+def compute_vsd_features(signal, sr, pitch_backend='piptrack'):
+    """
+    Extracts the 16 VSD features from one magnitude spectrogram per clip.
+
+    MFCCs (cached mel / DCT bases, see mfcc_means) and piptrack pitch come from the shared
+    STFT; RMS and ZCR are time-domain features, so they are computed from per-hop block sums
+    over the same frame grid rather than by re-framing the signal. Everything runs in float32
+    in scratch buffers borrowed from SCRATCH_POOL. `pitch_backend` selects piptrack or YIN (see PITCH_BACKENDS).
+    """
+    if pitch_backend not in PITCH_BACKENDS:
+        raise ValueError(f"Unknown pitch backend '{pitch_backend}', expected one of {PITCH_BACKENDS}")
+
+    signal = np.ascontiguousarray(signal, dtype=np.float32)
+    if signal.size == 0:
+        raise ValueError("cannot extract features from an empty signal")
+    with SCRATCH_POOL.borrow() as scratch:
+        with stage('stft'):
+            S = magnitude_spectrogram(signal, scratch)
+        n_frames = S.shape[-1]
+
+        # 4. Pitch Mean (piptrack reads the magnitudes before they are squared in place below)
+        with stage('pitch'):
+            if pitch_backend == 'yin':
+                pitch_mean = yin_pitch_mean(signal, sr)
+            else:
+                pitch_mean = piptrack_pitch_mean(S, sr)
+
+        # 1. MFCCs (Mean of 13 coefficients)
+        with stage('mfcc'):
+            mfccs_mean = mfcc_means(np.square(S, out=S), sr, scratch=scratch)
+
+        # 2. RMS Energy, 3. ZCR
+        with stage('rms_zcr'):
+            rms_mean = _rms_mean(signal, n_frames, scratch)
+            zcr_mean = _zcr_mean(signal, n_frames, scratch)
+
+    return np.hstack([mfccs_mean, rms_mean, zcr_mean, pitch_mean])
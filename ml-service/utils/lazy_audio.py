@@ -0,0 +1,73 @@
+import os
+import threading
+import time
+
+# --- Configuration ---
+# When librosa / numba / scipy and the feature engine are imported:
+#   'eager'      - during app start-up, before the first request is accepted
+#   'lazy'       - on the first request that extracts audio features
+#   'background' - on a daemon thread started at boot, while requests are already served
+AUDIO_IMPORT_MODES = ('eager', 'lazy', 'background')
+AUDIO_IMPORT_MODE = os.environ.get('AUDIO_IMPORT_MODE', 'background')
+
+_loaded = threading.Event()
+_load_lock = threading.Lock()
+load_seconds = None  # wall time of the import, once loaded
+
+
+def audio_stack_loaded():
+    return _loaded.is_set()
+
+
+def load_audio_stack(sr=16000):
+    """
+    Imports the audio dependencies and builds the mel / DCT bases for `sr`. Idempotent and
+    thread-safe; callers racing a background load wait for it instead of importing twice.
+    """
+    global load_seconds
+    if _loaded.is_set():
+        return
+    with _load_lock:
+        if _loaded.is_set():
+            return
+        start = time.perf_counter()
+        import librosa  # noqa: F401
+        from utils.feature_extraction import mfcc_bases
+        import utils.resampling  # noqa: F401
+        import utils.streaming  # noqa: F401
+
+        mfcc_bases(sr)
+        load_seconds = time.perf_counter() - start
+        _loaded.set()
+
+
+def start_background_load(sr=16000, after_load=None):
+    """Runs load_audio_stack (then `after_load()`, if given) on a daemon thread; returns the thread."""
+    def _load():
+        try:
+            load_audio_stack(sr)
+        except Exception as e:
+            # The first audio request imports again and surfaces the error there
+            print(f"⚠️ Background audio import failed: {e}")
+        if after_load is not None:
+            after_load()
+
+    thread = threading.Thread(target=_load, name='audio-prewarm', daemon=True)
+    thread.start()
+    return thread
+
+
+def init_audio_stack(mode=AUDIO_IMPORT_MODE, sr=16000, after_load=None):
+    """
+    Applies the configured AUDIO_IMPORT_MODE at start-up. `after_load` (e.g. the warm-up) runs
+    once the stack is imported: inline for 'eager', on the loader thread for 'background'; in
+    'lazy' mode nothing is imported and it is not called.
+    """
+    if mode not in AUDIO_IMPORT_MODES:
+        raise ValueError(f"Unknown AUDIO_IMPORT_MODE '{mode}', expected one of {AUDIO_IMPORT_MODES}")
+    if mode == 'eager':
+        load_audio_stack(sr)
+        if after_load is not None:
+            after_load()
+    elif mode == 'background':
+        start_background_load(sr, after_load=after_load)
@@ -0,0 +1,202 @@
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+
+# --- Configuration ---
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implicit
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+# ==========================================================
+# 1. Metric Types (Prometheus counter / gauge / histogram, one child per label set)
+# ==========================================================
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)] + list(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def _child(self, labels):
+        child = self._children.get(labels)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(labels, self._new_child())
+        return child
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            children = list(self._children.items())
+        for labels, child in sorted(children):
+            lines.extend(self._render_child(labels, child))
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _new_child(self):
+        return [0]
+
+    def inc(self, *labels, amount=1):
+        child = self._child(labels)
+        with self._lock:
+            child[0] += amount
+
+    def _render_child(self, labels, child):
+        return [f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(child[0])}"]
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value):
+        child = self._child(labels)
+        with self._lock:
+            child[0] = value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        # [per-bucket counts (non-cumulative, last = +Inf), sum]
+        return [[0] * (len(self.buckets) + 1), 0.0]
+
+    def observe(self, value, *labels):
+        child = self._child(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            child[0][index] += 1
+            child[1] += value
+
+    def _render_child(self, labels, child):
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float('inf'),), child[0]):
+            cumulative += count
+            le = 'le="+Inf"' if bound == float('inf') else f'le="{bound!r}"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, [le])} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {repr(child[1])}")
+        lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+# ==========================================================
+# 2. Registry + Hot-Path Helpers
+# ==========================================================
+
+class MetricsRegistry:
+    """In-process metrics rendered in the Prometheus text exposition format (no external service)."""
+    def __init__(self, enabled=METRICS_ENABLED):
+        self.enabled = enabled
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'vsd_stage_duration_seconds', 'Duration of one pipeline stage.', ('stage',)))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'vsd_http_request_duration_seconds', 'End-to-end request duration.', ('endpoint',)))
+REQUESTS_TOTAL = REGISTRY.register(Counter(
+    'vsd_http_requests_total', 'Requests served, by endpoint and status code.', ('endpoint', 'method', 'status')))
+ERRORS_TOTAL = REGISTRY.register(Counter(
+    'vsd_http_request_errors_total', 'Requests answered with a 5xx status.', ('endpoint',)))
+IN_FLIGHT = REGISTRY.register(Gauge(
+    'vsd_http_requests_in_flight', 'Requests currently being handled.', ('endpoint',)))
+STALE_READINGS = REGISTRY.register(Counter(
+    'vsd_stale_readings_total', 'Timestamped readings dropped as out of order, by filter.', ('filter',)))
+
+_DISABLED = nullcontext()
+
+
+class _StageTimer:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        STAGE_SECONDS.observe(time.perf_counter() - self.start, self.name)
+        return False
+
+
+def stage(name):
+    """`with stage('mfcc'):` records the block's duration; a shared no-op when metrics are off."""
+    if not REGISTRY.enabled:
+        return _DISABLED
+    return _StageTimer(name)
+
+
+def instrument_flask(app, registry=REGISTRY):
+    """Request count / error / duration / in-flight metrics for every route of `app`."""
+    from flask import g, request
+
+    def _endpoint():
+        return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+    @app.before_request
+    def _start_request_timer():
+        if registry.enabled:
+            g.metrics_start = time.perf_counter()
+            g.metrics_endpoint = _endpoint()
+            IN_FLIGHT.inc(g.metrics_endpoint)
+
+    @app.after_request
+    def _record_request(response):
+        start = g.pop('metrics_start', None)
+        if start is not None:
+            endpoint = g.metrics_endpoint
+            REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint)
+            REQUESTS_TOTAL.inc(endpoint, request.method, str(response.status_code))
+            if response.status_code >= 500:
+                ERRORS_TOTAL.inc(endpoint)
+        return response
+
+    @app.teardown_request
+    def _end_request(exc):
+        endpoint = g.pop('metrics_endpoint', None)
+        if endpoint is not None:
+            IN_FLIGHT.dec(endpoint)
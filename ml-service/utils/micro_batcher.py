@@ -0,0 +1,101 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+# --- Configuration ---
+# Off by default: each /predict_features call scores its own row inline
+PREDICT_BATCH_ENABLED = os.environ.get('PREDICT_BATCH_ENABLED', '0') == '1'
+# A batch is scored as soon as it holds this many rows ...
+PREDICT_BATCH_MAX_ROWS = int(os.environ.get('PREDICT_BATCH_MAX_ROWS', 64))
+# ... or this long after its first row arrived, whichever comes first
+PREDICT_BATCH_MAX_WAIT_MS = float(os.environ.get('PREDICT_BATCH_MAX_WAIT_MS', 2.0))
+# How long a caller waits for its result before giving up
+PREDICT_BATCH_TIMEOUT_SECONDS = float(os.environ.get('PREDICT_BATCH_TIMEOUT_SECONDS', 10))
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-row requests into one matrix call. submit() queues a row and
+    returns a Future; a single background thread collects rows until `max_rows` are waiting or
+    `max_wait_ms` has passed since the first one, calls `score_batch(matrix)` once, then
+    `finish(contexts, scores)` (if given) with the rows in arrival order, and resolves every
+    Future with its element of the result.
+
+    Rows are validated in submit() so one bad request cannot fail the rest of its batch.
+    """
+    def __init__(self, score_batch, finish=None, n_features=16,
+                 max_rows=PREDICT_BATCH_MAX_ROWS, max_wait_ms=PREDICT_BATCH_MAX_WAIT_MS):
+        if max_rows < 1:
+            raise ValueError(f"max_rows must be >= 1, got {max_rows}")
+        self.score_batch = score_batch
+        self.finish = finish
+        self.n_features = n_features
+        self.max_rows = max_rows
+        self.max_wait_ms = max_wait_ms
+        self.batches = 0
+        self.rows = 0
+        self._queue = queue.SimpleQueue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='predict-micro-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, row, context=None):
+        """Queues one feature row (with an opaque `context` passed to finish). Returns a Future."""
+        if self._closed:
+            raise RuntimeError("micro-batcher is shut down")
+        row = np.asarray(row, dtype=float)
+        if row.shape != (self.n_features,):
+            raise ValueError(f"Input features must be a vector of length {self.n_features}. Received shape {row.shape}")
+        if not np.all(np.isfinite(row)):
+            raise ValueError("Input features contain NaN or infinity.")
+        future = Future()
+        self._queue.put((row, context, future))
+        return future
+
+    def shutdown(self):
+        """Stops the worker after the rows already queued have been processed."""
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+    def _collect(self):
+        """Blocks for the first row, then gathers more until the batch is full or its wait is over."""
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait_ms / 1000.0
+        while len(batch) < self.max_rows:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # stop after this batch
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            rows, contexts, futures = zip(*batch)
+            try:
+                results = self.score_batch(np.vstack(rows))
+                if self.finish is not None:
+                    results = self.finish(list(contexts), results)
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.rows += len(futures)
+            for future, result in zip(futures, results):
+                future.set_result(result)
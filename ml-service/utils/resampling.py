@@ -0,0 +1,91 @@
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+import soxr
+
+# --- Configuration ---
+# Same filter as librosa.resample's default res_type='soxr_hq'
+RESAMPLE_QUALITY = 'HQ'
+# Distinct (orig_sr, target_sr, dtype) combinations with idle plans kept
+RESAMPLE_PLAN_CACHE_SIZE = 16
+# Idle plans kept per combination; concurrent resamples beyond this build a temporary plan
+RESAMPLE_PLANS_PER_KEY = 4
+# Documented tolerance of resample() against librosa.resample(y, orig_sr, target_sr):
+# both run the identical soxr filter, so output matches to float round-off
+RESAMPLE_PARITY_ATOL = 1e-6
+
+_SUPPORTED_DTYPES = (np.dtype(np.float32), np.dtype(np.float64))
+_plans = OrderedDict()  # key -> idle soxr streams, least recently used key first
+_plans_lock = threading.Lock()
+_plan_counts = {'created': 0, 'reused': 0}
+
+
+# ==========================================================
+# 1. Pooled Resampling Plans
+# ==========================================================
+
+@contextmanager
+def _borrow_plan(orig_sr, target_sr, dtype):
+    """
+    A soxr stream for the rate pair, taken out of the process-wide pool while in use (a stream
+    carries its delay line, so two threads must never share one). soxr designs its polyphase
+    filter bank (with integer-ratio stages where the ratio allows) when the stream is created,
+    so streams are kept across clips and requests and only their delay line is cleared.
+    """
+    key = (int(orig_sr), int(target_sr), dtype.str)
+    with _plans_lock:
+        idle = _plans.get(key)
+        stream = idle.pop() if idle else None
+        _plan_counts['created' if stream is None else 'reused'] += 1
+    if stream is None:
+        stream = soxr.ResampleStream(orig_sr, target_sr, 1, dtype=dtype, quality=RESAMPLE_QUALITY)
+    else:
+        stream.clear()
+    try:
+        yield stream
+    finally:
+        with _plans_lock:
+            idle = _plans.setdefault(key, [])
+            _plans.move_to_end(key)
+            if len(idle) < RESAMPLE_PLANS_PER_KEY:
+                idle.append(stream)
+            while len(_plans) > RESAMPLE_PLAN_CACHE_SIZE:
+                _plans.popitem(last=False)
+
+
+def resample(signal, orig_sr, target_sr):
+    """
+    Drop-in for librosa.resample(y=signal, orig_sr, target_sr) on mono audio, on a pooled plan.
+    Returns `signal` itself when the rates already match.
+    """
+    if int(orig_sr) == int(target_sr):
+        return signal
+    signal = np.asarray(signal)
+    dtype = signal.dtype if signal.dtype in _SUPPORTED_DTYPES else np.dtype(np.float32)
+    signal = np.ascontiguousarray(signal, dtype=dtype)
+    with _borrow_plan(orig_sr, target_sr, dtype) as stream:
+        out = stream.resample_chunk(signal, last=True)
+    # soxr can end a sample short of ceil(n * ratio); librosa fixes the length the same way
+    n_out = int(np.ceil(signal.size * (float(target_sr) / orig_sr)))
+    if out.size > n_out:
+        return out[:n_out]
+    if out.size < n_out:
+        return np.concatenate([out, np.zeros(n_out - out.size, dtype=out.dtype)])
+    return out
+
+
+def resample_plan_stats():
+    with _plans_lock:
+        return {
+            'keys': len(_plans),
+            'idle': sum(len(idle) for idle in _plans.values()),
+            **_plan_counts
+        }
+
+
+def clear_resample_plans():
+    """Drops every idle plan."""
+    with _plans_lock:
+        _plans.clear()
@@ -0,0 +1,697 @@
+import fcntl
+import hashlib
+import os
+import platform
+import tempfile
+import threading
+import zlib
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from utils.wellness_logic import DHT22_KalmanFilterBank, WellnessFusionBank
+
+# --- Configuration ---
+# Empty = every worker process keeps its own banks; otherwise the banks live in shared memory
+# segments named after this (one per bank) and every process on the host uses the same state.
+# Segment names carry a tag of their layout (bank fields, capacity, key bytes), so a release
+# that changes the layout creates fresh segments (and removes the old ones) instead of failing
+# to attach to them. Stop every old worker before starting the new ones: with STATE_DIR set,
+# the first new worker restores the state from disk into the fresh segments.
+SHARED_STATE_NAME = os.environ.get('SHARED_STATE_NAME', '')
+# Writers of keys in different stripes proceed in parallel (one lock byte per stripe)
+SHARED_STATE_LOCK_STRIPES = int(os.environ.get('SHARED_STATE_LOCK_STRIPES', 64))
+# Keys longer than this (UTF-8) are stored as 'blake2b:<hex digest>'
+SHARED_STATE_KEY_BYTES = int(os.environ.get('SHARED_STATE_KEY_BYTES', 64))
+# Lock-free seqlock reads rely on the CPU keeping stores in order (x86 does); elsewhere
+# reads take the stripe lock unless SHARED_STATE_LOCKED_READS=0
+SHARED_STATE_LOCKED_READS = os.environ.get(
+    'SHARED_STATE_LOCKED_READS', '0' if platform.machine().lower() in ('x86_64', 'amd64', 'i386', 'i686') else '1') == '1'
+# Optimistic read attempts before a reader falls back to the stripe lock
+SEQLOCK_READ_RETRIES = 100
+
+SHARED_MAGIC = 0x5653445348415231  # 'VSDSHAR1'
+_EMPTY, _TOMBSTONE = -1, -2
+
+# Header words (uint64)
+_MAGIC, _CAPACITY, _FIELDS, _TABLE_SIZE, _KEY_BYTES, _TABLE_SEQ, _NEXT_SLOT, _COUNT, _TOMBSTONES, _STRIPES = range(10)
+_HEADER_WORDS = 16
+
+
+# ==========================================================
+# 1. Cross-Process Locks
+# ==========================================================
+
+def _begin_write(words, index):
+    """
+    Moves a seqlock word to its next odd value (readers retry while it is odd). Returns True
+    if it already was odd: a writer died holding the lock, and a plain increment would have
+    inverted the parity for good.
+    """
+    seq = int(words[index])
+    words[index] = seq + 2 if seq & 1 else seq + 1
+    return bool(seq & 1)
+
+
+def _end_write(words, index):
+    """Moves a seqlock word to its next even value (stable again)."""
+    seq = int(words[index])
+    words[index] = seq + 1 if seq & 1 else seq + 2
+
+# Lock file byte that serializes create-or-attach of a segment (stripe locks use 0..stripes-1)
+_INIT_LOCK_BYTE = 1 << 30
+_INIT_LOCK = threading.Lock()
+_LOCK_FDS = {}  # (st_dev, st_ino) of a lock file -> [fd, users]
+_LOCK_FDS_GUARD = threading.Lock()
+
+
+def _open_lock_fd(path):
+    """
+    Returns (key, fd): this process's one descriptor for the lock file at `path`. Record locks
+    belong to the process, and closing *any* descriptor of a file drops every record lock the
+    process holds on it, so all users share one descriptor and _close_lock_fd(key) only closes
+    it after the last of them.
+    """
+    with _LOCK_FDS_GUARD:
+        try:
+            st = os.stat(path)
+            key = (st.st_dev, st.st_ino)
+        except FileNotFoundError:
+            key = None
+        if key not in _LOCK_FDS:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            st = os.fstat(fd)
+            key = (st.st_dev, st.st_ino)
+            _LOCK_FDS[key] = [fd, 0]
+        entry = _LOCK_FDS[key]
+        entry[1] += 1
+        return key, entry[0]
+
+
+def _close_lock_fd(key):
+    with _LOCK_FDS_GUARD:
+        entry = _LOCK_FDS[key]
+        entry[1] -= 1
+        if entry[1] == 0:
+            del _LOCK_FDS[key]
+            os.close(entry[0])
+
+
+class _InitLock:
+    """
+    Serializes create-or-attach of one segment across processes (a record lock on
+    _INIT_LOCK_BYTE) and across the threads of this process, which a record lock does not.
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        _INIT_LOCK.acquire()
+        try:
+            self._key, fd = _open_lock_fd(self.path)
+            fcntl.lockf(fd, fcntl.LOCK_EX, 1, _INIT_LOCK_BYTE)
+        except BaseException:
+            _INIT_LOCK.release()
+            raise
+        self._fd = fd
+
+    def __exit__(self, *exc):
+        try:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, _INIT_LOCK_BYTE)
+            _close_lock_fd(self._key)
+        finally:
+            _INIT_LOCK.release()
+
+
+class SharedStateLock:
+    """
+    Writer locks for one shared table: `stripe(i)` guards the slots whose keys hash to stripe
+    i, `exclusive` (this object used as a context manager, or acquire()/release()) guards the
+    whole table. Each is a POSIX record lock on a lock file (byte i, or bytes 0..stripes-1)
+    taken behind one per-process RLock, since record locks belong to the process, not the
+    thread. Re-entrant within a thread; a stripe cannot be upgraded to exclusive. Every lock on
+    the same file in a process shares one descriptor (see _open_lock_fd).
+
+    While the exclusive lock is held the table sequence number is odd, so lock-free readers
+    retry instead of reading a table that is being restructured. Finding it odd on acquire
+    means the previous holder died inside the lock (the kernel dropped its record lock):
+    `recover` is called to repair the table before the new holder uses it.
+    """
+    def __init__(self, path, stripes, header, recover=None):
+        self.stripes = stripes
+        self._header = header
+        self._recover = recover
+        self._fd_key, self._fd = _open_lock_fd(path)
+        self._reset()
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._local = threading.RLock()
+        self._depth = 0
+        self._held = None  # stripe index, or 'all' for the exclusive lock
+
+    def stripe(self, index):
+        return _StripeGuard(self, index)
+
+    def acquire_stripe(self, index):
+        self._local.acquire()
+        if self._depth == 0:
+            try:
+                fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, index)
+            except BaseException:
+                self._local.release()
+                raise
+            self._held = index
+        elif self._held != 'all' and self._held != index:
+            self._local.release()
+            raise RuntimeError(f"stripe {index} requested while holding stripe {self._held}")
+        self._depth += 1
+
+    def release_stripe(self):
+        self._depth -= 1
+        if self._depth == 0:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, self._held)
+            self._held = None
+        self._local.release()
+
+    def acquire(self):
+        self._local.acquire()
+        if self._depth == 0:
+            try:
+                fcntl.lockf(self._fd, fcntl.LOCK_EX, self.stripes, 0)
+            except BaseException:
+                self._local.release()
+                raise
+            self._held = 'all'
+            if _begin_write(self._header, _TABLE_SEQ) and self._recover is not None:
+                self._recover()
+        elif self._held != 'all':
+            self._local.release()
+            raise RuntimeError(f"exclusive lock requested while holding stripe {self._held}")
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            _end_write(self._header, _TABLE_SEQ)
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, self.stripes, 0)
+            self._held = None
+        self._local.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def close(self):
+        if self._fd is not None:
+            _close_lock_fd(self._fd_key)
+            self._fd = None
+
+
+class _StripeGuard:
+    __slots__ = ('lock', 'index')
+
+    def __init__(self, lock, index):
+        self.lock = lock
+        self.index = index
+
+    def __enter__(self):
+        self.lock.acquire_stripe(self.index)
+
+    def __exit__(self, *exc):
+        self.lock.release_stripe()
+
+
+# ==========================================================
+# 2. Shared Slot Table (keys, per-slot seqlocks, field columns)
+# ==========================================================
+
+def _lock_path(name):
+    return os.path.join(tempfile.gettempdir(), f'{name}.lock')
+
+
+_TRACKER_LOCK = threading.Lock()
+
+
+class _Untracked:
+    """
+    Opens / unlinks segments without the multiprocessing resource tracker, which would unlink
+    them when the process that opened them exits (the segment outlives any one worker and is
+    removed explicitly, see unlink_shared_state). Python 3.13 has SharedMemory(track=False).
+    """
+    def __enter__(self):
+        _TRACKER_LOCK.acquire()
+        self._saved = resource_tracker.register, resource_tracker.unregister
+        resource_tracker.register = resource_tracker.unregister = lambda name, rtype: None
+
+    def __exit__(self, *exc):
+        resource_tracker.register, resource_tracker.unregister = self._saved
+        _TRACKER_LOCK.release()
+
+
+def _layout_tag(fields, capacity, key_bytes):
+    """Short digest of everything that fixes the segment layout, appended to the segment name."""
+    spec = f"{SHARED_MAGIC:x}|{','.join(fields)}|{int(capacity)}|{int(key_bytes)}".encode()
+    return hashlib.blake2b(spec, digest_size=4).hexdigest()
+
+
+def _segment_names(name):
+    """
+    Existing segments created under `name`, whatever their layout, plus the untagged `name` of
+    older releases. Listed from /dev/shm where it exists (Linux); elsewhere only `name`.
+    """
+    if not os.path.isdir('/dev/shm'):
+        return {name}
+    return {entry for entry in os.listdir('/dev/shm') if entry == name or entry.startswith(f'{name}.')}
+
+
+def _layout(capacity, n_fields, table_size, key_bytes):
+    """Byte offsets of each array in the segment, and its total size."""
+    offsets = {}
+    position = 8 * _HEADER_WORDS
+    for array, nbytes in (('table_hash', 8 * table_size), ('table_slot', 8 * table_size), ('seq', 8 * capacity),
+                          ('last_seen', 8 * capacity), ('key_len', 8 * capacity), ('fields', 8 * n_fields * capacity),
+                          ('keys', key_bytes * capacity)):
+        offsets[array] = position
+        position += nbytes
+    return offsets, position
+
+
+class SharedSlotTable:
+    """
+    Fixed-capacity key -> slot table in one shared memory segment: an open-addressing hash
+    index (crc32 of the key bytes, linear probing, key bytes compared on a hash match), and
+    per slot a sequence number, last-used time, the key and one float64 per field.
+
+    Writers bump a slot's sequence number to odd before changing its fields and back to even
+    after (holding the slot's stripe lock); inserts, evictions and rebuilds hold the exclusive
+    lock, which keeps the table sequence number odd meanwhile. Readers take no lock: they
+    retry until both numbers were even and unchanged around their read.
+
+    The segment is '<name>.<layout tag>'. The first process to open it creates and initializes
+    it (`created` is True there); the others attach to it. Processes configured with another
+    layout (e.g. a release that adds a field) use a segment of their own.
+    """
+    def __init__(self, name, fields, capacity, stripes=SHARED_STATE_LOCK_STRIPES, key_bytes=SHARED_STATE_KEY_BYTES):
+        self.fields = tuple(fields)
+        self.capacity = int(capacity)
+        self.key_bytes = int(key_bytes)
+        base_name = name
+        self.name = name = f'{base_name}.{_layout_tag(self.fields, self.capacity, self.key_bytes)}'
+        table_size = 1 << (2 * self.capacity - 1).bit_length()  # load factor <= 1/2
+        offsets, size = _layout(self.capacity, len(self.fields), table_size, self.key_bytes)
+
+        with _InitLock(_lock_path(name)):  # create-or-attach is atomic across processes
+            with _Untracked():
+                try:
+                    self._shm = shared_memory.SharedMemory(name=name)
+                    self.created = False
+                except FileNotFoundError:
+                    self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+                    self.created = True
+
+            buf = self._shm.buf
+            self.header = np.ndarray(_HEADER_WORDS, dtype=np.uint64, buffer=buf)
+            if self.created:
+                self.header[:] = 0
+                self.header[[_CAPACITY, _FIELDS, _TABLE_SIZE, _KEY_BYTES, _STRIPES]] = \
+                    [self.capacity, len(self.fields), table_size, self.key_bytes, stripes]
+            else:
+                # The tag makes a mismatch unlikely; this catches tag collisions and foreign segments
+                expected = (SHARED_MAGIC, self.capacity, len(self.fields), table_size, self.key_bytes)
+                found = tuple(int(v) for v in self.header[[_MAGIC, _CAPACITY, _FIELDS, _TABLE_SIZE, _KEY_BYTES]])
+                if found != expected:
+                    raise ValueError(f"shared state '{name}' has a different layout {found}, expected {expected}")
+                stripes = int(self.header[_STRIPES])
+
+            self.table_size = table_size
+            self._mask = table_size - 1
+            self.table_hash = np.ndarray(table_size, dtype=np.uint64, buffer=buf, offset=offsets['table_hash'])
+            self.table_slot = np.ndarray(table_size, dtype=np.int64, buffer=buf, offset=offsets['table_slot'])
+            self.seq = np.ndarray(self.capacity, dtype=np.uint64, buffer=buf, offset=offsets['seq'])
+            self.last_seen = np.ndarray(self.capacity, dtype=np.float64, buffer=buf, offset=offsets['last_seen'])
+            self.key_len = np.ndarray(self.capacity, dtype=np.int64, buffer=buf, offset=offsets['key_len'])
+            values = np.ndarray((len(self.fields), self.capacity), dtype=np.float64, buffer=buf, offset=offsets['fields'])
+            self.columns = {name: values[i] for i, name in enumerate(self.fields)}
+            self.keys = np.ndarray((self.capacity, self.key_bytes), dtype=np.uint8, buffer=buf, offset=offsets['keys'])
+            if self.created:
+                self.table_slot[:] = _EMPTY
+                self.key_len[:] = -1
+                self.header[_MAGIC] = SHARED_MAGIC  # written last: the segment is ready
+
+        self.lock = SharedStateLock(_lock_path(name), stripes, self.header, recover=self.repair)
+        self._cache = (None, {})  # (table seq, {key: slot}) valid while the table seq is unchanged
+        if self.created:
+            # Segments of an earlier layout are left over from a previous release: drop their names
+            # (processes of that release still attached keep their mapping until they exit)
+            removed = unlink_shared_state(base_name, keep=(name,))
+            if removed:
+                print(f"🧩 Shared state '{base_name}': new layout {name}, removed {', '.join(removed)}")
+
+    # --- keys ---
+
+    def encode(self, key):
+        """Key bytes as stored: UTF-8 of str(key), or a digest when longer than key_bytes."""
+        data = str(key).encode('utf-8')
+        if len(data) > self.key_bytes:
+            data = b'blake2b:' + hashlib.blake2b(data, digest_size=16).hexdigest().encode('ascii')
+        return data
+
+    def stripe_of(self, data):
+        return zlib.crc32(data) % self.lock.stripes
+
+    def key_at(self, slot):
+        return bytes(self.keys[slot, :self.key_len[slot]]).decode('utf-8')
+
+    def __len__(self):
+        return int(self.header[_COUNT])
+
+    # --- lookup ---
+
+    def probe(self, data):
+        """Slot holding key bytes `data`, or None. Only meaningful while the table is stable."""
+        h = zlib.crc32(data)
+        n = len(data)
+        i = h & self._mask
+        for _ in range(self.table_size):
+            slot = int(self.table_slot[i])
+            if slot == _EMPTY:
+                return None
+            if slot >= 0 and self.table_hash[i] == h and self.key_len[slot] == n and \
+                    bytes(self.keys[slot, :n]) == data:
+                return slot
+            i = (i + 1) & self._mask
+        return None
+
+    def find(self, key, data):
+        """
+        probe() through a per-process cache, for callers that hold a stripe lock (the table
+        cannot change under them unless they hold the exclusive lock, when the seq is odd).
+        """
+        seq = int(self.header[_TABLE_SEQ])
+        cached_seq, cache = self._cache
+        if seq & 1:
+            return self.probe(data)
+        if cached_seq != seq:
+            cache = {}
+            self._cache = (seq, cache)
+        slot = cache.get(key)
+        if slot is None:
+            slot = self.probe(data)
+            if slot is not None:
+                cache[key] = slot
+        return slot
+
+    def read(self, key, data, fields, retries=SEQLOCK_READ_RETRIES):
+        """
+        Lock-free read of `fields` for `key`: a tuple, None for an unknown key, or False if
+        every attempt overlapped a writer (the caller then reads under the stripe lock).
+        """
+        header, seq = self.header, self.seq
+        columns = self.columns
+        for _ in range(retries):
+            table_seq = int(header[_TABLE_SEQ])
+            if table_seq & 1:
+                continue
+            cached_seq, cache = self._cache
+            if cached_seq != table_seq:
+                cache = {}
+                self._cache = (table_seq, cache)
+            slot = cache.get(key)
+            if slot is None:
+                slot = self.probe(data)
+            if slot is None:
+                values = None
+            else:
+                slot_seq = int(seq[slot])
+                if slot_seq & 1:
+                    continue
+                values = tuple(float(columns[name][slot]) for name in fields)
+                if int(seq[slot]) != slot_seq:
+                    continue
+            if int(header[_TABLE_SEQ]) == table_seq:
+                if slot is not None:
+                    cache[key] = slot
+                return values
+        return False
+
+    # --- structural changes (exclusive lock held) ---
+
+    def insert(self, data, initial_values, now):
+        """Places key bytes `data` in a free slot with `initial_values`. The table must not be full."""
+        slot = int(self.header[_NEXT_SLOT])
+        if slot < self.capacity:
+            self.header[_NEXT_SLOT] = slot + 1
+        else:
+            slot = int(np.flatnonzero(self.key_len < 0)[0])
+        self.keys[slot, :len(data)] = np.frombuffer(data, dtype=np.uint8)
+        self.key_len[slot] = len(data)
+        for name, column in self.columns.items():
+            column[slot] = initial_values[name]
+        self.last_seen[slot] = now
+
+        h = zlib.crc32(data)
+        i = h & self._mask
+        while self.table_slot[i] >= 0:
+            i = (i + 1) & self._mask
+        if self.table_slot[i] == _TOMBSTONE:
+            self.header[_TOMBSTONES] -= 1
+        self.table_hash[i] = h
+        self.table_slot[i] = slot
+        self.header[_COUNT] += 1
+        return slot
+
+    def remove(self, slot):
+        data = bytes(self.keys[slot, :self.key_len[slot]])
+        i = zlib.crc32(data) & self._mask
+        while self.table_slot[i] != slot:
+            i = (i + 1) & self._mask
+        self.table_slot[i] = _TOMBSTONE
+        self.key_len[slot] = -1
+        self.header[_COUNT] -= 1
+        self.header[_TOMBSTONES] += 1
+        if int(self.header[_TOMBSTONES]) > self.table_size // 4:
+            self.rebuild()
+
+    def rebuild(self):
+        """Re-inserts every live slot into a clean index (drops tombstones)."""
+        self.table_slot[:] = _EMPTY
+        for slot in np.flatnonzero(self.key_len >= 0).tolist():
+            h = zlib.crc32(bytes(self.keys[slot, :self.key_len[slot]]))
+            i = h & self._mask
+            while self.table_slot[i] >= 0:
+                i = (i + 1) & self._mask
+            self.table_hash[i] = h
+            self.table_slot[i] = slot
+        self.header[_TOMBSTONES] = 0
+
+    def repair(self):
+        """
+        Rebuilds the index and counters from the slots' keys, after a process died holding the
+        exclusive lock (an insert or removal may be half done; its key is either kept or gone).
+        """
+        print(f"⚠️ Shared state '{self.name}': a process died holding the table lock, rebuilding the index")
+        live = self.key_len >= 0
+        self.header[_COUNT] = int(np.count_nonzero(live))
+        self.rebuild()
+
+    def live_slots(self):
+        """Occupied slots, least recently used first."""
+        slots = np.flatnonzero(self.key_len >= 0)
+        return slots[np.argsort(self.last_seen[slots], kind='stable')]
+
+    def close(self):
+        self.lock.close()
+        self.header = self.table_hash = self.table_slot = self.seq = self.last_seen = None
+        self.key_len = self.keys = self.columns = None
+        self._shm.close()
+
+
+def unlink_shared_state(name, keep=()):
+    """
+    Removes the segments and lock files behind `name`, every layout except the segment names in
+    `keep`, and returns the removed segment names. Processes still attached keep their mapping;
+    the memory is freed when they close it.
+    """
+    lock_dir = tempfile.gettempdir()
+    segments = _segment_names(name) - set(keep)
+    removed = []
+    with _Untracked():
+        for segment in sorted(segments):
+            try:
+                shm = shared_memory.SharedMemory(name=segment)
+            except FileNotFoundError:
+                continue
+            shm.close()
+            shm.unlink()
+            removed.append(segment)
+    locks = {os.path.basename(_lock_path(segment)) for segment in segments}
+    locks.update(entry for entry in os.listdir(lock_dir)
+                 if entry.endswith('.lock') and (entry == f'{name}.lock' or entry.startswith(f'{name}.'))
+                 and entry[:-len('.lock')] not in keep)
+    for lock in locks:
+        try:
+            os.unlink(os.path.join(lock_dir, lock))
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+# ==========================================================
+# 3. Shared Banks (drop-in for the per-process banks)
+# ==========================================================
+
+class SharedStateMixin:
+    """
+    Puts a KeyedStateBank's state in a SharedSlotTable. Updates of existing keys hold only the
+    key's stripe lock and bump its slot seqlock; updates that insert, and whole-bank operations
+    (update_many, restore, snapshot, eviction, `with bank.lock:` blocks) hold the exclusive
+    lock. Reads are lock-free.
+
+    Keys are stored as strings: str(key), or a digest of it when longer than key_bytes. LRU
+    order follows each slot's last update time.
+    """
+    def _attach_shared(self, name, stripes, key_bytes, locked_reads):
+        self.table = SharedSlotTable(name, self.FIELDS, self.capacity, stripes=stripes, key_bytes=key_bytes)
+        self.created = self.table.created
+        self.columns = self.table.columns
+        self.last_seen = self.table.last_seen
+        self.lock = self.table.lock
+        self.locked_reads = locked_reads
+        self._slots = None  # the table is the index
+
+    def __len__(self):
+        return len(self.table)
+
+    def __contains__(self, key):
+        table = self.table
+        data = table.encode(key)
+        found = False if self.locked_reads else table.read(key, data, ())
+        if found is False:
+            with self.lock.stripe(table.stripe_of(data)):
+                return table.find(key, data) is not None
+        return found is not None
+
+    def keys(self):
+        with self.lock:
+            return [self.table.key_at(slot) for slot in self.table.live_slots().tolist()]
+
+    def read(self, key, fields):
+        """Current values of `fields` for `key` (read together), or their initial values if the key is unknown."""
+        table = self.table
+        data = table.encode(key)
+        values = False if self.locked_reads else table.read(key, data, fields)
+        if values is False:
+            with self.lock.stripe(table.stripe_of(data)):
+                slot = table.find(key, data)
+                values = None if slot is None else tuple(float(self.columns[name][slot]) for name in fields)
+        if values is None:
+            return tuple(self.initial_values[name] for name in fields)
+        return values
+
+    def snapshot(self):
+        with self.lock:
+            slots = self.table.live_slots()
+            keys = [self.table.key_at(slot) for slot in slots.tolist()]
+            return keys, {name: column[slots].copy() for name, column in self.columns.items()}
+
+    def restore(self, keys, columns):
+        keys = list(keys)[-self.capacity:]
+        if not keys:
+            return
+        with self.lock:
+            slots = self._acquire_many(keys)
+            for name in self.FIELDS:
+                self.columns[name][slots] = np.asarray(columns[name], dtype=float)[-len(keys):]
+
+    def evict_idle(self, now=None):
+        if not self.ttl_seconds:
+            return 0
+        with self.lock:
+            now = self.clock() if now is None else now
+            table = self.table
+            idle = np.flatnonzero((table.key_len >= 0) & (table.last_seen < now - self.ttl_seconds))
+            for slot in idle.tolist():
+                table.remove(slot)
+            return len(idle)
+
+    def _acquire(self, key):
+        with self.lock:
+            return self._acquire_many((key,))[0]
+
+    def _acquire_many(self, keys):
+        if len(keys) > self.capacity and len(set(keys)) > self.capacity:
+            raise ValueError(f"{len(set(keys))} distinct keys in one update exceed the bank capacity {self.capacity}")
+        table = self.table
+        with self.lock:
+            now = self.clock()
+            self.evict_idle(now)
+            slots = np.empty(len(keys), dtype=np.intp)
+            for i, key in enumerate(keys):
+                data = table.encode(key)
+                slot = table.probe(data)
+                if slot is None:
+                    if len(table) >= self.capacity:
+                        live = np.flatnonzero(table.key_len >= 0)
+                        table.remove(int(live[np.argmin(table.last_seen[live])]))
+                    slot = table.insert(data, self.initial_values, now)
+                slots[i] = slot
+            self.last_seen[slots] = now
+            return slots
+
+    def _shared_update(self, key, update_slot, *args):
+        """Runs `update_slot(slot, *args)` for `key` under its stripe lock, or the exclusive lock to insert it."""
+        table = self.table
+        data = table.encode(key)
+        with self.lock.stripe(table.stripe_of(data)):
+            slot = table.find(key, data)
+            if slot is not None:
+                seq = table.seq
+                # Odd while the fields change, so readers of this slot retry. An odd value on
+                # entry means a writer died mid-update; moving on to the next odd / even
+                # values keeps the parity right (the fields hold whatever it had written)
+                _begin_write(seq, slot)
+                try:
+                    result = update_slot(slot, *args)
+                    self.last_seen[slot] = self.clock()
+                finally:
+                    _end_write(seq, slot)
+                if self.journal is not None:
+                    self.journal.record(self, (key,), (slot,))
+                return result
+        with self.lock:
+            slot = self._acquire(key)
+            result = update_slot(slot, *args)
+            if self.journal is not None:
+                self.journal.record(self, (key,), (slot,))
+            return result
+
+    def close(self):
+        self.table.close()
+
+
+class SharedDHT22_KalmanFilterBank(SharedStateMixin, DHT22_KalmanFilterBank):
+    """DHT22_KalmanFilterBank whose state lives in the shared memory segment `name`."""
+    def __init__(self, initial_temp, initial_humidity, name, stripes=SHARED_STATE_LOCK_STRIPES,
+                 key_bytes=SHARED_STATE_KEY_BYTES, locked_reads=SHARED_STATE_LOCKED_READS, **kwargs):
+        super().__init__(initial_temp, initial_humidity, initial_slots=1, **kwargs)
+        self._attach_shared(name, stripes, key_bytes, locked_reads)
+
+    def update_filter(self, key, measured_temp, measured_humidity, timestamp=None):
+        return self._shared_update(key, self._filter_slot, measured_temp, measured_humidity, timestamp)
+
+
+class SharedWellnessFusionBank(SharedStateMixin, WellnessFusionBank):
+    """WellnessFusionBank whose state lives in the shared memory segment `name`."""
+    def __init__(self, name, initial_wellness=80.0, stripes=SHARED_STATE_LOCK_STRIPES,
+                 key_bytes=SHARED_STATE_KEY_BYTES, locked_reads=SHARED_STATE_LOCKED_READS, **kwargs):
+        super().__init__(initial_wellness=initial_wellness, initial_slots=1, **kwargs)
+        self._attach_shared(name, stripes, key_bytes, locked_reads)
+
+    def update_fusion(self, key, vsd_risk_score, smoothed_temp, smoothed_humidity, measurement_source='VSD',
+                      timestamp=None):
+        return self._shared_update(key, self._fuse_slot, vsd_risk_score, smoothed_temp, smoothed_humidity,
+                                   measurement_source, timestamp)
@@ -0,0 +1,463 @@
+import fcntl
+import glob
+import os
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+
+# --- Configuration ---
+# Empty = estimator state lives in memory only; otherwise snapshots + delta logs go here
+STATE_DIR = os.environ.get('STATE_DIR', '')
+# Full snapshot this often (seconds), or sooner once the delta log reaches STATE_DELTA_MAX_BYTES
+STATE_SNAPSHOT_SECONDS = float(os.environ.get('STATE_SNAPSHOT_SECONDS', 60))
+STATE_DELTA_MAX_BYTES = int(os.environ.get('STATE_DELTA_MAX_BYTES', 4 * 1024 * 1024))
+# Delta log fsync interval; every record reaches the OS on write (survives a process crash),
+# this bounds what a power loss can take. 0 = fsync on every update.
+STATE_FSYNC_SECONDS = float(os.environ.get('STATE_FSYNC_SECONDS', 1.0))
+
+SNAPSHOT_MAGIC = b'VSDSNAP1'
+DELTA_MAGIC = b'VSDDLOG1'
+SNAPSHOT_FILE = 'state.snap'
+LOCK_FILE = 'state.lock'
+DELTA_FILE = 'delta.{:012d}.log'
+
+_U16 = struct.Struct('<H')
+_U32 = struct.Struct('<I')
+_U64 = struct.Struct('<Q')
+_RECORD_HEADER = struct.Struct('<II')  # payload length, crc32(payload)
+_KEY_HEADER = struct.Struct('<BI')     # bank index, key length
+
+
+# ==========================================================
+# 1. Binary Encoding Helpers
+# ==========================================================
+
+def _pack_str(text):
+    data = text.encode()
+    return _U16.pack(len(data)) + data
+
+
+def _encode_bank_table(banks):
+    """Bank names and their FIELDS, so files written by another configuration are detected."""
+    parts = [_U16.pack(len(banks))]
+    for name, bank in banks:
+        parts.append(_pack_str(name) + _U16.pack(len(bank.FIELDS)))
+        parts.extend(_pack_str(field) for field in bank.FIELDS)
+    return b''.join(parts)
+
+
+class _UpgradedRecord:
+    """Unpacks delta record values written with older FIELDS into the current order, new fields at `added` values."""
+    def __init__(self, saved_fields, current_fields, added):
+        self._struct = struct.Struct(f'<{len(saved_fields)}d')
+        self._plan = [(saved_fields.index(f), None) if f in saved_fields else (None, added[f]) for f in current_fields]
+
+    def unpack_from(self, data, offset):
+        saved = self._struct.unpack_from(data, offset)
+        return tuple(value if i is None else saved[i] for i, value in self._plan)
+
+
+class _Reader:
+    def __init__(self, data, offset=0):
+        self.data = data
+        self.offset = offset
+
+    def take(self, n):
+        if self.offset + n > len(self.data):
+            raise ValueError("truncated")
+        chunk = self.data[self.offset:self.offset + n]
+        self.offset += n
+        return chunk
+
+    def unpack(self, fmt):
+        return fmt.unpack(self.take(fmt.size))[0]
+
+    def string(self):
+        return bytes(self.take(self.unpack(_U16))).decode()
+
+    def bank_table(self):
+        table = []
+        for _ in range(self.unpack(_U16)):
+            name = self.string()
+            table.append((name, tuple(self.string() for _ in range(self.unpack(_U16)))))
+        return table
+
+
+def _fsync_dir(directory):
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _write_all(fd, data):
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+def _atomic_write(path, data):
+    """Write to a temp file, fsync it, rename over `path`, fsync the directory."""
+    tmp_path = f"{path}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        _write_all(fd, data)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    os.replace(tmp_path, path)
+    _fsync_dir(os.path.dirname(os.path.abspath(path)))
+
+
+# ==========================================================
+# 2. Snapshot + Delta Log Store
+# ==========================================================
+
+class StateStore:
+    """
+    Crash-safe persistence for KeyedStateBanks. Every bank update appends one small binary
+    record (key + the slot's new field values, CRC-framed) to the current delta log; a
+    background thread fsyncs the log every `fsync_seconds` and periodically writes a full
+    snapshot of all banks (temp file + fsync + rename), after which older logs are deleted.
+
+    Logs are numbered by generation. A snapshot with generation g holds everything from logs
+    below g, so restore() loads it and replays logs g, g+1, ... in order. Records carry
+    absolute values, so replaying one the snapshot already contains is harmless, and a torn
+    record at the end of a log (crash mid-write) fails its CRC and is ignored.
+
+    One process per directory (enforced with a lock file).
+    """
+    def __init__(self, directory, banks, snapshot_seconds=STATE_SNAPSHOT_SECONDS,
+                 fsync_seconds=STATE_FSYNC_SECONDS, delta_max_bytes=STATE_DELTA_MAX_BYTES):
+        if len(banks) > 255:
+            raise ValueError("at most 255 banks per store")
+        self.directory = os.path.abspath(directory)
+        self.banks = list(banks.items())
+        self.snapshot_seconds = snapshot_seconds
+        self.fsync_seconds = fsync_seconds
+        self.delta_max_bytes = delta_max_bytes
+        self.generation = 0
+        self.snapshots = 0
+        self.write_errors = 0
+        self.restored_keys = 0
+        self.replayed_records = 0
+        self.torn_records = 0
+        self.restore_seconds = None
+        self.last_snapshot_seconds = None
+
+        self._index = {id(bank): i for i, (_, bank) in enumerate(self.banks)}
+        self._values = [struct.Struct(f'<{len(bank.FIELDS)}d') for _, bank in self.banks]
+        self._fd = None
+        self._delta_bytes = 0
+        self._dirty = False
+        self._lock = threading.Lock()           # current log fd / counters
+        self._maintenance_lock = threading.Lock()  # one fsync / rotation / snapshot at a time
+        self._stop = threading.Event()
+        self._thread = None
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock_file = open(os.path.join(self.directory, LOCK_FILE), 'a+b')
+        try:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._lock_file.close()
+            raise RuntimeError(f"state directory {self.directory} is in use by another process")
+
+    # --- lifecycle ---
+
+    def open(self, restore=True):
+        """
+        Restores the banks from disk, starts a new delta log, attaches journaling and the
+        background thread. With restore=False the banks' current state is kept (e.g. shared
+        state another process already restored) and written as a fresh snapshot instead.
+        """
+        if restore:
+            last_generation = self.restore()
+        else:
+            last_generation = max((generation for generation, _ in self._delta_logs()), default=0)
+        self._open_delta(last_generation + 1)
+        for _, bank in self.banks:
+            bank.journal = self
+        if not restore:
+            self.snapshot()
+        self._thread = threading.Thread(target=self._run, name='state-store', daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        """Stops journaling, writes a final snapshot and releases the directory."""
+        if self._lock_file is None:
+            return
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        for _, bank in self.banks:
+            if bank.journal is self:
+                bank.journal = None
+        try:
+            self.snapshot()
+        finally:
+            with self._lock:
+                if self._fd is not None:
+                    os.close(self._fd)
+                    self._fd = None
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+            self._lock_file.close()
+            self._lock_file = None
+
+    def stats(self):
+        return {
+            'directory': self.directory,
+            'generation': self.generation,
+            'delta_bytes': self._delta_bytes,
+            'snapshots': self.snapshots,
+            'last_snapshot_seconds': self.last_snapshot_seconds,
+            'restored_keys': self.restored_keys,
+            'replayed_records': self.replayed_records,
+            'torn_records': self.torn_records,
+            'restore_seconds': self.restore_seconds,
+            'write_errors': self.write_errors,
+        }
+
+    # --- journaling (called by the banks while they hold their lock) ---
+
+    def record(self, bank, keys, slots):
+        """Appends the current field values of `slots` (owned by `keys`) in `bank` to the delta log."""
+        index = self._index[id(bank)]
+        pack_values = self._values[index].pack
+        columns = [bank.columns[name] for name in bank.FIELDS]
+        chunks = []
+        for key, slot in zip(keys, slots):
+            key_bytes = str(key).encode()
+            payload = _KEY_HEADER.pack(index, len(key_bytes)) + key_bytes + pack_values(*[c[slot] for c in columns])
+            chunks.append(_RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+        data = b''.join(chunks)
+        with self._lock:
+            if self._fd is None:
+                return
+            try:
+                _write_all(self._fd, data)
+                if self.fsync_seconds <= 0:
+                    os.fsync(self._fd)
+            except OSError as e:
+                # Persistence degrades; the in-memory update already happened and the request still succeeds
+                self.write_errors += 1
+                if self.write_errors == 1:
+                    print(f"⚠️ State delta log write failed, state is not being persisted: {e}")
+                return
+            self._delta_bytes += len(data)
+            self._dirty = True
+
+    # --- background maintenance ---
+
+    def flush(self):
+        """fsyncs the current delta log if anything was written since the last flush."""
+        with self._maintenance_lock:
+            with self._lock:
+                fd, dirty = self._fd, self._dirty
+                self._dirty = False
+            if fd is not None and dirty:
+                os.fsync(fd)
+
+    def snapshot(self):
+        """Writes every bank to the snapshot file atomically, then drops the logs it covers."""
+        with self._maintenance_lock:
+            start = time.perf_counter()
+            # Rotate first: updates from here on land in the new log; any of them the snapshot
+            # below also captures are simply replayed on top with the same values.
+            with self._lock:
+                old_fd, covered = self._fd, self.generation
+                self._open_delta_locked(covered + 1)
+            if old_fd is not None:
+                os.fsync(old_fd)
+                os.close(old_fd)
+
+            parts = [SNAPSHOT_MAGIC, _U64.pack(covered + 1), _encode_bank_table(self.banks)]
+            for _, bank in self.banks:
+                keys, columns = bank.snapshot()
+                encoded = [str(key).encode() for key in keys]
+                parts.append(_U32.pack(len(encoded)))
+                parts.append(np.fromiter(map(len, encoded), dtype='<u4', count=len(encoded)).tobytes())
+                parts.append(b''.join(encoded))
+                parts.extend(np.ascontiguousarray(columns[name], dtype='<f8').tobytes() for name in bank.FIELDS)
+            body = b''.join(parts)
+            _atomic_write(os.path.join(self.directory, SNAPSHOT_FILE), body + _U32.pack(zlib.crc32(body)))
+
+            for generation, path in self._delta_logs():
+                if generation <= covered:
+                    os.remove(path)
+            self.snapshots += 1
+            self.last_snapshot_seconds = time.perf_counter() - start
+
+    def _run(self):
+        interval = self.fsync_seconds if self.fsync_seconds > 0 else 1.0
+        last_snapshot = time.monotonic()
+        while not self._stop.wait(interval):
+            try:
+                self.flush()
+                if time.monotonic() - last_snapshot >= self.snapshot_seconds or self._delta_bytes >= self.delta_max_bytes:
+                    self.snapshot()
+                    last_snapshot = time.monotonic()
+            except OSError as e:
+                print(f"⚠️ State snapshot / fsync failed: {e}")
+
+    # --- delta logs ---
+
+    def _delta_logs(self):
+        logs = []
+        for path in glob.glob(os.path.join(self.directory, 'delta.*.log')):
+            try:
+                logs.append((int(os.path.basename(path).split('.')[1]), path))
+            except ValueError:
+                continue
+        return sorted(logs)
+
+    def _open_delta(self, generation):
+        with self._lock:
+            self._open_delta_locked(generation)
+
+    def _open_delta_locked(self, generation):
+        path = os.path.join(self.directory, DELTA_FILE.format(generation))
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_APPEND, 0o644)
+        header = DELTA_MAGIC + _U64.pack(generation) + _encode_bank_table(self.banks)
+        _write_all(fd, header + _U32.pack(zlib.crc32(header)))
+        os.fsync(fd)
+        _fsync_dir(self.directory)
+        self._fd = fd
+        self.generation = generation
+        self._delta_bytes = 0
+        self._dirty = False
+
+    # --- restore ---
+
+    def restore(self):
+        """
+        Loads the snapshot and replays newer delta logs into the banks. Returns the highest
+        generation seen (snapshot or log), so the next log continues after it.
+        """
+        start = time.perf_counter()
+        current = {name: tuple(bank.FIELDS) for name, bank in self.banks}
+        state = {name: ([], {}) for name in current}  # name -> (snapshot keys, {key: values} from logs)
+        snapshot_columns = {}
+
+        snapshot_generation = 0
+        snapshot_path = os.path.join(self.directory, SNAPSHOT_FILE)
+        if os.path.exists(snapshot_path):
+            try:
+                snapshot_generation = self._read_snapshot(snapshot_path, current, state, snapshot_columns)
+            except ValueError as e:
+                print(f"⚠️ Ignoring unreadable state snapshot {snapshot_path}: {e}")
+
+        last_generation = snapshot_generation
+        for generation, path in self._delta_logs():
+            last_generation = max(last_generation, generation)
+            if generation >= snapshot_generation:
+                self._replay_delta(path, current, state)
+
+        for name, bank in self.banks:
+            snapshot_keys, updates = state[name]
+            columns = snapshot_columns.get(name)
+            if columns is None:
+                columns = {field: np.empty(0) for field in bank.FIELDS}
+            if updates:
+                # Keys updated after the snapshot move to the most-recently-used end, with their logged values
+                keep = [i for i, key in enumerate(snapshot_keys) if key not in updates]
+                snapshot_keys = [snapshot_keys[i] for i in keep] + list(updates)
+                replayed = np.array(list(updates.values()), dtype=float).reshape(len(updates), len(bank.FIELDS))
+                columns = {field: np.concatenate([columns[field][keep], replayed[:, j]])
+                           for j, field in enumerate(bank.FIELDS)}
+            bank.restore(snapshot_keys, columns)
+            self.restored_keys += len(bank)
+
+        self.restore_seconds = time.perf_counter() - start
+        return last_generation
+
+    def _added_fields(self, name, saved_fields):
+        """
+        Fields the bank gained since `saved_fields` were written, with their initial values
+        (state saved before a field existed loads with it at its initial value). None if the
+        bank is unknown or lost fields.
+        """
+        bank = dict(self.banks).get(name)
+        if bank is None or not set(saved_fields) <= set(bank.FIELDS):
+            return None
+        return {field: bank.initial_values[field] for field in bank.FIELDS if field not in saved_fields}
+
+    def _read_snapshot(self, path, current, state, snapshot_columns):
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < len(SNAPSHOT_MAGIC) + 4 or not data.startswith(SNAPSHOT_MAGIC):
+            raise ValueError("bad magic")
+        if zlib.crc32(data[:-4]) != _U32.unpack(data[-4:])[0]:
+            raise ValueError("checksum mismatch")
+        reader = _Reader(memoryview(data)[:-4], len(SNAPSHOT_MAGIC))
+        generation = reader.unpack(_U64)
+        for name, fields in reader.bank_table():
+            n = reader.unpack(_U32)
+            lengths = np.frombuffer(reader.take(4 * n), dtype='<u4')
+            blob = bytes(reader.take(int(lengths.sum())))
+            columns = {field: np.frombuffer(reader.take(8 * n), dtype='<f8') for field in fields}
+            if current.get(name) != fields:
+                added = self._added_fields(name, fields)
+                if added is None:
+                    print(f"⚠️ Skipping snapshot state for bank '{name}' (fields {fields} do not match this configuration)")
+                    continue
+                columns.update({field: np.full(n, value) for field, value in added.items()})
+            ends = np.cumsum(lengths).tolist()
+            text = blob.decode()
+            # All-ASCII keys (the usual device ids): byte offsets are character offsets
+            source = text if len(text) == len(blob) else blob
+            keys = [source[end - length:end] for end, length in zip(ends, lengths.tolist())]
+            state[name][0].extend(keys if source is text else [key.decode() for key in keys])
+            snapshot_columns[name] = columns
+        return generation
+
+    def _replay_delta(self, path, current, state):
+        with open(path, 'rb') as f:
+            data = f.read()
+        reader = _Reader(memoryview(data))
+        try:
+            if bytes(reader.take(len(DELTA_MAGIC))) != DELTA_MAGIC:
+                raise ValueError("bad magic")
+            reader.unpack(_U64)
+            table = reader.bank_table()
+            if zlib.crc32(data[:reader.offset]) != reader.unpack(_U32):
+                raise ValueError("header checksum mismatch")
+        except ValueError as e:
+            print(f"⚠️ Ignoring unreadable state delta log {path}: {e}")
+            return
+        targets, value_structs = [], []
+        for name, fields in table:
+            added = {} if current.get(name) == fields else self._added_fields(name, fields)
+            targets.append(None if added is None else state[name][1])
+            value_structs.append(_UpgradedRecord(fields, current[name], added)
+                                 if added is not None and current[name] != fields else struct.Struct(f'<{len(fields)}d'))
+
+        view, offset, end = reader.data, reader.offset, len(data)
+        header_size, key_size = _RECORD_HEADER.size, _KEY_HEADER.size
+        unpack_header, unpack_key, crc32 = _RECORD_HEADER.unpack_from, _KEY_HEADER.unpack_from, zlib.crc32
+        replayed = 0
+        while offset < end:
+            start = offset + header_size
+            if start > end:
+                self.torn_records += 1
+                break
+            length, crc = unpack_header(data, offset)
+            offset = start + length
+            if offset > end or crc32(view[start:offset]) != crc:
+                self.torn_records += 1
+                break
+            index, key_length = unpack_key(data, start)
+            updates = targets[index] if index < len(targets) else None
+            if updates is None:
+                continue
+            key_start = start + key_size
+            key = data[key_start:key_start + key_length].decode()
+            updates.pop(key, None)  # re-insert so replayed keys keep most-recently-updated order
+            updates[key] = value_structs[index].unpack_from(data, key_start + key_length)
+            replayed += 1
+        self.replayed_records += replayed
@@ -0,0 +1,92 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+# --- Configuration ---
+# Open sessions kept at once; opening one more evicts the least recently used session
+STREAM_MAX_SESSIONS = int(os.environ.get('STREAM_MAX_SESSIONS', 256))
+# Sessions with no chunk for this long are dropped
+STREAM_SESSION_TTL_SECONDS = float(os.environ.get('STREAM_SESSION_TTL_SECONDS', 300))
+
+
+class StreamSessionError(KeyError):
+    """Raised for an unknown, expired or already finalized stream session."""
+
+
+# ==========================================================
+# 1. Session Table (bounded, idle sessions expire)
+# ==========================================================
+
+class StreamSessionStore:
+    """
+    Open streaming sessions keyed by a random id. At most `capacity` sessions are kept (the
+    least recently used one is dropped beyond that) and sessions idle for `ttl_seconds` expire.
+    Pushes to one session are serialized; different sessions run concurrently.
+    """
+    def __init__(self, capacity=STREAM_MAX_SESSIONS, ttl_seconds=STREAM_SESSION_TTL_SECONDS, clock=time.monotonic):
+        self.capacity = capacity
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._sessions = OrderedDict()  # id -> [extractor, metadata, last_seen, lock]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def open(self, sr=16000, pitch_backend='piptrack', metadata=None):
+        """Starts a session and returns its id."""
+        # The extractor pulls in librosa; importing it here keeps this module light
+        from utils.streaming import StreamingFeatureExtractor
+
+        extractor = StreamingFeatureExtractor(sr=sr, pitch_backend=pitch_backend)
+        session_id = uuid.uuid4().hex
+        with self._lock:
+            self._expire(self._clock())
+            while len(self._sessions) >= self.capacity:
+                self._sessions.popitem(last=False)
+            self._sessions[session_id] = [extractor, dict(metadata or {}), self._clock(), threading.Lock()]
+        return session_id
+
+    def push(self, session_id, samples):
+        """Feeds one chunk; returns (samples received, frames processed) so far."""
+        extractor, _, session_lock = self._touch(session_id)
+        with session_lock:
+            # A finalize that popped the session after _touch may have run first
+            if extractor.finalized:
+                raise StreamSessionError(session_id)
+            extractor.push(samples)
+            return extractor.n_samples, extractor.n_frames
+
+    def finalize(self, session_id):
+        """Closes the session and returns (16-feature np.ndarray, metadata given to open)."""
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+        if entry is None:
+            raise StreamSessionError(session_id)
+        extractor, metadata, _, session_lock = entry
+        with session_lock:
+            return extractor.finalize(), metadata
+
+    def discard(self, session_id):
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def _touch(self, session_id):
+        now = self._clock()
+        with self._lock:
+            self._expire(now)
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                raise StreamSessionError(session_id)
+            entry[2] = now
+            self._sessions.move_to_end(session_id)
+            return entry[0], entry[1], entry[3]
+
+    def _expire(self, now):
+        while self._sessions:
+            session_id, entry = next(iter(self._sessions.items()))
+            if now - entry[2] < self.ttl_seconds:
+                break
+            del self._sessions[session_id]
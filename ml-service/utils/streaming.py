@@ -0,0 +1,171 @@
+import numpy as np
+import librosa
+import soxr
+
+from utils.feature_extraction import (
+    AMIN, N_FFT, HOP_LENGTH, PITCH_BACKENDS, PITCH_FMIN, PITCH_FMAX, TOP_DB, YIN_FRAME_LENGTH,
+    YIN_THRESHOLD, ZCR_THRESHOLD, _frame_sums, _yin_f0, mfcc_bases, piptrack_pitches
+)
+from utils.resampling import RESAMPLE_QUALITY
+
+# --- Configuration ---
+STREAM_TARGET_SR = 16000
+# Complete frames are folded in batches of at least this many (bounds per-push overhead for
+# tiny chunks; finalize never has more than this many frames left to process)
+STREAM_MIN_BATCH_FRAMES = 16
+
+# power_to_db's top_db floor (max - 80 dB) depends on the loudest mel bin of the whole clip,
+# so per-band dB values are kept as a fixed-size histogram (count + exact sum per bin) and the
+# floor is applied at finalize. Only values inside the bin holding the floor are approximated,
+# so the bins stay narrow (1 dB bins already move the MFCCs by ~0.15 on quiet-noise clips); each
+# bin sums the values' offsets from its lower edge instead, which float32 holds to ~1e-4 dB.
+AMIN_DB = 10.0 * np.log10(AMIN)
+DB_HIST_MAX = 40.0
+DB_HIST_BIN = 0.5
+DB_HIST_BINS = int((DB_HIST_MAX - AMIN_DB) / DB_HIST_BIN)
+
+# Documented tolerance of finalize() against compute_vsd_features on the full clip
+STREAM_PARITY_RTOL = 1e-3
+STREAM_PARITY_ATOL = 1e-2
+
+
+# ==========================================================
+# 1. Incremental Feature Accumulator (one per stream)
+# ==========================================================
+
+class StreamingFeatureExtractor:
+    """
+    Computes the same 16 features as compute_vsd_features, but frame by frame as PCM chunks
+    arrive. Every feature is a mean over the centred STFT frame grid, so each complete frame
+    is folded into running sums; only the unprocessed tail (N_FFT plus under one batch of hops)
+    is carried to the next chunk. Memory is constant in the clip length and finalize() only
+    processes the trailing frames.
+    """
+    def __init__(self, sr=STREAM_TARGET_SR, pitch_backend='piptrack'):
+        if pitch_backend not in PITCH_BACKENDS:
+            raise ValueError(f"Unknown pitch backend '{pitch_backend}', expected one of {PITCH_BACKENDS}")
+        self.input_sr = int(sr)
+        self.sr = STREAM_TARGET_SR
+        self.pitch_backend = pitch_backend
+        self.n_samples = 0  # samples received, at STREAM_TARGET_SR
+        self.n_frames = 0
+        self.finalized = False
+        self._resampler = None
+        if self.input_sr != self.sr:
+            # Same soxr filter as utils.resampling / librosa.resample, kept stateful across chunks
+            self._resampler = soxr.ResampleStream(self.input_sr, self.sr, 1, dtype='float32', quality=RESAMPLE_QUALITY)
+
+        self._window = librosa.filters.get_window('hann', N_FFT, fftbins=True).astype(np.float32)
+        self._mel_basis, self._dct_basis = mfcc_bases(self.sr)
+        n_mels = self._mel_basis.shape[0]
+
+        # Zero-padded signal from padded position self._offset on (starts with the centring pad)
+        self._buffer = np.zeros(N_FFT // 2, dtype=np.float32)
+        self._offset = 0
+        self._db_counts = np.zeros((n_mels, DB_HIST_BINS), dtype=np.int32)
+        self._db_offsets = np.zeros((n_mels, DB_HIST_BINS), dtype=np.float32)
+        self._db_max = -np.inf
+        self._rms_sum = 0.0
+        self._zcr_sum = 0.0
+        self._pitch_sum = 0.0
+        self._pitch_count = 0
+
+    def push(self, samples):
+        """Adds a chunk of mono float samples (at the session sample rate)."""
+        if self.finalized:
+            raise RuntimeError("stream already finalized")
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+        if self._resampler is not None:
+            samples = self._resampler.resample_chunk(samples, last=False)
+        self._append(samples)
+        self._process(final=False)
+
+    def finalize(self):
+        """Flushes the trailing frames and returns the 16-feature vector (np.ndarray)."""
+        if self.finalized:
+            raise RuntimeError("stream already finalized")
+        if self._resampler is not None:
+            self._append(self._resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True))
+        if self.n_samples == 0:
+            raise ValueError("no audio received")
+        self.finalized = True
+        self._buffer = np.concatenate([self._buffer, np.zeros(N_FFT // 2, dtype=np.float32)])
+        self._process(final=True)
+        self._buffer = None
+
+        mfccs_mean = self._mfccs_mean()
+        rms_mean = self._rms_sum / self.n_frames
+        zcr_mean = self._zcr_sum / self.n_frames
+        pitch_mean = self._pitch_sum / self._pitch_count if self._pitch_count else 0
+        return np.hstack([mfccs_mean, rms_mean, zcr_mean, pitch_mean])
+
+    def _append(self, samples):
+        if samples.size:
+            self._buffer = np.concatenate([self._buffer, samples])
+            self.n_samples += samples.size
+
+    def _process(self, final):
+        """Folds every complete frame in the buffer into the running sums."""
+        available = (self._buffer.size - N_FFT) // HOP_LENGTH + 1 if self._buffer.size >= N_FFT else 0
+        if final:
+            # Centred framing has 1 + n // hop frames; the right pad completes all of them
+            available = 1 + self.n_samples // HOP_LENGTH - self.n_frames
+        elif available < STREAM_MIN_BATCH_FRAMES:
+            return
+        if available <= 0:
+            return
+
+        frames = np.lib.stride_tricks.sliding_window_view(self._buffer, N_FFT)[::HOP_LENGTH][:available]
+        S = np.abs(np.fft.rfft(frames * self._window, axis=1)).T
+
+        # 1. MFCCs: mel power in dB, accumulated per band until the top_db floor is known
+        mel_db = 10.0 * np.log10(np.maximum(AMIN, self._mel_basis @ (S ** 2)))
+        self._db_max = max(self._db_max, float(mel_db.max()))
+        bins = np.clip(((mel_db - AMIN_DB) / DB_HIST_BIN).astype(np.int64), 0, DB_HIST_BINS - 1)
+        flat = (np.arange(mel_db.shape[0])[:, np.newaxis] * DB_HIST_BINS + bins).ravel()
+        offsets = mel_db - (AMIN_DB + DB_HIST_BIN * bins)
+        size = self._db_counts.size
+        self._db_counts += np.bincount(flat, minlength=size).reshape(self._db_counts.shape).astype(np.int32)
+        self._db_offsets += np.bincount(flat, weights=offsets.ravel(), minlength=size).reshape(self._db_offsets.shape)
+
+        # 2. RMS Energy (zero-padded frames)
+        self._rms_sum += float(np.sum(np.sqrt(np.mean(frames.astype(np.float64) ** 2, axis=1))))
+
+        # 3. ZCR: librosa edge-pads, so only sample pairs inside the real signal can cross
+        span = (available - 1) * HOP_LENGTH + N_FFT
+        negative = self._buffer[:span] < -ZCR_THRESHOLD
+        crossings = negative[1:] != negative[:-1]
+        first_real = N_FFT // 2 - self._offset
+        if first_real > 0:
+            crossings[:first_real] = False
+        if final:
+            crossings[max(N_FFT // 2 + self.n_samples - 1 - self._offset, 0):] = False
+        self._zcr_sum += float(np.sum(_frame_sums(crossings, available, frame_length=N_FFT - 1))) / N_FFT
+
+        # 4. Pitch
+        if self.pitch_backend == 'yin':
+            centre = N_FFT // 2 - YIN_FRAME_LENGTH // 2
+            f0 = _yin_f0(frames[:, centre:centre + YIN_FRAME_LENGTH], self.sr, PITCH_FMIN, PITCH_FMAX, YIN_THRESHOLD)
+            pitch = f0[f0 > 0]
+        else:
+            pitch = piptrack_pitches(S, self.sr)
+        self._pitch_sum += float(np.sum(pitch))
+        self._pitch_count += int(pitch.size)
+
+        # Keep only the overlap the next frame still needs
+        consumed = available * HOP_LENGTH
+        self._buffer = self._buffer[consumed:].copy()
+        self._offset += consumed
+        self.n_frames += available
+
+    def _mfccs_mean(self):
+        """Mean MFCCs: the DCT is linear, so it is applied once to the mean floored dB per band."""
+        floor = self._db_max - TOP_DB
+        edges = AMIN_DB + DB_HIST_BIN * np.arange(DB_HIST_BINS + 1)
+        counts = self._db_counts.astype(np.float64)
+        sums = self._db_offsets + counts * edges[:-1]
+        bin_means = np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+        floored = np.where(edges[1:] <= floor, counts * floor,
+                           np.where(edges[:-1] < floor, counts * np.maximum(bin_means, floor), sums))
+        mean_db = floored.sum(axis=1) / self.n_frames
+        return self._dct_basis @ mean_db
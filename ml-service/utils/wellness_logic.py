@@ -1,22 +1,76 @@
 import numpy as np
 import joblib
-import librosa
 import os
+import threading
+import time
+from collections import OrderedDict
+
+from utils.metrics import REGISTRY as METRICS, STALE_READINGS, stage
+
 
 # --- Configuration (Relative path to models folder) ---
 MODELS_DIR = 'models/'
 VSD_FEATURE_DIM = 16
+# 'stft' = single-STFT engine, 'librosa' = one librosa call per feature (reference)
+FEATURE_ENGINE = os.environ.get('VSD_FEATURE_ENGINE', 'stft')
+# 'piptrack' (what the model was trained on) or 'yin' (faster vectorized F0), stft engine only
+PITCH_BACKEND = os.environ.get('VSD_PITCH_BACKEND', 'piptrack')
+# Score with the scaler folded into the logistic weights (sklearn path stays as fallback)
+USE_FUSED_KERNEL = os.environ.get('VSD_FUSED_KERNEL', '1') != '0'
 
 # --- 1. Load ML Components Globally ---
+VSD_MODEL = None
+VSD_SCALER = None
+VSD_MODEL_ERROR = None  # why loading failed, reported by /readyz
 try:
     VSD_MODEL = joblib.load(os.path.join(MODELS_DIR, 'vsd_logistic_model.pkl'))
     VSD_SCALER = joblib.load(os.path.join(MODELS_DIR, 'vsd_feature_scaler.pkl'))
     print(f"✅ VSD components loaded. Scaler expects {VSD_SCALER.n_features_in_} features.")
 except Exception as e:
+    VSD_MODEL, VSD_SCALER, VSD_MODEL_ERROR = None, None, str(e)
     print(f"❌ ERROR: Could not load VSD ML components. Check models directory. Details: {e}")
     # In a production environment, you might want to stop the application here (e.g., raise)
 
 
+def build_fused_kernel(scaler, model, check_rows=64, atol=1e-9):
+    """
+    Folds the StandardScaler's mean_/scale_ into the LogisticRegression's coef_/intercept_,
+    so that P(class 1) = sigmoid(x @ w + b). Returns (w, b), or None when the model is not a
+    binary linear model or the folded kernel disagrees with sklearn on random inputs.
+    """
+    coef = np.asarray(getattr(model, 'coef_', None), dtype=float)
+    intercept = np.asarray(getattr(model, 'intercept_', None), dtype=float)
+    if coef.shape != (1, VSD_FEATURE_DIM) or intercept.shape != (1,):
+        return None
+
+    mean = scaler.mean_ if getattr(scaler, 'mean_', None) is not None else np.zeros(VSD_FEATURE_DIM)
+    scale = scaler.scale_ if getattr(scaler, 'scale_', None) is not None else np.ones(VSD_FEATURE_DIM)
+
+    w = np.ascontiguousarray(coef[0] / scale)
+    b = float(intercept[0] - np.dot(w, mean))
+
+    # Parity check against sklearn around the training distribution before trusting it
+    rng = np.random.default_rng(0)
+    X_check = mean + scale * rng.standard_normal((check_rows, VSD_FEATURE_DIM)) * 3
+    expected = model.predict_proba(scaler.transform(X_check))[:, 1]
+    if not np.allclose(_sigmoid(X_check @ w + b), expected, rtol=0, atol=atol):
+        return None
+    return w, b
+
+def _sigmoid(z):
+    """Overflow-free logistic function (works on scalars and arrays)."""
+    return 0.5 * (1.0 + np.tanh(0.5 * z))
+
+VSD_FUSED_KERNEL = None
+try:
+    if USE_FUSED_KERNEL:
+        VSD_FUSED_KERNEL = build_fused_kernel(VSD_SCALER, VSD_MODEL)
+        if VSD_FUSED_KERNEL is None:
+            print("⚠️ Fused VSD kernel unavailable for this model, using sklearn scoring.")
+except Exception as e:
+    print(f"⚠️ Could not build fused VSD kernel, using sklearn scoring. Details: {e}")
+
+
 # ==========================================================
 # 2. VSD Prediction Logic (16-Feature Extraction & Prediction)
 # ==========================================================
@@ -25,23 +79,33 @@ def extract_features(file_path, sr=16000):
     """
     Extracts 16 features (13 MFCCs, RMS Mean, ZCR Mean, Pitch Mean).
     """
+    import librosa  # heavy (numba / scipy): imported on first use, see utils/lazy_audio.py
+
     try:
         signal, original_sr = librosa.load(file_path, sr=None)
-        if original_sr != sr:
-             signal = librosa.resample(y=signal, orig_sr=original_sr, target_sr=sr)
+    except Exception as e:
+        # print(f"⚠️ Audio load failed: {e}")
+        return None
+    return extract_features_from_signal(signal, original_sr, sr=sr)
 
-        # 1. MFCCs (Mean of 13 coefficients)
-        mfccs = librosa.feature.mfcc(y=signal, sr=sr, n_mfcc=13)
-        mfccs_mean = np.mean(mfccs.T, axis=0)
-        
-        # 2. RMS Energy, 3. ZCR, 4. Pitch Mean
-        rms_mean = np.mean(librosa.feature.rms(y=signal)[0])
-        zcr_mean = np.mean(librosa.feature.zero_crossing_rate(y=signal)[0])
-        pitches, _ = librosa.core.piptrack(y=signal, sr=sr, fmin=75, fmax=300)
-        pitch = pitches[pitches > 0]
-        pitch_mean = np.mean(pitch) if pitch.size > 0 else 0
-        
-        all_features = np.hstack([mfccs_mean, rms_mean, zcr_mean, pitch_mean])
+def extract_features_from_signal(signal, original_sr, sr=16000):
+    """
+    Same as extract_features, but for audio that is already decoded in memory
+    (see utils.audio_utils.load_upload).
+    """
+    from utils.feature_extraction import compute_vsd_features, compute_vsd_features_librosa
+    from utils.resampling import resample
+
+    try:
+        # Cached per-rate resampling plan; 16 kHz input is passed through untouched
+        with stage('resample'):
+            signal = resample(signal, original_sr, sr)
+
+        # MFCCs, RMS, ZCR and Pitch Mean (see utils/feature_extraction.py)
+        if FEATURE_ENGINE == 'librosa':
+            all_features = compute_vsd_features_librosa(signal, sr)
+        else:
+            all_features = compute_vsd_features(signal, sr, pitch_backend=PITCH_BACKEND)
 
         if len(all_features) != VSD_FEATURE_DIM:
              raise ValueError(f"Feature extraction error: Expected {VSD_FEATURE_DIM} features, got {len(all_features)}")
@@ -57,15 +121,38 @@ def predict_vsd_risk(feature_vector):
     if len(feature_vector) != VSD_FEATURE_DIM:
         raise ValueError(f"Input features must be a vector of length {VSD_FEATURE_DIM}. Received {len(feature_vector)}")
         
+    if VSD_FUSED_KERNEL is not None:
+        # Fast path: one 16-element dot product + sigmoid, no sklearn validation overhead
+        w, b = VSD_FUSED_KERNEL
+        x = np.asarray(feature_vector, dtype=float)
+        z = float(np.dot(w, x)) + b
+        if not np.isfinite(z):
+            raise ValueError("Input features contain NaN or infinity.")
+        model_predicted_risk = _sigmoid(z) * 100
+        return np.clip(100 - model_predicted_risk, 0, 100)
+
     X_new = np.array(feature_vector).reshape(1, -1) 
+    return predict_vsd_risk_batch(X_new)[0]
+
+def predict_vsd_risk_batch(feature_matrix):
+    """Predicts VSD Risk (0-100) for an (N, 16) matrix with one transform + predict_proba call."""
+    X_new = np.asarray(feature_matrix, dtype=float)
+    if X_new.ndim != 2 or X_new.shape[1] != VSD_FEATURE_DIM:
+        raise ValueError(f"Input features must be an (N, {VSD_FEATURE_DIM}) matrix. Received shape {X_new.shape}")
     
     # Check scaler dimension expectation (Extra Safety Check)
     if VSD_SCALER.n_features_in_ != VSD_FEATURE_DIM:
         raise ValueError(f"Scaler expects {VSD_SCALER.n_features_in_} features, but prediction received {VSD_FEATURE_DIM}")
 
-    X_new_scaled = VSD_SCALER.transform(X_new)
-    probabilities = VSD_MODEL.predict_proba(X_new_scaled)
-    model_predicted_risk = probabilities[0][1] * 100 
+    if VSD_FUSED_KERNEL is not None:
+        if not np.all(np.isfinite(X_new)):
+            raise ValueError("Input features contain NaN or infinity.")
+        w, b = VSD_FUSED_KERNEL
+        model_predicted_risk = _sigmoid(X_new @ w + b) * 100
+    else:
+        X_new_scaled = VSD_SCALER.transform(X_new)
+        probabilities = VSD_MODEL.predict_proba(X_new_scaled)
+        model_predicted_risk = probabilities[:, 1] * 100 
     
     # FINAL CORRECTION: Invert the score (100 = Calm/Low Risk)
     final_risk_score = 100 - model_predicted_risk
@@ -73,13 +160,96 @@ def predict_vsd_risk(feature_vector):
     return np.clip(final_risk_score, 0, 100)
 
 
+def synthetic_voice_clip(seconds=1.0, sr=16000, seed=0):
+    """Deterministic voiced test clip: 150 Hz harmonic tone with a slow glide plus noise."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sr)) / sr
+    phase = 2 * np.pi * np.cumsum(150 + 20 * np.sin(2 * np.pi * 0.5 * t)) / sr
+    clip = sum(0.3 / k * np.sin(k * phase) for k in range(1, 5)) + 0.02 * rng.standard_normal(t.size)
+    return clip.astype(np.float32)
+
+def warm_up(include_audio=True, sr=16000):
+    """
+    Runs a synthetic clip through extract_features_from_signal and predict_vsd_risk so numba
+    JIT, FFT plans and first-touch allocations happen before real traffic. With
+    include_audio=False only the scoring path is exercised. Raises RuntimeError on failure.
+    """
+    if VSD_MODEL is None or VSD_SCALER is None:
+        raise RuntimeError(f"VSD model not loaded: {VSD_MODEL_ERROR}")
+    if include_audio:
+        features = extract_features_from_signal(synthetic_voice_clip(sr=sr), sr, sr=sr)
+        if features is None:
+            raise RuntimeError("feature extraction failed on the warm-up clip")
+    else:
+        features = np.asarray(VSD_SCALER.mean_, dtype=float).tolist()
+    score = predict_vsd_risk(features)
+    if not np.isfinite(score):
+        raise RuntimeError(f"warm-up prediction is not finite: {score}")
+    predict_vsd_risk_batch(np.asarray([features, features]))
+    return score
+
 # ==========================================================
 # 3. DHT22 Kalman Filter (Ambient Data Smoothing)
 # ==========================================================
 
+# Relative distance of P from its Riccati fixed point below which steady-state mode
+# switches to the precomputed gain
+STEADY_STATE_TOL = 1e-6
+# Q is the process noise accumulated over this many seconds: a timestamped reading scales it by
+# the time since the key's previous reading (readings without a timestamp add Q once, as before)
+KALMAN_Q_INTERVAL_SECONDS = float(os.environ.get('KALMAN_Q_INTERVAL_SECONDS', 1.0))
+# A reading older than the key's previous one by up to this much is out of order and dropped;
+# further back than that, the sender's clock is taken to have been reset (e.g. a reboot)
+KALMAN_REORDER_WINDOW_SECONDS = float(os.environ.get('KALMAN_REORDER_WINDOW_SECONDS', 300.0))
+# Longest gap Q is scaled for. A reading further ahead than this (a long outage, or a sender
+# mixing millis() and epoch timestamps) is accepted with Q scaled for this gap, which already
+# makes the filter all but restart from the measurement, instead of an unbounded multiplier
+KALMAN_MAX_GAP_SECONDS = float(os.environ.get('KALMAN_MAX_GAP_SECONDS', 24 * 3600.0))
+
+def steady_state_gain(F, H, Q, R):
+    """
+    Solves the scalar Riccati equation for a constant (F, H, Q, R) filter.
+    Returns (P, K, A): the converged posterior variance, the gain, and A = F * (1 - K * H),
+    so that a converged update is the single multiply-add  x = A * x + K * z.
+    """
+    h2 = H * H
+    b = R - F * F * R - Q * h2
+    P_pred = (-b + np.sqrt(b * b + 4 * h2 * Q * R)) / (2 * h2)
+    K = P_pred * H / (h2 * P_pred + R)
+    return float((1 - K * H) * P_pred), float(K), float(F * (1 - K * H))
+
+def _is_converged(P, steady, tol):
+    return abs(P - steady[0]) <= tol * steady[0]
+
+def _elapsed_q_scale(last_time, timestamp, interval, reorder_window, max_gap):
+    """
+    Process-noise multiplier for a reading at `timestamp` (seconds) when the previous one was
+    at `last_time` (NaN = none yet), and the new last time. None for an out-of-order reading.
+    Gaps longer than `max_gap` count as `max_gap`.
+    """
+    if last_time != last_time:
+        return 1.0, timestamp
+    elapsed = timestamp - last_time
+    if elapsed >= 0:
+        return min(elapsed, max_gap) / interval, timestamp
+    if elapsed >= -reorder_window:
+        return None, last_time
+    return 1.0, timestamp  # too far back to be reordering: the sender's clock was reset
+
+def _count_stale(filter_name):
+    if METRICS.enabled:
+        STALE_READINGS.inc(filter_name)
+
+def _clip_scalar(value, lo=0.0, hi=100.0):
+    """Same as np.clip(value, lo, hi) for a scalar, without the ufunc dispatch overhead."""
+    return np.float64(min(max(value, lo), hi))
+
 class DHT22_KalmanFilter:
     """Implements two independent 1D Kalman Filters for smoothing T/H readings."""
-    def __init__(self, initial_temp, initial_humidity, R_temp=0.5, R_humidity=1.0, Q=0.01):
+    def __init__(self, initial_temp, initial_humidity, R_temp=0.5, R_humidity=1.0, Q=0.01,
+                 steady_state=False, steady_state_tol=STEADY_STATE_TOL,
+                 q_interval=KALMAN_Q_INTERVAL_SECONDS, reorder_window=KALMAN_REORDER_WINDOW_SECONDS,
+                 max_gap=KALMAN_MAX_GAP_SECONDS):
         self.temp_estimate = initial_temp
         self.humidity_estimate = initial_humidity
         self.P_temp = 1.0  
@@ -89,11 +259,40 @@ class DHT22_KalmanFilter:
         self.Q = Q 
         self.F = 1.0 
         self.H = 1.0 
+        # Opt-in: once P settles, skip the covariance/gain recomputation
+        self.steady_state = steady_state
+        self.steady_state_tol = steady_state_tol
+        self.steady_temp = steady_state_gain(self.F, self.H, self.Q, self.R_temp)
+        self.steady_humidity = steady_state_gain(self.F, self.H, self.Q, self.R_humidity)
+        # Time of the last timestamped reading (seconds, NaN = none yet)
+        self.last_time = float('nan')
+        self.q_interval = q_interval
+        self.reorder_window = reorder_window
+        self.max_gap = max_gap
+
+    def update_filter(self, measured_temp, measured_humidity, timestamp=None):
+        """One predict/update cycle. With a `timestamp` (seconds), Q scales with the time since the last reading."""
+        Q = self.Q
+        if timestamp is not None:
+            scale, self.last_time = _elapsed_q_scale(self.last_time, float(timestamp), self.q_interval,
+                                                     self.reorder_window, self.max_gap)
+            if scale is None:
+                _count_stale('dht22')
+                return self.temp_estimate, self.humidity_estimate
+            Q = self.Q * scale
+
+        if self.steady_state and Q == self.Q:
+            if _is_converged(self.P_temp, self.steady_temp, self.steady_state_tol) and \
+                    _is_converged(self.P_humidity, self.steady_humidity, self.steady_state_tol):
+                _, K_temp, A_temp = self.steady_temp
+                _, K_humidity, A_humidity = self.steady_humidity
+                self.temp_estimate = A_temp * self.temp_estimate + K_temp * measured_temp
+                self.humidity_estimate = A_humidity * self.humidity_estimate + K_humidity * measured_humidity
+                return self.temp_estimate, self.humidity_estimate
 
-    def update_filter(self, measured_temp, measured_humidity):
         # 1. TEMPERATURE FILTER
         temp_pred = self.F * self.temp_estimate
-        P_temp_pred = self.F * self.P_temp * self.F + self.Q
+        P_temp_pred = self.F * self.P_temp * self.F + Q
         K_temp = P_temp_pred * self.H * (1 / (self.H * P_temp_pred * self.H + self.R_temp))
         temp_residual = measured_temp - self.H * temp_pred
         self.temp_estimate = temp_pred + K_temp * temp_residual
@@ -101,7 +300,7 @@ class DHT22_KalmanFilter:
         
         # 2. HUMIDITY FILTER
         humidity_pred = self.F * self.humidity_estimate
-        P_humidity_pred = self.F * self.P_humidity * self.F + self.Q
+        P_humidity_pred = self.F * self.P_humidity * self.F + Q
         K_humidity = P_humidity_pred * self.H * (1 / (self.H * P_humidity_pred * self.H + self.R_humidity))
         humidity_residual = measured_humidity - self.H * humidity_pred
         self.humidity_estimate = humidity_pred + K_humidity * humidity_residual
@@ -114,12 +313,20 @@ class DHT22_KalmanFilter:
 # 4. Wellness Fusion Engine (Final State Estimator)
 # ==========================================================
 
+_VSD_CLOCK, _AMBIENT_CLOCK = 1.0, 2.0
+
+
 class WellnessFusionEngine:
     """
     Implements a 1D Kalman Filter to fuse VSD Risk (volatile) 
     and Ambient Data (stable heuristic) into a stable Wellness Index.
     """
-    def __init__(self, initial_wellness=80.0, Q=0.01, R_vsd=10.0, R_ambient=2.0):
+    R_NO_DATA = 50.0 # High uncertainty if no new data
+
+    def __init__(self, initial_wellness=80.0, Q=0.01, R_vsd=10.0, R_ambient=2.0,
+                 steady_state=False, steady_state_tol=STEADY_STATE_TOL,
+                 q_interval=KALMAN_Q_INTERVAL_SECONDS, reorder_window=KALMAN_REORDER_WINDOW_SECONDS,
+                 max_gap=KALMAN_MAX_GAP_SECONDS):
         self.wellness_estimate = initial_wellness
         self.P_wellness = 1.0 
         self.Q = Q
@@ -127,48 +334,407 @@ class WellnessFusionEngine:
         self.R_ambient = R_ambient
         self.F = 1.0 
         self.H = 1.0
+        # Opt-in: converged gain per measurement source (keyed by its R). It is only used
+        # when P is at that source's fixed point, i.e. after a run of same-source updates.
+        self.steady_state = steady_state
+        self.steady_state_tol = steady_state_tol
+        self.steady_gains = {
+            R: steady_state_gain(self.F, self.H, self.Q, R) for R in (self.R_vsd, self.R_ambient, self.R_NO_DATA)
+        }
+        # /predict_features readings are stamped by the gateway (Date.now()) and /ambient ones by
+        # the device (millis()): each source keeps its own last time, since the two clocks can't
+        # be compared, and Q only grows with the time elapsed between updates of the same source
+        self.last_time = float('nan')
+        self.last_time_ambient = float('nan')
+        self.last_clock = float('nan')  # _VSD_CLOCK or _AMBIENT_CLOCK of the previous timed update
+        self.q_interval = q_interval
+        self.reorder_window = reorder_window
+        self.max_gap = max_gap
         # print(f"✅ Fusion Engine initialized...")
 
     def _calculate_ambient_impact(self, smoothed_temp, smoothed_humidity):
         """Maps smoothed ambient data (T/H) to an Ambient Wellness Score (0-100)."""
         # Ideal comfort: 24C, 50% Humidity.
         T_penalty = max(0, abs(smoothed_temp - 24.0) - 2.0) * 5
-        T_score = np.clip(100 - T_penalty, 0, 100)
+        T_score = _clip_scalar(100 - T_penalty, 0, 100)
         
         H_penalty = max(0, abs(smoothed_humidity - 50.0) - 10.0) * 2
-        H_score = np.clip(100 - H_penalty, 0, 100)
+        H_score = _clip_scalar(100 - H_penalty, 0, 100)
         
         # Combine (T is 60%, H is 40%)
         ambient_wellness_measurement = (T_score * 0.6) + (H_score * 0.4)
         return ambient_wellness_measurement
 
-    def update_fusion(self, vsd_risk_score, smoothed_temp, smoothed_humidity, measurement_source='VSD'):
-        """Applies the Kalman Filter cycle using the specified measurement source."""
-        
-        wellness_measurement_vsd = vsd_risk_score
-        wellness_measurement_ambient = self._calculate_ambient_impact(smoothed_temp, smoothed_humidity)
+    def update_fusion(self, vsd_risk_score, smoothed_temp, smoothed_humidity, measurement_source='VSD',
+                      timestamp=None):
+        """Applies the Kalman Filter cycle using the specified measurement source (Q scaled by elapsed time if timestamped)."""
+        Q = self.Q
+        if timestamp is not None:
+            clock, field = (_AMBIENT_CLOCK, 'last_time_ambient') if measurement_source == 'AMBIENT' \
+                else (_VSD_CLOCK, 'last_time')
+            scale, last_time = _elapsed_q_scale(getattr(self, field), float(timestamp), self.q_interval,
+                                                self.reorder_window, self.max_gap)
+            if scale is None:
+                _count_stale('fusion')
+                return self.wellness_estimate
+            setattr(self, field, last_time)
+            if self.last_clock != clock:
+                scale = 1.0  # the previous update was on the other clock: no elapsed time to measure
+            self.last_clock = clock
+            Q = self.Q * scale
 
         # 1. Select Measurement (Z) and Noise (R)
         if measurement_source == 'VSD':
-            Z = wellness_measurement_vsd
+            Z = vsd_risk_score
             R = self.R_vsd
         elif measurement_source == 'AMBIENT':
-            Z = wellness_measurement_ambient
+            Z = self._calculate_ambient_impact(smoothed_temp, smoothed_humidity)
             R = self.R_ambient
         else:
             Z = self.wellness_estimate 
-            R = 50.0 # High uncertainty if no new data
+            R = self.R_NO_DATA
+
+        if self.steady_state and Q == self.Q:
+            steady = self.steady_gains[R]
+            if _is_converged(self.P_wellness, steady, self.steady_state_tol):
+                _, K, A = steady
+                self.wellness_estimate = _clip_scalar(A * self.wellness_estimate + K * Z)
+                return self.wellness_estimate
 
         # 2. Predict Step
         wellness_pred = self.F * self.wellness_estimate
-        P_pred = self.F * self.P_wellness * self.F + self.Q
+        P_pred = self.F * self.P_wellness * self.F + Q
 
         # 3. Update Step
         K = P_pred * self.H * (1 / (self.H * P_pred * self.H + R))
         residual = Z - self.H * wellness_pred
         self.wellness_estimate = wellness_pred + K * residual
-        self.wellness_estimate = np.clip(self.wellness_estimate, 0, 100) # Clamp output
+        self.wellness_estimate = _clip_scalar(self.wellness_estimate) # Clamp output
 
         self.P_wellness = (1 - K * self.H) * P_pred
         
-        return self.wellness_estimate
\ No newline at end of file
+        return self.wellness_estimate
+
+
+# ==========================================================
+# 5. Per-Device Estimator Banks (keyed by device_id / user_id)
+# ==========================================================
+
+STATE_BANK_CAPACITY = int(os.environ.get('STATE_BANK_CAPACITY', 65536))
+STATE_BANK_TTL_SECONDS = float(os.environ.get('STATE_BANK_TTL_SECONDS', 24 * 3600))
+
+class KeyedStateBank:
+    """
+    Array-backed per-key filter state. Each key owns one slot in a set of NumPy columns
+    (a few float64s per device instead of a Python object apiece). Keys are evicted LRU once
+    `capacity` is reached, and after `ttl_seconds` without an update.
+
+    Thread-safe: every read and update holds `self.lock` for a few microseconds of float
+    arithmetic. Callers that need several updates applied back to back (e.g. a batch replay)
+    can hold the (re-entrant) lock around them.
+
+    When `journal` is set (a utils.state_store.StateStore), every update also records the
+    touched slots' new values, still under the lock, so the log order matches the state.
+    """
+    FIELDS = ()  # column names, defined by subclasses
+
+    def __init__(self, initial_values, capacity=STATE_BANK_CAPACITY, ttl_seconds=STATE_BANK_TTL_SECONDS,
+                 initial_slots=64, clock=time.monotonic):
+        self.initial_values = {name: float(initial_values[name]) for name in self.FIELDS}
+        self.capacity = int(capacity)
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+
+        size = max(1, min(initial_slots, self.capacity))
+        self.columns = {name: np.empty(size) for name in self.FIELDS}
+        self.last_seen = np.zeros(size)
+        self._slots = OrderedDict()  # key -> slot, least recently used first
+        self._free = []
+        self._next_slot = 0
+        self.lock = threading.RLock()
+        self.journal = None
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, key):
+        return key in self._slots
+
+    def keys(self):
+        with self.lock:
+            return list(self._slots)
+
+    def read(self, key, fields):
+        """Current values of `fields` for `key` (read together), or their initial values if the key is unknown."""
+        with self.lock:
+            slot = self._slots.get(key)
+            if slot is None:
+                return tuple(self.initial_values[name] for name in fields)
+            return tuple(float(self.columns[name][slot]) for name in fields)
+
+    def get(self, key, field):
+        """Current value of `field` for `key`, or its initial value if the key is unknown."""
+        return self.read(key, (field,))[0]
+
+    def snapshot(self):
+        """
+        Consistent copy of every key's state: (keys, {field: array aligned with keys}).
+        Readers can work on it without holding the lock.
+        """
+        with self.lock:
+            keys = list(self._slots)
+            slots = np.fromiter(self._slots.values(), dtype=np.intp, count=len(keys))
+            return keys, {name: column[slots].copy() for name, column in self.columns.items()}
+
+    def restore(self, keys, columns):
+        """
+        Loads saved state: `keys` least recently used first, `columns` maps each field to an
+        array aligned with them. Existing entries for those keys are overwritten; when there
+        are more keys than `capacity`, only the most recent ones are kept.
+        """
+        keys = list(keys)[-self.capacity:]
+        if not keys:
+            return
+        with self.lock:
+            if not self._slots:
+                # Empty bank (start-up): keys take slots 0..n-1 in order, no per-key bookkeeping
+                n = len(keys)
+                if n > len(self.last_seen):
+                    self._grow(min(self.capacity, 1 << (n - 1).bit_length()))
+                self._slots = OrderedDict(zip(keys, range(n)))
+                self._free = []
+                self._next_slot = n
+                self.last_seen[:n] = self.clock()
+                slots = slice(0, n)
+            else:
+                slots = self._acquire_many(keys)
+            for name in self.FIELDS:
+                self.columns[name][slots] = np.asarray(columns[name], dtype=float)[-len(keys):]
+
+    def evict_idle(self, now=None):
+        """Drops keys idle for longer than ttl_seconds. Returns how many were evicted."""
+        if not self.ttl_seconds:
+            return 0
+        with self.lock:
+            now = self.clock() if now is None else now
+            cutoff = now - self.ttl_seconds
+            evicted = 0
+            while self._slots:
+                key, slot = next(iter(self._slots.items()))
+                if self.last_seen[slot] >= cutoff:
+                    break
+                self._release(key)
+                evicted += 1
+            return evicted
+
+    def _acquire(self, key):
+        """Returns the slot for `key`, creating it (with initial values) if needed, and marks it used."""
+        now = self.clock()
+        slot = self._slots.get(key)
+        if slot is None:
+            self.evict_idle(now)
+            if len(self._slots) >= self.capacity:
+                self._release(next(iter(self._slots)))
+            slot = self._allocate()
+            for name, column in self.columns.items():
+                column[slot] = self.initial_values[name]
+            self._slots[key] = slot
+        else:
+            self._slots.move_to_end(key)
+        self.last_seen[slot] = now
+        return slot
+
+    def _acquire_many(self, keys):
+        """Vectorized-friendly _acquire: one clock read and eviction pass for a whole tick."""
+        if len(keys) > self.capacity and len(set(keys)) > self.capacity:
+            raise ValueError(f"{len(set(keys))} distinct keys in one update exceed the bank capacity {self.capacity}")
+        now = self.clock()
+        self.evict_idle(now)
+        slots_by_key = self._slots
+        slots = np.empty(len(keys), dtype=np.intp)
+        for i, key in enumerate(keys):
+            slot = slots_by_key.get(key)
+            if slot is None:
+                if len(slots_by_key) >= self.capacity:
+                    self._release(next(iter(slots_by_key)))
+                slot = self._allocate()
+                for name, column in self.columns.items():
+                    column[slot] = self.initial_values[name]
+                slots_by_key[key] = slot
+            else:
+                slots_by_key.move_to_end(key)
+            slots[i] = slot
+        self.last_seen[slots] = now
+        return slots
+
+    def _allocate(self):
+        if self._free:
+            return self._free.pop()
+        if self._next_slot == len(self.last_seen):
+            self._grow(min(self.capacity, 2 * len(self.last_seen)))
+        slot = self._next_slot
+        self._next_slot += 1
+        return slot
+
+    def _grow(self, size):
+        for name, column in self.columns.items():
+            grown = np.empty(size)
+            grown[:len(column)] = column
+            self.columns[name] = grown
+        grown = np.zeros(size)
+        grown[:len(self.last_seen)] = self.last_seen
+        self.last_seen = grown
+
+    def _release(self, key):
+        self._free.append(self._slots.pop(key))
+
+
+class DHT22_KalmanFilterBank(KeyedStateBank):
+    """One DHT22_KalmanFilter per device_id, stored column-wise."""
+    FIELDS = ('temp_estimate', 'humidity_estimate', 'P_temp', 'P_humidity', 'last_time')
+
+    def __init__(self, initial_temp, initial_humidity, R_temp=0.5, R_humidity=1.0, Q=0.01,
+                 steady_state=False, steady_state_tol=STEADY_STATE_TOL, **bank_kwargs):
+        # Template filter: each update loads a slot into it, runs the scalar cycle and stores it back
+        self._filter = DHT22_KalmanFilter(initial_temp, initial_humidity, R_temp=R_temp, R_humidity=R_humidity, Q=Q,
+                                          steady_state=steady_state, steady_state_tol=steady_state_tol)
+        super().__init__({name: getattr(self._filter, name) for name in self.FIELDS}, **bank_kwargs)
+
+    def estimate(self, key):
+        """Smoothed (temp, humidity) for `key`; the initial estimate for unknown devices."""
+        return self.read(key, ('temp_estimate', 'humidity_estimate'))
+
+    def update_filter(self, key, measured_temp, measured_humidity, timestamp=None):
+        with self.lock:
+            slot = self._acquire(key)
+            result = self._filter_slot(slot, measured_temp, measured_humidity, timestamp)
+            if self.journal is not None:
+                self.journal.record(self, (key,), (slot,))
+            return result
+
+    def _filter_slot(self, slot, measured_temp, measured_humidity, timestamp=None):
+        """One scalar filter cycle on `slot`; the caller holds whatever lock guards it."""
+        kf = self._filter
+        for name in self.FIELDS:
+            setattr(kf, name, float(self.columns[name][slot]))
+        result = kf.update_filter(measured_temp, measured_humidity, timestamp)
+        for name in self.FIELDS:
+            self.columns[name][slot] = getattr(kf, name)
+        return result
+
+    def update_many(self, ids, measured_temps, measured_humidities):
+        """
+        Advances every listed sensor by one reading with array operations (same arithmetic as
+        DHT22_KalmanFilter.update_filter, element-wise). A sensor listed more than once is
+        updated once per occurrence, in order. Returns (temp_estimates, humidity_estimates).
+        """
+        temps = np.asarray(measured_temps, dtype=float)
+        hums = np.asarray(measured_humidities, dtype=float)
+        if temps.shape != (len(ids),) or hums.shape != (len(ids),):
+            raise ValueError(f"Expected {len(ids)} temperature and humidity readings, got {temps.shape} / {hums.shape}")
+
+        with self.lock:
+            return self._update_many_locked(ids, temps, hums)
+
+    def _update_many_locked(self, ids, temps, hums):
+        slots = self._acquire_many(ids)
+        out_temp = np.empty(len(ids))
+        out_hum = np.empty(len(ids))
+
+        # Duplicate ids are applied in rounds so each round touches every slot at most once
+        occurrence = _occurrence_rank(slots)
+        for rank in range(int(occurrence.max()) + 1 if len(ids) else 0):
+            rows = np.flatnonzero(occurrence == rank)
+            s = slots[rows]
+            kf = self._filter
+            converged = _converged_mask(self.columns['P_temp'][s], self.columns['P_humidity'][s], kf) \
+                if kf.steady_state else None
+            temp, P_temp = _kalman_1d_step(self.columns['temp_estimate'][s], self.columns['P_temp'][s],
+                                           temps[rows], kf.R_temp, kf.Q, kf.F, kf.H,
+                                           steady=kf.steady_temp, converged=converged)
+            hum, P_hum = _kalman_1d_step(self.columns['humidity_estimate'][s], self.columns['P_humidity'][s],
+                                         hums[rows], kf.R_humidity, kf.Q, kf.F, kf.H,
+                                         steady=kf.steady_humidity, converged=converged)
+            self.columns['temp_estimate'][s] = temp
+            self.columns['P_temp'][s] = P_temp
+            self.columns['humidity_estimate'][s] = hum
+            self.columns['P_humidity'][s] = P_hum
+            out_temp[rows] = temp
+            out_hum[rows] = hum
+
+        if self.journal is not None:
+            latest = dict(zip(ids, slots.tolist()))  # a repeated id is logged once, with its final state
+            self.journal.record(self, latest.keys(), latest.values())
+        return out_temp, out_hum
+
+
+def _kalman_1d_step(estimate, P, measurement, R, Q, F, H, steady=None, converged=None):
+    """
+    One predict/update cycle over arrays, in the same operation order as the scalar filters.
+    Rows flagged in the optional `converged` mask use the steady-state multiply-add from
+    `steady` = (P, K, A) instead.
+    """
+    pred = F * estimate
+    P_pred = F * P * F + Q
+    K = P_pred * H * (1 / (H * P_pred * H + R))
+    residual = measurement - H * pred
+    new_estimate, new_P = pred + K * residual, (1 - K * H) * P_pred
+    if converged is not None and converged.any():
+        _, K_ss, A_ss = steady
+        new_estimate = np.where(converged, A_ss * estimate + K_ss * measurement, new_estimate)
+        new_P = np.where(converged, P, new_P)
+    return new_estimate, new_P
+
+
+def _converged_mask(P_temp, P_humidity, kf):
+    """Rows where both channels of a DHT22 filter sit at their steady-state variance."""
+    tol = kf.steady_state_tol
+    return (np.abs(P_temp - kf.steady_temp[0]) <= tol * kf.steady_temp[0]) & \
+           (np.abs(P_humidity - kf.steady_humidity[0]) <= tol * kf.steady_humidity[0])
+
+
+def _occurrence_rank(values):
+    """For each element, how many times the same value appeared before it (0 for first occurrences)."""
+    order = np.argsort(values, kind='stable')
+    sorted_vals = values[order]
+    starts = np.r_[0, np.flatnonzero(sorted_vals[1:] != sorted_vals[:-1]) + 1] if len(values) else np.array([], dtype=int)
+    group_start = np.repeat(starts, np.diff(np.r_[starts, len(values)]))
+    rank = np.empty(len(values), dtype=np.intp)
+    rank[order] = np.arange(len(values)) - group_start
+    return rank
+
+
+class WellnessFusionBank(KeyedStateBank):
+    """One WellnessFusionEngine state per user_id (or device_id), stored column-wise."""
+    FIELDS = ('wellness_estimate', 'P_wellness', 'last_time', 'last_time_ambient', 'last_clock')
+
+    def __init__(self, initial_wellness=80.0, Q=0.01, R_vsd=10.0, R_ambient=2.0,
+                 steady_state=False, steady_state_tol=STEADY_STATE_TOL, **bank_kwargs):
+        self._engine = WellnessFusionEngine(initial_wellness=initial_wellness, Q=Q, R_vsd=R_vsd, R_ambient=R_ambient,
+                                            steady_state=steady_state, steady_state_tol=steady_state_tol)
+        super().__init__({name: getattr(self._engine, name) for name in self.FIELDS}, **bank_kwargs)
+
+    def estimate(self, key):
+        """Current wellness estimate for `key`; the initial estimate for unknown users."""
+        return self.get(key, 'wellness_estimate')
+
+    def update_fusion(self, key, vsd_risk_score, smoothed_temp, smoothed_humidity, measurement_source='VSD',
+                      timestamp=None):
+        with self.lock:
+            slot = self._acquire(key)
+            result = self._fuse_slot(slot, vsd_risk_score, smoothed_temp, smoothed_humidity, measurement_source,
+                                     timestamp)
+            if self.journal is not None:
+                self.journal.record(self, (key,), (slot,))
+            return result
+
+    def _fuse_slot(self, slot, vsd_risk_score, smoothed_temp, smoothed_humidity, measurement_source, timestamp=None):
+        """One fusion cycle on `slot`; the caller holds whatever lock guards it."""
+        engine = self._engine
+        for name in self.FIELDS:
+            setattr(engine, name, float(self.columns[name][slot]))
+        result = engine.update_fusion(vsd_risk_score, smoothed_temp, smoothed_humidity,
+                                      measurement_source=measurement_source, timestamp=timestamp)
+        for name in self.FIELDS:
+            self.columns[name][slot] = getattr(engine, name)
+        return result